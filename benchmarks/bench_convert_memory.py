@@ -0,0 +1,83 @@
+"""
+Measure the memory allocated by `convert_to_schema` as the number of rows grows.
+
+The input table repeats one record batch, so its own chunks share buffers and it costs the same memory at
+every size. Converting it to a table schema reorders the columns and adds the missing ones as nulls; the
+Arrow memory allocated by the conversion should stay flat instead of growing with the row count:
+
+    python benchmarks/bench_convert_memory.py --rows 1000000 10000000 100000000
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+
+from omop_schema.convert import convert_to_schema
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_table
+
+TABLE_NAME = "measurement"
+PRESENT_COLUMNS = [
+    "measurement_id",
+    "person_id",
+    "measurement_concept_id",
+    "measurement_date",
+    "value_as_number",
+]
+
+
+def measure(num_rows, batch_size, preserve_chunks):
+    """
+    Convert a table of `num_rows` rows and measure the Arrow memory it allocates.
+
+    Args:
+        num_rows (int): The number of rows of the input table.
+        batch_size (int): The number of rows per chunk of the input table.
+        preserve_chunks (bool): Passed to `convert_to_schema`.
+
+    Returns:
+        dict: The "num_rows", "num_chunks" and the bytes "allocated" by the conversion.
+    """
+    schema = OMOPSchemaV54()
+    batch = generate_table(schema, TABLE_NAME, batch_size, num_persons=1000).select(PRESENT_COLUMNS)
+    batch = batch.combine_chunks().to_batches()[0]
+    # Reversed, so the conversion also has to reorder the columns.
+    batch = batch.select(list(reversed(PRESENT_COLUMNS)))
+    num_chunks = -(-num_rows // batch_size)
+    table = pa.Table.from_batches([batch] * num_chunks).slice(0, num_rows)
+
+    before = pa.total_allocated_bytes()
+    result = convert_to_schema(table, schema.get_pyarrow_schema(TABLE_NAME), preserve_chunks=preserve_chunks)
+    allocated = pa.total_allocated_bytes() - before
+    assert result.num_rows == num_rows
+    return {"num_rows": num_rows, "num_chunks": num_chunks, "allocated": allocated}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 100_000_000])
+    parser.add_argument("--batch-size", type=int, default=131_072)
+    parser.add_argument("--contiguous", action="store_true", help="Concatenate the chunks of the result.")
+    parser.add_argument("--output", type=Path, help="Path of the JSON file to write the results to.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for num_rows in args.rows:
+        result = measure(num_rows, args.batch_size, preserve_chunks=not args.contiguous)
+        results.append(result)
+        allocated = result["allocated"] / 2**20
+        print(f"{num_rows:>12} rows {result['num_chunks']:>6} chunks {allocated:>10.1f} MiB allocated")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Benchmark loading, converting and validating a synthetic OMOP CDM.
+
+Every case runs in a fresh process so that its peak resident memory is measured in isolation. Results are
+written as JSON and can be compared against a baseline from an earlier release:
+
+    python benchmarks/run_benchmarks.py --persons 10000 --output results.json
+    python benchmarks/run_benchmarks.py --persons 10000 --compare results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+from importlib.metadata import version
+from pathlib import Path
+
+from omop_schema.synthetic import generate_synthetic_cdm
+from omop_schema.utils import get_schema_loader
+
+BENCHMARK_TABLE = "measurement"
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _load_table(schema, data_dir):
+    from omop_schema.utils import load_table
+
+    return load_table(data_dir / f"{BENCHMARK_TABLE}.csv", schema).num_rows
+
+
+def _load_table_polars(schema, data_dir):
+    from omop_schema.utils import load_table_polars
+
+    return load_table_polars(data_dir / f"{BENCHMARK_TABLE}.csv", schema).collect().height
+
+
+def _load_csv_dataset(schema, data_dir):
+    return sum(table.num_rows for table in schema.load_csv_dataset(data_dir).values())
+
+
+def _convert_to_schema(schema, data_dir):
+    from pyarrow import csv
+
+    from omop_schema.convert import convert_to_schema
+
+    table = csv.read_csv(data_dir / f"{BENCHMARK_TABLE}.csv")
+    return convert_to_schema(table, schema.get_pyarrow_schema(BENCHMARK_TABLE)).num_rows
+
+
+def _convert_to_schema_polars(schema, data_dir):
+    import polars as pl
+
+    from omop_schema.convert import convert_to_schema_polars
+
+    table = pl.scan_csv(data_dir / f"{BENCHMARK_TABLE}.csv")
+    return convert_to_schema_polars(table, schema.get_polars_schema(BENCHMARK_TABLE)).collect().height
+
+
+def _validate_table(schema, data_dir):
+    from pyarrow import csv
+
+    from omop_schema.validate import OMOPValidator
+
+    table = csv.read_csv(data_dir / f"{BENCHMARK_TABLE}.csv")
+    OMOPValidator(type(schema)).validate_table(BENCHMARK_TABLE, table)
+    return table.num_rows
+
+
+CASES = {
+    "load_table": _load_table,
+    "load_table_polars": _load_table_polars,
+    "load_csv_dataset": _load_csv_dataset,
+    "convert_to_schema": _convert_to_schema,
+    "convert_to_schema_polars": _convert_to_schema_polars,
+    "validate_table": _validate_table,
+}
+
+
+def _run_case(case, omop_version, data_dir, queue):
+    schema = get_schema_loader(omop_version)
+    baseline_rss = _peak_rss_bytes()
+    start = time.perf_counter()
+    try:
+        num_rows = CASES[case](schema, Path(data_dir))
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    seconds = time.perf_counter() - start
+    peak_rss = _peak_rss_bytes()
+    queue.put(
+        {
+            "num_rows": num_rows,
+            "seconds": seconds,
+            "rows_per_second": num_rows / seconds if seconds else None,
+            "peak_rss_bytes": peak_rss,
+            "rss_increase_bytes": peak_rss - baseline_rss,
+        }
+    )
+
+
+def run_case(case, omop_version, data_dir, repeat=1):
+    """
+    Run a benchmark case in fresh processes and keep the fastest run.
+
+    Args:
+        case (str): The name of the case in `CASES`.
+        omop_version (str): The OMOP CDM version.
+        data_dir (str | Path): Path to the synthetic dataset.
+        repeat (int): Number of runs.
+
+    Returns:
+        dict: The "num_rows", "seconds", "rows_per_second", "peak_rss_bytes" and "rss_increase_bytes" of the
+        fastest run, or only an "error" message if the case failed.
+    """
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(case, omop_version, str(data_dir), queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        if "error" in result:
+            return result
+        runs.append(result)
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        results (dict): The current benchmark results.
+        baseline (dict): The baseline benchmark results.
+        threshold (float): Relative slowdown or memory increase above which a case regressed.
+
+    Returns:
+        list[str]: A description of every regression.
+    """
+    regressions = []
+    for case, result in results["cases"].items():
+        previous = baseline["cases"].get(case)
+        if previous is None or "error" in previous:
+            continue
+        if "error" in result:
+            regressions.append(f"{case}: {result['error']}")
+            continue
+        for metric in ("seconds", "peak_rss_bytes"):
+            ratio = result[metric] / previous[metric]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{case}: {metric} {previous[metric]:.4g} -> {result[metric]:.4g} ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--persons", type=int, default=10_000, help="Number of synthetic persons.")
+    parser.add_argument("--events", type=int, default=10, help="Number of events per person and table.")
+    parser.add_argument("--omop-version", default="5.4", choices=["5.3", "5.4"])
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per case; the fastest is kept.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Path of the JSON file to write the results to.")
+    parser.add_argument("--compare", type=Path, help="Path of a baseline JSON file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative regression threshold.")
+    args = parser.parse_args(argv)
+
+    results = {
+        "metadata": {
+            "omop_schema": version("omop_schema"),
+            "pyarrow": version("pyarrow"),
+            "polars": version("polars"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "omop_version": args.omop_version,
+            "persons": args.persons,
+            "events_per_person": args.events,
+            "seed": args.seed,
+        },
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory() as data_dir:
+        schema = get_schema_loader(args.omop_version)
+        generate_synthetic_cdm(
+            data_dir, schema, num_persons=args.persons, events_per_person=args.events, seed=args.seed
+        )
+        for case in args.cases:
+            result = run_case(case, args.omop_version, data_dir, repeat=args.repeat)
+            results["cases"][case] = result
+            if "error" in result:
+                print(f"{case:<26} failed: {result['error']}")
+                continue
+            print(
+                f"{case:<26} {result['num_rows']:>10} rows {result['seconds']:>8.3f}s "
+                f"{result['rows_per_second']:>12.0f} rows/s {result['peak_rss_bytes'] / 2**20:>8.1f} MiB"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+
+try:
+    import polars as pl
+
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+from .schema.base import OMOPSchemaBase
+from .utils import atomic_write_path, file_fingerprint, refresh_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+# Version of the validation cache file format. Entries written by other versions are ignored.
+VALIDATION_CACHE_VERSION = 2
+
+
+def _is_polars_type(value):
+    return POLARS_AVAILABLE and (
+        isinstance(value, pl.DataType) or (isinstance(value, type) and issubclass(value, pl.DataType))
+    )
+
+
+def _serialize_item(item):
+    """Convert a column name or data type to a JSON-compatible value, encoding data types as IPC schemas."""
+    if isinstance(item, pa.DataType):
+        buffer = pa.schema([pa.field("type", item)]).serialize()
+        return {"arrow": base64.b64encode(buffer.to_pybytes()).decode("ascii")}
+    if _is_polars_type(item):
+        buffer = pl.DataFrame(schema={"type": item}).write_ipc(None).getvalue()
+        return {"polars": base64.b64encode(buffer).decode("ascii")}
+    return str(item)
+
+
+def _deserialize_item(item):
+    """Restore a column name or data type written by `_serialize_item`."""
+    if not isinstance(item, dict):
+        return item
+    if "arrow" in item:
+        return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(item["arrow"]))).field("type").type
+    if not POLARS_AVAILABLE:
+        raise ImportError("Polars is required to read cached validation results of Polars frames.")
+    return pl.read_ipc(io.BytesIO(base64.b64decode(item["polars"]))).schema["type"]
+
+
+def _serialize_result(result):
+    """Convert a validation result to JSON-compatible values."""
+    return {
+        key: [[_serialize_item(item) for item in column] for column in columns]
+        for key, columns in result.items()
+    }
+
+
+def _deserialize_result(result):
+    """Restore a validation result written by `_serialize_result`, with tuples of names and data types."""
+    return {
+        key: [tuple(_deserialize_item(item) for item in column) for column in columns]
+        for key, columns in result.items()
+    }
+
+
+class ValidationCache:
+    """
+    Persistent cache of table validation results, stored as a JSON file.
+
+    Entries are keyed by schema version, table name, table path and validation options, and are valid as
+    long as the fingerprint (size, modification time and optionally content hash) of the table files is
+    unchanged. Data types are stored as serialized Arrow or Polars schemas, so cached results hold the same
+    type objects as the results of `OMOPValidator.validate_table`.
+
+    Args:
+        path (str | Path): Path of the JSON cache file. It is created on `save` if it does not exist.
+        content_hash (bool): If True, also record a SHA-256 hash of the table files. Tables whose
+            modification time changed but whose content did not are then still cache hits.
+    """
+
+    def __init__(self, path, content_hash=False):
+        self.path = Path(path)
+        self.content_hash = content_hash
+        self.entries = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == VALIDATION_CACHE_VERSION:
+                self.entries = data.get("entries", {})
+
+    @staticmethod
+    def _key(table_name, table_path, schema: OMOPSchemaBase, options):
+        options = json.dumps(options or {}, sort_keys=True)
+        return f"{schema.schema_key}|{table_name}|{Path(table_path).resolve()}|{options}"
+
+    def get(self, table_name, table_path, schema: OMOPSchemaBase, options=None):
+        """
+        Get the cached validation result of a table, if its files are unchanged.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            table_path (str | Path): Path to the table file or directory.
+            schema (OMOPSchemaBase): The schema version the table is validated against.
+            options (dict, optional): Validation options that affect the result.
+
+        Returns:
+            dict | None: The cached validation result, with tuples of column names and data types as returned
+            by `OMOPValidator.validate_table`, or None on a cache miss.
+        """
+        key = self._key(table_name, table_path, schema, options)
+        entry = self.entries.get(key)
+        if entry is not None:
+            fingerprint = refresh_fingerprint(entry["fingerprint"], table_path, self.content_hash)
+            if fingerprint is not None:
+                with self._lock:
+                    entry["fingerprint"] = fingerprint
+                return _deserialize_result(entry["result"])
+        # Fingerprint before the table is validated, so changes made in the meantime invalidate the entry.
+        fingerprint = file_fingerprint(table_path, content_hash=self.content_hash)
+        with self._lock:
+            self._fingerprints[key] = fingerprint
+        return None
+
+    def put(self, table_name, table_path, schema: OMOPSchemaBase, result, options=None):
+        """
+        Store the validation result of a table.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            table_path (str | Path): Path to the table file or directory.
+            schema (OMOPSchemaBase): The schema version the table was validated against.
+            result (dict): The validation result returned by `OMOPValidator.validate_table`.
+            options (dict, optional): Validation options that affect the result.
+        """
+        key = self._key(table_name, table_path, schema, options)
+        with self._lock:
+            fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(table_path, content_hash=self.content_hash)
+        with self._lock:
+            self.entries[key] = {"fingerprint": fingerprint, "result": _serialize_result(result)}
+
+    def save(self):
+        """Write the cache file atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, atomic_write_path(self.path) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": VALIDATION_CACHE_VERSION, "entries": self.entries}, f)
+
+
+class TableCache:
+    """
+    Persistent cache of loaded tables, stored as uncompressed Arrow IPC (Feather v2) files.
+
+    A cached table is keyed by the path of its source and a loader key that names the loader and schema
+    version. It is valid as long as the fingerprint (size, modification time and optionally content hash) of
+    the source files is unchanged. Cache hits are memory-mapped instead of read, so they open almost
+    instantly and processes loading the same table share its pages. Least recently used tables are evicted
+    once the cache exceeds `max_bytes`.
+
+    Args:
+        directory (str | Path): The cache directory. It is created if it does not exist.
+        max_bytes (int, optional): Maximum total size of the cached tables in bytes. Defaults to no limit.
+        content_hash (bool): If True, also record a SHA-256 hash of the source files. Sources whose
+            modification time changed but whose content did not are then still cache hits.
+    """
+
+    def __init__(self, directory, max_bytes=None, content_hash=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, table_path, key):
+        name = hashlib.sha256(f"{key}|{Path(table_path).resolve()}".encode()).hexdigest()[:32]
+        return self.directory / f"{name}.arrow", self.directory / f"{name}.json"
+
+    @staticmethod
+    def _read(data_path):
+        with pa.memory_map(str(data_path)) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _lookup(self, table_path, data_path, metadata_path):
+        if not (data_path.exists() and metadata_path.exists()):
+            return None
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            fingerprint = refresh_fingerprint(metadata["fingerprint"], table_path, self.content_hash)
+            if fingerprint is None:
+                return None
+            table = self._read(data_path)
+        except (OSError, ValueError, KeyError, pa.ArrowInvalid) as e:
+            logger.warning(f"Ignoring unreadable cache entry {data_path}: {e}")
+            return None
+        if fingerprint != metadata["fingerprint"]:
+            # Record the current modification time, so a touched source is only hashed once.
+            self._write_metadata(metadata_path, {**metadata, "fingerprint": fingerprint})
+        # The modification time of a cached table is its last use, for least recently used eviction.
+        os.utime(data_path)
+        return table
+
+    @staticmethod
+    def _write_metadata(metadata_path, metadata):
+        with atomic_write_path(metadata_path) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(metadata, f)
+
+    def get_or_load(self, table_path, load, key=""):
+        """
+        Get a cached table, or load and cache it if its source files changed or it is not cached yet.
+
+        Args:
+            table_path (str | Path): Path to the source file or directory of the table.
+            load (Callable[[], pa.Table | None]): Loads the table from its source on a cache miss.
+            key (str): Distinguishes tables loaded from the same source by different loaders or schemas.
+
+        Returns:
+            pa.Table | None: The memory-mapped table, or None if `load` returned None.
+        """
+        data_path, metadata_path = self._paths(table_path, key)
+        table = self._lookup(table_path, data_path, metadata_path)
+        if table is not None:
+            self.hits += 1
+            return table
+
+        self.misses += 1
+        # Fingerprint before loading, so changes made in the meantime invalidate the entry.
+        fingerprint = file_fingerprint(table_path, content_hash=self.content_hash)
+        table = load()
+        if table is None:
+            return None
+        with atomic_write_path(data_path) as tmp_path:
+            with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self._write_metadata(
+            metadata_path, {"source": str(Path(table_path).resolve()), "key": key, "fingerprint": fingerprint}
+        )
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes, keep=data_path)
+        # Return the memory-mapped copy, so the loaded table can be freed.
+        return self._read(data_path)
+
+    def evict(self, max_bytes=0, keep=None):
+        """
+        Remove the least recently used tables until the cache holds at most `max_bytes`.
+
+        Args:
+            max_bytes (int): The size to shrink the cache to. Defaults to removing all tables.
+            keep (Path, optional): A cached table that is never removed.
+
+        Returns:
+            int: The number of bytes removed.
+        """
+        entries = []
+        for data_path in self.directory.glob("*.arrow"):
+            try:
+                stat = data_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, data_path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, data_path in sorted(entries):
+            if total - removed <= max_bytes:
+                break
+            if keep is not None and data_path == Path(keep):
+                continue
+            try:
+                # Tables that are still memory-mapped stay readable on POSIX systems.
+                data_path.unlink()
+                data_path.with_suffix(".json").unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not evict {data_path}: {e}")
+                continue
+            removed += size
+        return removed
@@ -0,0 +1,258 @@
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+
+from . import instrumentation
+from .dates import parse_dates
+
+ERROR_MODES = ("raise", "null")
+# Column of the quarantine file listing the columns whose values could not be cast.
+INVALID_COLUMNS_FIELD = "invalid_columns"
+
+# Strings the Arrow cast kernels parse. Integers are checked for range through decimal128(38, 0).
+INTEGER_PATTERN = r"^[+-]?\d{1,38}$"
+FLOAT_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^[+-]?(?i:inf|infinity|nan)$"
+BOOLEAN_PATTERN = r"^(?i:true|false|1|0)$"
+_DECIMAL = pa.decimal128(38, 0)
+
+
+def _is_string(data_type):
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def _is_string_like(data_type):
+    return _is_string(data_type) or pa.types.is_dictionary(data_type) or pa.types.is_binary(data_type)
+
+
+def _is_temporal(data_type):
+    return pa.types.is_date(data_type) or pa.types.is_timestamp(data_type)
+
+
+def _integer_bounds(data_type):
+    bits = data_type.bit_width
+    if pa.types.is_signed_integer(data_type):
+        return -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+    return 0, 2**bits - 1
+
+
+def _in_range(values, data_type):
+    """Check that decimal or floating point values are within the range of an integer type."""
+    low, high = _integer_bounds(data_type)
+    if pa.types.is_floating(values.type):
+        low, high = pa.scalar(float(low)), pa.scalar(float(high))
+    else:
+        low, high = pa.scalar(low).cast(values.type), pa.scalar(high).cast(values.type)
+    return pc.and_(pc.greater_equal(values, low), pc.less_equal(values, high))
+
+
+def _castable_mask(values, target_type):
+    """Get a mask of the values expected to cast to `target_type`, or None if there is no cheap check."""
+    if _is_string(values.type):
+        if pa.types.is_integer(target_type):
+            mask = pc.match_substring_regex(values, INTEGER_PATTERN)
+            decimals = pc.if_else(mask, values, pa.scalar(None, values.type)).cast(_DECIMAL)
+            return pc.and_(mask, _in_range(decimals, target_type))
+        if pa.types.is_floating(target_type):
+            return pc.match_substring_regex(values, FLOAT_PATTERN)
+        if pa.types.is_boolean(target_type):
+            return pc.match_substring_regex(values, BOOLEAN_PATTERN)
+    elif pa.types.is_integer(values.type) and pa.types.is_integer(target_type):
+        return _in_range(values.cast(_DECIMAL), target_type)
+    elif pa.types.is_floating(values.type) and pa.types.is_integer(target_type):
+        return pc.and_(pc.equal(values, pc.trunc(values)), _in_range(values.cast(pa.float64()), target_type))
+    elif not _is_string_like(values.type):
+        return _lossless_mask(values, target_type)
+    return None
+
+
+def _lossless_mask(values, target_type):
+    """Get a mask of the values that cast to `target_type` and back without changing."""
+    try:
+        cast = values.cast(target_type, safe=False)
+        mask = pc.equal(cast.cast(values.type, safe=False), values)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    if pa.types.is_floating(values.type):
+        mask = pc.or_(mask, pc.is_nan(values))
+    return mask
+
+
+def _safe_cast_array(values, target_type, date_formats):
+    if pa.types.is_dictionary(values.type) and not pa.types.is_dictionary(target_type):
+        values = values.dictionary_decode()
+    try:
+        return values.cast(target_type), None
+    except pa.ArrowInvalid:
+        pass
+    if _is_string(values.type) and _is_temporal(target_type):
+        result = parse_dates(values, target_type, date_formats)
+    else:
+        mask = _castable_mask(values, target_type)
+        if mask is None:
+            raise pa.ArrowInvalid(f"Cannot safely cast {values.type} values to {target_type}.")
+        result = pc.if_else(mask, values, pa.scalar(None, values.type)).cast(target_type)
+    if result.null_count == values.null_count:
+        return result, None
+    return result, pc.and_(values.is_valid(), result.is_null())
+
+
+def string_schema(expected_schema):
+    """
+    Get the schema to read text files with before casting them with `SafeCaster`: every column is a string.
+
+    Args:
+        expected_schema (pa.Schema): The expected schema.
+
+    Returns:
+        pa.Schema: The string schema.
+    """
+    return pa.schema([field.with_type(pa.string()) for field in expected_schema])
+
+
+def safe_cast(values, target_type, date_formats=None):
+    """
+    Cast values to a type, setting the values that cannot be cast to null.
+
+    Casts are safe: values that do not parse, overflow the target type or lose precision are never truncated.
+    Values are cast in one vectorized call; only if that fails, the values that cannot be cast are masked out
+    with vectorized checks: regular expressions and range checks for strings, range and round-trip checks for
+    numbers, and `strptime` with each ISO 8601 shape and each of `date_formats` for dates.
+
+    Args:
+        values (pa.Array | pa.ChunkedArray): The values to cast.
+        target_type (pa.DataType): The type to cast to.
+        date_formats (Iterable[str], optional): `strptime` formats of string date and datetime values that
+            are not ISO 8601.
+
+    Returns:
+        tuple[pa.Array | pa.ChunkedArray, pa.Array | pa.ChunkedArray | None]: The cast values, and a boolean
+        mask of the values that could not be cast, or None if all values were cast.
+
+    Raises:
+        pa.ArrowNotImplementedError: If there is no cast between the types.
+        pa.ArrowInvalid: If the values do not all cast and there is no vectorized check for the types.
+    """
+    if isinstance(values, pa.Array):
+        return _safe_cast_array(values, target_type, date_formats)
+    chunks, masks = [], []
+    for chunk in values.chunks:
+        result, invalid = _safe_cast_array(chunk, target_type, date_formats)
+        chunks.append(result)
+        masks.append(invalid)
+    result = pa.chunked_array(chunks, type=target_type)
+    if all(mask is None for mask in masks):
+        return result, None
+    masks = [pa.repeat(False, len(chunk)) if mask is None else mask for chunk, mask in zip(chunks, masks)]
+    return result, pa.chunked_array(masks, type=pa.bool_())
+
+
+class SafeCaster:
+    """
+    Cast tables and record batches to expected types, with per-column accounting of invalid values.
+
+    With `errors="null"`, values that cannot be cast are set to null and counted per column in `counts` and
+    in the `invalid_values` counter of the instrumentation. The original rows holding them can be written to
+    a quarantine CSV file, with an additional `invalid_columns` column listing the offending columns. The file
+    is only created once a row is quarantined. With `errors="raise"`, the first invalid value raises.
+
+    Args:
+        errors (str): "raise" or "null".
+        quarantine (str | Path, optional): Path of the quarantine file. Only used with `errors="null"`.
+        date_formats (Iterable[str], optional): `strptime` formats of string date and datetime values that
+            are not ISO 8601.
+        null_values (Iterable[str], optional): Strings that are null rather than invalid when they are cast
+            to a non-string type, e.g. `CSV_NULL_VALUES`.
+    """
+
+    def __init__(self, errors="null", quarantine=None, date_formats=None, null_values=None):
+        if errors not in ERROR_MODES:
+            raise ValueError(f"errors must be one of {ERROR_MODES}, got {errors!r}.")
+        self.errors = errors
+        self.quarantine = Path(quarantine) if quarantine is not None else None
+        self.date_formats = list(date_formats or [])
+        self.null_values = pa.array(null_values or [], pa.string())
+        self.counts = {}
+        self._writer = None
+        self._schema = None
+
+    def cast(self, data, expected_schema):
+        """
+        Cast the columns of a table or batch that are in the expected schema to their expected type.
+
+        Columns keep their order, and columns that are not in the expected schema are kept as they are.
+
+        Args:
+            data (pa.Table | pa.RecordBatch): The data.
+            expected_schema (pa.Schema): The expected schema.
+
+        Returns:
+            pa.Table | pa.RecordBatch: The cast data.
+        """
+        result, invalid = data, {}
+        for field in expected_schema:
+            index = data.schema.get_field_index(field.name)
+            if index < 0 or data.schema.field(index).type == field.type:
+                continue
+            column = data.column(index)
+            instrumentation.count("cast_values", len(column), column=field.name)
+            if len(self.null_values) and _is_string(column.type) and not _is_string_like(field.type):
+                column = pc.if_else(
+                    pc.is_in(column, value_set=self.null_values), pa.scalar(None, column.type), column
+                )
+            if self.errors == "raise":
+                values, mask = column.cast(field.type), None
+            else:
+                values, mask = safe_cast(column, field.type, self.date_formats)
+            result = result.set_column(index, field, values)
+            if mask is not None:
+                invalid[field.name] = mask
+                count = pc.sum(mask).as_py()
+                self.counts[field.name] = self.counts.get(field.name, 0) + count
+                instrumentation.count("invalid_values", count, column=field.name)
+        if invalid and self.quarantine is not None:
+            self._write_quarantine(data, invalid)
+        return result
+
+    def _write_quarantine(self, data, invalid):
+        rows = None
+        for mask in invalid.values():
+            rows = mask if rows is None else pc.or_(rows, mask)
+        offending = pc.binary_join_element_wise(
+            *[pc.if_else(mask, column, "") for column, mask in invalid.items()], ","
+        )
+        offending = pc.replace_substring_regex(offending, r"^,+|,+$", "")
+        offending = pc.replace_substring_regex(offending, r",+", ",")
+        data = data.append_column(INVALID_COLUMNS_FIELD, offending).filter(rows)
+        if self._writer is None:
+            self.quarantine.parent.mkdir(parents=True, exist_ok=True)
+            self._schema = data.schema
+            self._writer = csv.CSVWriter(self.quarantine, self._schema)
+        elif data.schema != self._schema:
+            # Rows of later files are aligned to the columns of the first quarantined rows.
+            schema = self._schema
+            data = type(data).from_arrays(
+                [
+                    (
+                        data.column(field.name).cast(field.type)
+                        if field.name in data.schema.names
+                        else pa.nulls(data.num_rows, field.type)
+                    )
+                    for field in schema
+                ],
+                schema=schema,
+            )
+        self._writer.write(data)
+
+    def close(self):
+        """Close the quarantine file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,168 @@
+import datetime
+from abc import ABC, abstractmethod
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .schema.base import OMOPSchemaBase
+from .utils import DEFAULT_BATCH_SIZE, to_batches
+
+DEFAULT_MAX_SAMPLES = 10
+
+# Columns holding counts or amounts that can never be negative.
+NON_NEGATIVE_COLUMNS = ("quantity", "days_supply")
+
+
+class Rule(ABC):
+    """
+    A vectorized data check over the rows of one OMOP table.
+
+    Subclasses implement `violations`, which returns a boolean mask that is True for every violating row.
+    Rows for which the check evaluates to null (e.g. comparisons with null values) are not violations.
+    """
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = tuple(columns)
+
+    def applies_to(self, column_names):
+        return all(column in column_names for column in self.columns)
+
+    @abstractmethod
+    def violations(self, batch):
+        """
+        Get the rows of a batch that violate the check.
+
+        Args:
+            batch (pa.RecordBatch | pa.Table): The rows, holding the columns of the rule.
+
+        Returns:
+            pa.Array | pa.ChunkedArray: A boolean mask that is True for every violating row.
+        """
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class NotNullRule(Rule):
+    """Check that a required column has no null values."""
+
+    def __init__(self, column):
+        super().__init__(f"not_null:{column}", [column])
+
+    def violations(self, batch):
+        return pc.is_null(batch.column(self.columns[0]))
+
+
+class RangeRule(Rule):
+    """Check that the values of a column lie within an inclusive range."""
+
+    def __init__(self, column, min_value=None, max_value=None):
+        if min_value is None and max_value is None:
+            raise ValueError("At least one of min_value and max_value must be given.")
+        super().__init__(f"range:{column}", [column])
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def violations(self, batch):
+        values = batch.column(self.columns[0])
+        masks = []
+        if self.min_value is not None:
+            masks.append(pc.less(values, pa.scalar(self.min_value, values.type)))
+        if self.max_value is not None:
+            masks.append(pc.greater(values, pa.scalar(self.max_value, values.type)))
+        return masks[0] if len(masks) == 1 else pc.or_kleene(*masks)
+
+
+class DateOrderRule(Rule):
+    """Check that an end date or datetime is not before its start."""
+
+    def __init__(self, start_column, end_column):
+        super().__init__(f"date_order:{end_column}>={start_column}", [start_column, end_column])
+
+    def violations(self, batch):
+        start, end = (batch.column(column) for column in self.columns)
+        return pc.less(end, start)
+
+
+def default_rules(schema: OMOPSchemaBase, table_name):
+    """
+    Build the default data rules for an OMOP table from its schema.
+
+    These are NOT NULL checks for the required fields, plausible ranges for the birth date fields, end dates
+    not before start dates, and non-negative quantities.
+
+    Args:
+        schema (OMOPSchemaBase): The schema version.
+        table_name (str): The name of the table.
+
+    Returns:
+        list[Rule]: The rules for the table.
+    """
+    columns = schema.get_schema(table_name)
+    rules = [NotNullRule(column) for column in schema.get_required_fields(table_name)]
+
+    birth_ranges = {
+        "year_of_birth": (1800, datetime.date.today().year),
+        "month_of_birth": (1, 12),
+        "day_of_birth": (1, 31),
+    }
+    rules += [RangeRule(column, *bounds) for column, bounds in birth_ranges.items() if column in columns]
+
+    for column in columns:
+        for suffix in ("_start_date", "_start_datetime"):
+            if column.endswith(suffix):
+                end_column = column[: -len(suffix)] + suffix.replace("start", "end")
+                if end_column in columns:
+                    rules.append(DateOrderRule(column, end_column))
+
+    rules += [RangeRule(column, min_value=0) for column in NON_NEGATIVE_COLUMNS if column in columns]
+    return rules
+
+
+def check_table_data(
+    schema: OMOPSchemaBase,
+    table_name,
+    data,
+    rules=None,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Run vectorized data checks over an OMOP table, one batch at a time.
+
+    Args:
+        schema (OMOPSchemaBase): The schema version.
+        table_name (str): The name of the table.
+        data (str | Path | pa.Table | pa.RecordBatch | Iterable[pa.RecordBatch]): The table data. Paths are
+            streamed with `iter_table_batches`.
+        rules (list[Rule], optional): The rules to check. Defaults to `default_rules(schema, table_name)`.
+        max_samples (int): Maximum number of violating row numbers reported per rule.
+        batch_size (int): Maximum number of rows checked at once.
+
+    Returns:
+        dict: The total "num_rows" and, under "rules", a dict per rule name with the checked "columns",
+        the number of "violations" and the 0-based row numbers of the first violating rows in
+        "sample_rows". Rules whose columns are not in the data are not reported.
+    """
+    if rules is None:
+        rules = default_rules(schema, table_name)
+    results = {}
+    num_rows = 0
+    for batch in to_batches(data, schema, batch_size):
+        for rule in rules:
+            if not rule.applies_to(batch.schema.names):
+                continue
+            result = results.setdefault(
+                rule.name, {"columns": list(rule.columns), "violations": 0, "sample_rows": []}
+            )
+            mask = rule.violations(batch).fill_null(False)
+            count = pc.sum(mask).as_py() or 0
+            if count:
+                result["violations"] += count
+                missing_samples = max_samples - len(result["sample_rows"])
+                if missing_samples > 0:
+                    rows = pc.indices_nonzero(mask).slice(0, missing_samples).to_pylist()
+                    result["sample_rows"] += [num_rows + row for row in rows]
+        num_rows += batch.num_rows
+    return {"num_rows": num_rows, "rules": results}
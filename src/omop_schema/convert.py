@@ -1,44 +1,97 @@
 import os
+import warnings
 
 import pyarrow as pa
+import pyarrow.compute as pc
 
+from . import instrumentation
+from .casting import ERROR_MODES, safe_cast
+from .dates import parse_polars
+from .schema.base import OMOPSchemaBase
 
-def convert_to_schema(dataset, target_schema, allow_extra_columns=False):
+
+def _null_column(data_type, chunk_lengths, templates):
+    """Build an all-null column whose chunks are zero-copy slices of one shared null array per type."""
+    template = templates.get(data_type)
+    if template is None or len(template) < max(chunk_lengths):
+        template = templates[data_type] = pa.nulls(max(chunk_lengths), data_type)
+    return pa.chunked_array([template.slice(0, length) for length in chunk_lengths], type=data_type)
+
+
+def _cast_column(column, data_type):
+    """Cast a column chunk by chunk, so its chunk layout is preserved."""
+    if isinstance(column, pa.Array):
+        return column.cast(data_type)
+    return pa.chunked_array([chunk.cast(data_type) for chunk in column.chunks], type=data_type)
+
+
+@instrumentation.staged("convert_to_schema")
+def convert_to_schema(
+    dataset, target_schema, allow_extra_columns=False, preserve_chunks=True, errors="raise"
+):
     """
     Convert a dataset to match the target schema.
 
+    Columns are reordered, cast and completed in a single pass. Missing columns are filled with nulls that
+    follow the chunk layout of the dataset and share one buffer of the largest chunk length per type, so
+    their memory does not grow with the number of chunks.
+
     Args:
-        dataset (pa.Table): The input dataset with a potentially different schema.
+        dataset (pa.Table | pa.RecordBatch): The input dataset with a potentially different schema.
         target_schema (pa.Schema): The desired schema to align the dataset to.
-        allow_extra_columns (bool): If True, extra columns in the dataset are retained.
+        allow_extra_columns (bool): If True, extra columns in the dataset are retained after the target
+            columns.
+        preserve_chunks (bool): If True, columns keep the chunk layout of the dataset and chunks are never
+            concatenated. If False, every column of the result is a single contiguous chunk.
+        errors (str): "raise" to fail on the first value that cannot be cast, or "null" to set such values to
+            null. Invalid values are counted per column in the `invalid_values` instrumentation counter.
 
     Returns:
-        pa.Table: The dataset converted to match the target schema.
+        pa.Table | pa.RecordBatch: The dataset converted to match the target schema.
     """
-    # Add missing columns with default values
-    missing_columns = [field for field in target_schema if field.name not in dataset.schema.names]
-    for field in missing_columns:
-        default_value = pa.array([None] * dataset.num_rows, type=field.type)
-        dataset = dataset.append_column(field.name, default_value)
-
-    # If extra columns are not allowed, drop them
-    if not allow_extra_columns:
-        dataset = dataset.select([field.name for field in target_schema])
-
-    # Ensure column types match the target schema
-    columns = []
+    if errors not in ERROR_MODES:
+        raise ValueError(f"errors must be one of {ERROR_MODES}, got {errors!r}.")
+    is_batch = isinstance(dataset, pa.RecordBatch)
+    if is_batch:
+        chunk_lengths = [dataset.num_rows]
+    elif dataset.num_columns and dataset.column(0).num_chunks:
+        chunk_lengths = [len(chunk) for chunk in dataset.column(0).chunks]
+    else:
+        chunk_lengths = [dataset.num_rows]
+
+    instrumentation.count("rows", dataset.num_rows, stage="convert_to_schema")
+    instrumentation.count("batches", len(chunk_lengths), stage="convert_to_schema")
+    names = set(dataset.schema.names)
+    fields, columns, templates = [], [], {}
     for field in target_schema:
-        column = dataset[field.name]
-        if column.type != field.type:
-            column = column.cast(field.type)
+        if field.name in names:
+            column = dataset.column(field.name)
+            if column.type != field.type:
+                instrumentation.count("cast_values", len(column), column=field.name)
+                if errors == "null":
+                    column, invalid = safe_cast(column, field.type)
+                    if invalid is not None:
+                        instrumentation.count("invalid_values", pc.sum(invalid).as_py(), column=field.name)
+                else:
+                    column = _cast_column(column, field.type)
+        else:
+            column = _null_column(field.type, chunk_lengths, templates)
+            if is_batch:
+                column = column.chunk(0)
+        fields.append(field)
         columns.append(column)
 
-    # Include extra columns if allowed
     if allow_extra_columns:
-        extra_columns = [dataset[name] for name in dataset.schema.names if name not in target_schema.names]
-        columns.extend(extra_columns)
+        for field in dataset.schema:
+            if field.name not in target_schema.names:
+                fields.append(field)
+                columns.append(dataset.column(field.name))
 
-    return pa.Table.from_arrays(columns, schema=target_schema)
+    schema = pa.schema(fields, metadata=target_schema.metadata)
+    if is_batch:
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+    result = pa.Table.from_arrays(columns, schema=schema)
+    return result if preserve_chunks else result.combine_chunks()
 
 
 try:
@@ -49,8 +102,20 @@ except ImportError:
     POLARS_AVAILABLE = False
 
 
+def _cast_polars(expression, source_dtype, dtype, date_formats=None):
+    # Polars does not cast strings to temporal types, they have to be parsed.
+    if source_dtype == pl.String and (dtype == pl.Date or isinstance(dtype, pl.Datetime)):
+        return parse_polars(expression, dtype, date_formats)
+    return expression.cast(dtype)
+
+
 def convert_to_schema_polars(
-    dataset, target_schema, allow_extra_columns=False, allow_missing_columns=True, add_missing_columns=False
+    dataset,
+    target_schema,
+    allow_extra_columns=False,
+    allow_missing_columns=True,
+    add_missing_columns=False,
+    date_formats=None,
 ):
     """
     Convert a Polars DataFrame or LazyFrame to match the target schema.
@@ -61,6 +126,8 @@ def convert_to_schema_polars(
         allow_extra_columns (bool): If True, extra columns in the dataset are retained.
         allow_missing_columns (bool): If True, we do not fail on missing columns.
         add_missing_columns (bool): If True, missing columns are added with default values.
+        date_formats (list[str], optional): `strptime` formats of string date and datetime columns. Values
+            that match none of them become null. Defaults to inferring the format of each column.
 
     Returns:
         pl.DataFrame or pl.LazyFrame: The dataset converted to match the target schema.
@@ -94,23 +161,40 @@ def convert_to_schema_polars(
         if column not in source_schema:
             continue
         if source_schema.get(column) != dtype:
-            dataset = dataset.with_columns(pl.col(column).cast(dtype))
+            dataset = dataset.with_columns(
+                _cast_polars(pl.col(column), source_schema.get(column), dtype, date_formats)
+            )
 
     return dataset
 
 
-def process_omop_dataset(input_dir, output_dir, schema):
+def process_omop_dataset(input_dir, output_dir, schema, **kwargs):
     """
     Reads an OMOP dataset from CSV files, validates it against a schema, and writes it back to disk.
 
+    If `schema` is an `OMOPSchemaBase`, every table is streamed through its own table schema and written
+    as Parquet by `omop_schema.pipeline.convert_omop_dataset`, which receives any extra keyword arguments.
+    Passing a single flat schema dict for every file is deprecated.
+
     Args:
         input_dir (str): Path to the directory containing the OMOP dataset (CSV files).
         output_dir (str): Path to the directory where processed files will be saved.
-        schema (dict): A dictionary defining the desired schema (column name -> data type).
+        schema (OMOPSchemaBase | dict): The schema version, or a dictionary defining the desired schema
+            (column name -> data type) applied to every file.
 
     Returns:
-        None
+        dict | None: The conversion report of `convert_omop_dataset`, or None for a flat schema dict.
     """
+    if isinstance(schema, OMOPSchemaBase):
+        from .pipeline import convert_omop_dataset
+
+        return convert_omop_dataset(input_dir, output_dir, schema, **kwargs)
+
+    warnings.warn(
+        "Passing a flat schema dict to process_omop_dataset is deprecated, pass an OMOPSchemaBase instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     # Ensure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
@@ -124,17 +208,18 @@ def process_omop_dataset(input_dir, output_dir, schema):
                 # Read the CSV file into a Polars DataFrame
                 df = pl.read_csv(file_path)
 
-                # Validate and convert the DataFrame to match the schema
-                for column, dtype in schema.items():
-                    if column not in df.columns:
-                        # Add missing columns with default None values
-                        df = df.with_columns(pl.lit(None, dtype=dtype).alias(column))
-                    else:
-                        # Cast existing columns to the correct type
-                        df = df.with_columns(pl.col(column).cast(dtype))
-
-                # Select only the columns in the schema
-                df = df.select(list(schema.keys()))
+                # Add missing columns with default None values, cast existing columns, and select only the
+                # columns in the schema in a single pass
+                df = df.select(
+                    [
+                        (
+                            pl.col(column).cast(dtype)
+                            if column in df.columns
+                            else pl.lit(None, dtype=dtype).alias(column)
+                        )
+                        for column, dtype in schema.items()
+                    ]
+                )
 
                 # Write the processed DataFrame to the output directory
                 output_file_path = os.path.join(output_dir, os.path.relpath(file_path, input_dir))
@@ -0,0 +1,236 @@
+import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .dates import cast_dates, csv_convert_options
+from .pipeline import PERSON_COLUMN, _start_date_column
+from .schema.base import OMOPSchemaBase
+from .utils import _cast_to_expected, _table_files, get_table_path, load_table_polars
+
+try:
+    import polars as pl
+
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+
+class OMOPDataset:
+    """
+    Lazy view of an OMOP dataset folder, with column projection and filter pushdown.
+
+    Tables are discovered with `get_table_path` and only opened when they are scanned. Scans read only the
+    requested columns, and filters on `person_id` and on the start date of a table are pushed down into the
+    readers: Parquet row groups whose statistics rule out the filter are skipped, and CSV files only convert
+    the requested columns.
+
+    Args:
+        path (str | Path): Path to the dataset folder.
+        schema (OMOPSchemaBase): The schema version of the dataset.
+        date_formats (list[str], optional): `strptime` formats of CSV date and datetime values that are not
+            ISO 8601, e.g. `["%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]`.
+    """
+
+    def __init__(self, path, schema: OMOPSchemaBase, date_formats=None):
+        self.path = Path(path)
+        self.schema = schema
+        self.date_formats = date_formats
+        self._datasets = {}
+
+    @property
+    def table_names(self):
+        """The tables of the schema version that are present in the dataset folder."""
+        return [name for name in self.schema.get_table_names() if get_table_path(self.path, name) is not None]
+
+    def __contains__(self, table_name):
+        return (
+            table_name in self.schema.get_table_names() and get_table_path(self.path, table_name) is not None
+        )
+
+    def _table_path(self, table_name):
+        table_path = (
+            get_table_path(self.path, table_name) if table_name in self.schema.get_table_names() else None
+        )
+        if table_path is None:
+            raise KeyError(f"Table '{table_name}' is not in the dataset at {self.path}.")
+        return table_path
+
+    def arrow_dataset(self, table_name):
+        """
+        Get a table as a lazy `pyarrow.dataset.Dataset`.
+
+        CSV columns are read with the types of the table schema, except for date columns, which are read as
+        timestamps, and date and datetime columns of datasets with `date_formats`, which are read as strings,
+        see `csv_convert_options`. `scan` casts and parses them to their type.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+
+        Returns:
+            pyarrow.dataset.Dataset: The dataset of the table.
+        """
+        if table_name not in self._datasets:
+            file_format, files = _table_files(self._table_path(table_name))
+            if file_format == "csv":
+                convert_options = csv_convert_options(
+                    self.schema.get_pyarrow_schema(table_name), self.date_formats
+                )
+                file_format = ds.CsvFileFormat(convert_options=convert_options)
+            elif file_format is None:
+                raise ValueError(f"No CSV or Parquet files found for table '{table_name}'.")
+            self._datasets[table_name] = ds.dataset([str(file) for file in files], format=file_format)
+        return self._datasets[table_name]
+
+    def _parses_dates(self, table_name):
+        """Check if the date columns of a table are read as strings and parsed after the scan."""
+        date_column = _start_date_column(self.schema.get_pyarrow_schema(table_name))
+        dataset_schema = self.arrow_dataset(table_name).schema
+        return (
+            date_column is not None
+            and date_column in dataset_schema.names
+            and pa.types.is_string(dataset_schema.field(date_column).type)
+        )
+
+    def _date_filter(self, table_name, start, end, date_type):
+        date_column = self.start_date_column(table_name)
+        expressions = []
+        if start is not None:
+            expressions.append(ds.field(date_column) >= _date_scalar(start, date_type))
+        if end is not None:
+            expressions.append(ds.field(date_column) < _date_scalar(end, date_type))
+        return expressions
+
+    def _filter(self, table_name, person_ids, start, end, filter):
+        expressions = [filter] if filter is not None else []
+        if person_ids is not None:
+            expressions.append(ds.field(PERSON_COLUMN).isin(pa.array(person_ids, pa.int64())))
+        if start is not None or end is not None:
+            date_column = self.start_date_column(table_name)
+            date_type = self.arrow_dataset(table_name).schema.field(date_column).type
+            expressions += self._date_filter(table_name, start, end, date_type)
+        result = None
+        for expression in expressions:
+            result = expression if result is None else result & expression
+        return result
+
+    def start_date_column(self, table_name):
+        """
+        Get the column that date windows of a table filter on, e.g. `visit_start_date`.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+
+        Returns:
+            str: The name of the start date column.
+        """
+        date_column = _start_date_column(self.schema.get_pyarrow_schema(table_name))
+        if date_column is None:
+            raise ValueError(f"Table '{table_name}' has no date column to filter on.")
+        return date_column
+
+    def scanner(self, table_name, columns=None, person_ids=None, start=None, end=None, filter=None, **kwargs):
+        """
+        Build a scanner over a table with the columns and filters pushed down into the reader.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            columns (list[str], optional): The columns to read. Defaults to all columns.
+            person_ids (Iterable[int], optional): Only read the rows of these persons.
+            start (datetime.date | str, optional): Only read rows whose start date is on or after this date.
+            end (datetime.date | str, optional): Only read rows whose start date is before this date.
+            filter (pyarrow.dataset.Expression, optional): An additional filter.
+            **kwargs: Passed to `pyarrow.dataset.Dataset.scanner`, e.g. `batch_size`.
+
+        Returns:
+            pyarrow.dataset.Scanner: The scanner.
+
+        Raises:
+            ValueError: If `start` or `end` is given for a CSV table whose dates are parsed with
+                `date_formats` after the scan. Use `scan` instead.
+        """
+        if (start is not None or end is not None) and self._parses_dates(table_name):
+            raise ValueError(
+                f"The dates of table '{table_name}' are parsed with date formats after the scan, so date "
+                "windows cannot be pushed into the scanner. Use `scan` instead."
+            )
+        expression = self._filter(table_name, person_ids, start, end, filter)
+        return self.arrow_dataset(table_name).scanner(columns=columns, filter=expression, **kwargs)
+
+    def scan(self, table_name, columns=None, person_ids=None, start=None, end=None, filter=None):
+        """
+        Read a table with the columns and filters pushed down into the reader.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            columns (list[str], optional): The columns to read. Defaults to all columns.
+            person_ids (Iterable[int], optional): Only read the rows of these persons.
+            start (datetime.date | str, optional): Only read rows whose start date is on or after this date.
+            end (datetime.date | str, optional): Only read rows whose start date is before this date.
+            filter (pyarrow.dataset.Expression, optional): An additional filter.
+
+        The date window is pushed into the reader, except for CSV tables with `date_formats`, whose dates are
+        parsed after the scan and filtered then.
+
+        Returns:
+            pa.Table: The matching rows, cast to the table schema.
+        """
+        expected_schema = self.schema.get_pyarrow_schema(table_name)
+        if (start is None and end is None) or not self._parses_dates(table_name):
+            table = self.scanner(table_name, columns, person_ids, start, end, filter).to_table()
+            table = cast_dates(table, expected_schema, self.date_formats)
+        else:
+            date_column = self.start_date_column(table_name)
+            read_columns = None if columns is None else list(dict.fromkeys([*columns, date_column]))
+            table = self.scanner(table_name, read_columns, person_ids, filter=filter).to_table()
+            table = cast_dates(table, expected_schema, self.date_formats)
+            date_type = expected_schema.field(date_column).type
+            for expression in self._date_filter(table_name, start, end, date_type):
+                table = table.filter(expression)
+        if columns is None:
+            return _cast_to_expected(table, expected_schema)
+        expected_schema = pa.schema([field for field in expected_schema if field.name in columns])
+        return _cast_to_expected(table, expected_schema).select(columns)
+
+    def polars(self, table_name, columns=None, person_ids=None, start=None, end=None):
+        """
+        Get a table as a Polars LazyFrame with the columns and filters applied.
+
+        Polars pushes the projection and the filters down into its CSV and Parquet scans when the frame is
+        collected.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            columns (list[str], optional): The columns to read. Defaults to all columns.
+            person_ids (Iterable[int], optional): Only read the rows of these persons.
+            start (datetime.date | str, optional): Only read rows whose start date is on or after this date.
+            end (datetime.date | str, optional): Only read rows whose start date is before this date.
+
+        Returns:
+            pl.LazyFrame: The lazy frame of the table.
+        """
+        if not POLARS_AVAILABLE:
+            raise ImportError("Polars is required for OMOPDataset.polars.")
+        frame = load_table_polars(self._table_path(table_name), self.schema, date_formats=self.date_formats)
+        if person_ids is not None:
+            frame = frame.filter(pl.col(PERSON_COLUMN).is_in(list(person_ids)))
+        if start is not None or end is not None:
+            date_column = self.start_date_column(table_name)
+            date_type = self.schema.get_pyarrow_schema(table_name).field(date_column).type
+            if start is not None:
+                frame = frame.filter(pl.col(date_column) >= _date_scalar(start, date_type).as_py())
+            if end is not None:
+                frame = frame.filter(pl.col(date_column) < _date_scalar(end, date_type).as_py())
+        if columns is not None:
+            frame = frame.select(columns)
+        return frame
+
+
+def _date_scalar(value, data_type):
+    """Convert a date, datetime or ISO date string to a scalar of the type of the column it is compared to."""
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if isinstance(value, datetime.datetime) and not pa.types.is_timestamp(data_type):
+        value = value.date()
+    return pa.scalar(value).cast(data_type)
@@ -0,0 +1,224 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+
+try:
+    import polars as pl
+
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# The Arrow CSV reader only applies `timestamp_parsers` to timestamp columns, and its date parser rejects
+# date columns holding datetimes. Date columns are parsed as timestamps of this type instead, and cast to
+# their date type afterwards, which drops the time of day. The cast goes straight to the declared type, so
+# the date32 columns of `CompactOMOPSchema` take 4 bytes per value without a date64 intermediate.
+DATE_PARSE_TYPE = pa.timestamp("us")
+# The strings the Arrow CSV reader reads as null in non-string columns.
+CSV_NULL_VALUES = csv.ConvertOptions().null_values
+ISO_PATTERN = r"^\d{4}-\d{2}-\d{2}([ T]([01]\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d{1,9})?)?Z?)?$"
+# The ISO 8601 shapes of ISO_PATTERN, without fractional seconds and the UTC designator.
+ISO_FORMATS = ["%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M"]
+# Leading zeros of the numbers of a date string, which round-trip checks ignore.
+ZERO_PADDING_PATTERN = r"(^|\D)0+(\d)"
+# The ISO 8601 formats tried before custom formats by `parse_polars`.
+POLARS_ISO_FORMATS = ["%Y-%m-%d %H:%M:%S%.f", "%Y-%m-%dT%H:%M:%S%.f", "%Y-%m-%d"]
+
+
+def _is_date(data_type):
+    return pa.types.is_date32(data_type) or pa.types.is_date64(data_type)
+
+
+def _is_temporal(data_type):
+    return _is_date(data_type) or pa.types.is_timestamp(data_type)
+
+
+def _round_trips(parsed, values, date_format):
+    """
+    Check that parsed values format back to their strings.
+
+    strptime rolls impossible dates such as 2020-02-30 forward instead of failing, which formatting them
+    back reveals. Leading zeros are ignored, as `%d` and `%m` also parse values that are not zero-padded.
+    """
+    # strftime writes the fraction of sub-second units with `%S`, which strptime never parses.
+    formatted = pc.strftime(parsed.cast(pa.timestamp("s"), safe=False), format=date_format)
+    return pc.equal(
+        pc.replace_substring_regex(formatted, ZERO_PADDING_PATTERN, r"\1\2"),
+        pc.replace_substring_regex(values, ZERO_PADDING_PATTERN, r"\1\2"),
+    )
+
+
+def _parse_iso(values, parse_type):
+    """Parse ISO 8601 strings into `parse_type`, with null for values that are not valid datetimes."""
+    values = pc.if_else(pc.match_substring_regex(values, ISO_PATTERN), values, pa.scalar(None, values.type))
+    # strptime does not parse fractional seconds or the UTC designator, so they are stripped and the
+    # fraction is added back as a duration.
+    stripped = pc.replace_substring_regex(values, r"(\.\d+)?Z?$", "")
+    parsed = pc.coalesce(
+        *[
+            pc.strptime(stripped, format=iso_format, unit=parse_type.unit, error_is_null=True)
+            for iso_format in ISO_FORMATS
+        ]
+    )
+    valid = _round_trips(parsed, pc.utf8_slice_codeunits(values, 0, 10), "%Y-%m-%d")
+    fraction = pc.struct_field(pc.extract_regex(values, r"\.(?P<fraction>\d+)"), [0])
+    nanoseconds = pc.utf8_rpad(pc.fill_null(fraction, ""), width=9, padding="0").cast(pa.int64())
+    per_unit = 10 ** (9 - {"s": 0, "ms": 3, "us": 6, "ns": 9}[parse_type.unit])
+    # Fractions finer than the unit would be truncated, so they are invalid.
+    valid = pc.and_(valid, pc.equal(pc.remainder(nanoseconds, per_unit), 0))
+    offset = pc.divide(nanoseconds, per_unit).cast(pa.duration(parse_type.unit))
+    return pc.if_else(valid, pc.add(parsed, offset), pa.scalar(None, parse_type))
+
+
+def parse_dates(values, target_type, date_formats=None):
+    """
+    Parse strings as ISO 8601 and then with each of `date_formats` in order, into a date or timestamp type.
+
+    Values are parsed with one vectorized `strptime` call per format. Values that match no format, and
+    impossible dates such as 30/02/2020 that `strptime` would roll forward, become null.
+
+    Args:
+        values (pa.Array | pa.ChunkedArray): The strings.
+        target_type (pa.DataType): A date or timestamp type.
+        date_formats (Iterable[str], optional): `strptime` formats of the values that are not ISO 8601.
+
+    Returns:
+        pa.Array | pa.ChunkedArray: The parsed values.
+    """
+    # Dates are parsed as timestamps, so that date columns holding datetimes are parsed as well.
+    parse_type = pa.timestamp(target_type.unit) if pa.types.is_timestamp(target_type) else DATE_PARSE_TYPE
+    parsed = [_parse_iso(values, parse_type)]
+    for date_format in date_formats or []:
+        values_parsed = pc.strptime(values, format=date_format, unit=parse_type.unit, error_is_null=True)
+        valid = _round_trips(values_parsed, values, date_format)
+        parsed.append(pc.if_else(valid, values_parsed, pa.scalar(None, values_parsed.type)).cast(parse_type))
+    return pc.coalesce(*parsed).cast(target_type)
+
+
+def csv_column_types(table_schema, date_formats=None):
+    """
+    Get the types the columns of a table are parsed into by the CSV reader.
+
+    These are the types of the table schema, except for date columns, which are parsed as `DATE_PARSE_TYPE`.
+    With `date_formats`, date and datetime columns are read as strings instead, for `cast_dates` to parse.
+
+    Args:
+        table_schema (pa.Schema): The schema of the table.
+        date_formats (Iterable[str], optional): `strptime` formats of the date and datetime values.
+
+    Returns:
+        pa.Schema: The schema to parse with.
+    """
+    fields = []
+    for field in table_schema:
+        if date_formats and _is_temporal(field.type):
+            field = field.with_type(pa.string())
+        elif _is_date(field.type):
+            field = field.with_type(DATE_PARSE_TYPE)
+        fields.append(field)
+    return pa.schema(fields, metadata=table_schema.metadata)
+
+
+def csv_convert_options(table_schema, date_formats=None, **kwargs):
+    """
+    Build CSV convert options that parse the columns of a table straight into their types.
+
+    ISO 8601 date and datetime values are parsed natively by the reader, without a string intermediate.
+    Date columns are parsed as timestamps. The reader's `strptime` parsers roll impossible dates such as
+    30/02/2020 forward, so with `date_formats`, date and datetime columns are read as strings and parsed with
+    the checks of `parse_dates`. Use `cast_dates` to cast or parse them to their type.
+
+    Args:
+        table_schema (pa.Schema): The schema of the table. Columns missing from the file are ignored.
+        date_formats (Iterable[str], optional): `strptime` formats of the date and datetime values, e.g.
+            `["%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]`. Defaults to ISO 8601 only.
+        **kwargs: Passed to `pyarrow.csv.ConvertOptions`, e.g. `include_columns`.
+
+    Returns:
+        pyarrow.csv.ConvertOptions: The convert options.
+    """
+    return csv.ConvertOptions(
+        column_types=csv_column_types(table_schema, date_formats),
+        timestamp_parsers=[csv.ISO8601],
+        **kwargs,
+    )
+
+
+def cast_dates(data, table_schema, date_formats=None):
+    """
+    Cast the date and datetime columns of a table or batch read with `csv_convert_options` to their type.
+
+    Date columns parsed as timestamps are cast to their date type. Columns read as strings are parsed with
+    `parse_dates`, with the CSV null values as null.
+
+    Args:
+        data (pa.Table | pa.RecordBatch): The data, e.g. read with `csv_convert_options`.
+        table_schema (pa.Schema): The schema of the table.
+        date_formats (Iterable[str], optional): `strptime` formats of the date and datetime values.
+
+    Returns:
+        pa.Table | pa.RecordBatch: The data with its date and datetime columns cast.
+
+    Raises:
+        pa.ArrowInvalid: If a string value is not a valid date or datetime.
+    """
+    null_values = pa.array(CSV_NULL_VALUES, pa.string())
+    for field in table_schema:
+        index = data.schema.get_field_index(field.name)
+        if index < 0 or not _is_temporal(field.type):
+            continue
+        column = data.column(index)
+        if _is_date(field.type) and pa.types.is_timestamp(column.type):
+            data = data.set_column(index, field, column.cast(field.type))
+        elif pa.types.is_string(column.type):
+            column = pc.if_else(pc.is_in(column, value_set=null_values), pa.scalar(None, column.type), column)
+            parsed = parse_dates(column, field.type, date_formats)
+            if parsed.null_count > column.null_count:
+                invalid = column.filter(pc.and_(column.is_valid(), parsed.is_null()))
+                raise pa.ArrowInvalid(
+                    f"Column '{field.name}': invalid {field.type} value '{invalid[0]}', expected ISO 8601 or "
+                    f"one of the date formats {list(date_formats or [])}."
+                )
+            data = data.set_column(index, field, parsed)
+    return data
+
+
+def parse_polars(expression, dtype, date_formats=None):
+    """
+    Parse a Polars string expression into a date or datetime.
+
+    With `date_formats`, values are parsed as ISO 8601 first and then with each of the formats in order, like
+    `csv_convert_options`. Like the parse without formats, the expression fails when it is evaluated if a
+    value matches none of them.
+
+    Args:
+        expression (pl.Expr): The string expression.
+        dtype (pl.DataType): `pl.Date` or a `pl.Datetime` type.
+        date_formats (Iterable[str], optional): `strptime` formats. Without formats, the format of the column
+            is inferred from its values.
+
+    Returns:
+        pl.Expr: The parsed expression.
+    """
+    if not date_formats:
+        if dtype == pl.Date:
+            return expression.str.to_date()
+        return expression.str.to_datetime(time_unit=dtype.time_unit, time_zone=dtype.time_zone)
+    time_unit, time_zone = ("us", None) if dtype == pl.Date else (dtype.time_unit, dtype.time_zone)
+    formats = [*POLARS_ISO_FORMATS, *date_formats]
+    parsed = pl.coalesce(
+        [
+            expression.str.to_datetime(date_format, time_unit=time_unit, time_zone=time_zone, strict=False)
+            for date_format in formats
+        ]
+    )
+    # Values that match no format are parsed again strictly, on their own, so that they raise with the
+    # offending values listed instead of silently becoming null.
+    unparsed = pl.when(parsed.is_null()).then(expression)
+    parsed = pl.coalesce(
+        [
+            parsed,
+            unparsed.str.to_datetime(formats[-1], time_unit=time_unit, time_zone=time_zone, strict=True),
+        ]
+    )
+    return parsed.dt.date() if dtype == pl.Date else parsed
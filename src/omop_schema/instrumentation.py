@@ -0,0 +1,306 @@
+import functools
+import inspect
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+class _NullStage:
+    """Stage of the `NullCollector`, shared by all stages, which records nothing."""
+
+    __slots__ = ()
+
+    def add(self, name, value=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullCollector:
+    """
+    Collector that discards all measurements. It is the default, so uninstrumented runs only pay for a few
+    function calls per table.
+    """
+
+    def stage(self, name, **labels):
+        return _NULL_STAGE
+
+    def count(self, name, value=1, **labels):
+        pass
+
+
+class _Stage:
+    """A timed stage of an `InMemoryCollector`, with counters that are recorded when the stage ends."""
+
+    __slots__ = ("collector", "name", "labels", "counts", "start")
+
+    def __init__(self, collector, name, labels):
+        self.collector = collector
+        self.name = name
+        self.labels = labels
+        self.counts = {}
+
+    def add(self, name, value=1):
+        """Add `value` to the counter `name` of the stage, e.g. "rows" or "bytes_read"."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.collector._record_stage(self, time.perf_counter() - self.start)
+        return False
+
+
+def peak_rss_bytes():
+    """The peak resident memory of the process in bytes, or None if it is not available on this platform."""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class InMemoryCollector:
+    """
+    Collector that aggregates measurements in memory.
+
+    Stages are aggregated by name and labels into the number of calls, the total and the maximum seconds.
+    Counters, such as the rows, batches and bytes read by a stage or the values cast per column, are summed
+    by name and labels. When a stage ends, the peak resident memory of the process and the peak memory of
+    the Arrow memory pool are recorded as gauges. The collector is thread-safe; measurements taken in
+    worker processes are not collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def stage(self, name, **labels):
+        """
+        Time a stage.
+
+        Args:
+            name (str): The name of the stage, e.g. "load_table.read".
+            **labels: Labels of the stage, e.g. `table="person"`.
+
+        Returns:
+            A context manager whose `add(name, value)` method counts e.g. rows within the stage.
+        """
+        return _Stage(self, name, labels)
+
+    def count(self, name, value=1, **labels):
+        """Add `value` to the counter `name` with the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _record_stage(self, stage, seconds):
+        labels = tuple(sorted(stage.labels.items()))
+        counter_labels = tuple(sorted({**stage.labels, "stage": stage.name}.items()))
+        peaks = {
+            "peak_rss_bytes": peak_rss_bytes(),
+            "arrow_peak_bytes": pa.default_memory_pool().max_memory(),
+        }
+        with self._lock:
+            calls, total, longest = self.stages.get((stage.name, labels), (0, 0.0, 0.0))
+            self.stages[(stage.name, labels)] = (calls + 1, total + seconds, max(longest, seconds))
+            for name, value in stage.counts.items():
+                key = (name, counter_labels)
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, value in peaks.items():
+                if value is not None:
+                    self.gauges[name] = max(self.gauges.get(name, 0), value)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def to_dict(self):
+        """
+        Export the measurements as a JSON-serializable dict.
+
+        Returns:
+            dict: The "stages" with their "stage", "labels", "calls", "seconds" and "max_seconds", the
+            "counters" with their "name", "labels" and "value", and the "gauges" by name.
+        """
+        with self._lock:
+            return {
+                "stages": [
+                    {
+                        "stage": name,
+                        "labels": dict(labels),
+                        "calls": calls,
+                        "seconds": total,
+                        "max_seconds": longest,
+                    }
+                    for (name, labels), (calls, total, longest) in self.stages.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "gauges": dict(self.gauges),
+            }
+
+    def to_json(self, path=None):
+        """
+        Export the measurements as JSON.
+
+        Args:
+            path (str | Path, optional): If given, the JSON is also written to this file.
+
+        Returns:
+            str: The JSON document.
+        """
+        document = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(document)
+        return document
+
+    def to_prometheus(self, prefix="omop_schema"):
+        """
+        Export the measurements in the Prometheus text exposition format.
+
+        Stages become the counters `<prefix>_stage_seconds_total` and `<prefix>_stage_calls_total` with a
+        `stage` label, every counter becomes `<prefix>_<name>_total` and every gauge `<prefix>_<name>`.
+
+        Args:
+            prefix (str): The prefix of the metric names.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        metrics = self.to_dict()
+        families = {}
+        for stage in metrics["stages"]:
+            labels = {"stage": stage["stage"], **stage["labels"]}
+            families.setdefault(("stage_seconds_total", "counter"), []).append((labels, stage["seconds"]))
+            families.setdefault(("stage_calls_total", "counter"), []).append((labels, stage["calls"]))
+        for counter in metrics["counters"]:
+            family = (f"{_metric_name(counter['name'])}_total", "counter")
+            families.setdefault(family, []).append((counter["labels"], counter["value"]))
+        for name, value in metrics["gauges"].items():
+            families.setdefault((_metric_name(name), "gauge"), []).append(({}, value))
+
+        lines = []
+        for (name, metric_type), samples in families.items():
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{_prometheus_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values()
+    )
+    return "{" + ",".join(f'{_metric_name(key)}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+_collector = NullCollector()
+
+
+def get_collector():
+    """Get the active collector."""
+    return _collector
+
+
+def set_collector(collector):
+    """
+    Set the collector that instrumented functions report to. Pass None to restore the `NullCollector`.
+
+    Returns:
+        The previously active collector.
+    """
+    global _collector
+    previous = _collector
+    _collector = collector if collector is not None else NullCollector()
+    return previous
+
+
+@contextmanager
+def collecting(collector=None):
+    """
+    Context manager that activates a collector for the duration of the block.
+
+    Args:
+        collector (optional): The collector. Defaults to a new `InMemoryCollector`.
+
+    Yields:
+        The active collector.
+    """
+    collector = collector if collector is not None else InMemoryCollector()
+    previous = set_collector(collector)
+    try:
+        yield collector
+    finally:
+        set_collector(previous)
+
+
+def stage(name, **labels):
+    """Time a stage with the active collector. See `InMemoryCollector.stage`."""
+    return _collector.stage(name, **labels)
+
+
+def staged(name, **label_arguments):
+    """
+    Decorator that times every call of a function as a stage of the active collector.
+
+    Args:
+        name (str): The name of the stage.
+        **label_arguments: Labels of the stage taken from the arguments of the call, as label name to argument
+            name, e.g. `table="table_name"`.
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            labels = {}
+            if label_arguments:
+                arguments = signature.bind(*args, **kwargs).arguments
+                labels = {label: arguments[argument] for label, argument in label_arguments.items()}
+            with _collector.stage(name, **labels):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value=1, **labels):
+    """Add `value` to a counter of the active collector."""
+    _collector.count(name, value, **labels)
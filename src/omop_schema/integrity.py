@@ -0,0 +1,139 @@
+from collections import defaultdict
+
+import numpy as np
+
+from .schema.base import OMOPSchemaBase
+from .utils import (
+    DEFAULT_BATCH_SIZE,
+    get_table_path,
+    iter_table_batches,
+    read_table_schema,
+)
+
+DEFAULT_MAX_SAMPLES = 10
+
+
+def _iter_key_values(table_path, column, schema, batch_size, partition, num_partitions):
+    """Stream the non-null values of a single integer column, restricted to one hash partition."""
+    for batch in iter_table_batches(table_path, schema=schema, batch_size=batch_size, columns=[column]):
+        values = batch.column(0).drop_null().to_numpy(zero_copy_only=False)
+        if num_partitions > 1:
+            values = values[np.abs(values) % num_partitions == partition]
+        yield values
+
+
+def _collect_keys(table_path, column, schema, batch_size, partition, num_partitions):
+    """Collect the sorted, unique key values of one partition of a referenced table."""
+    chunks = [
+        np.unique(values)
+        for values in _iter_key_values(table_path, column, schema, batch_size, partition, num_partitions)
+    ]
+    return np.unique(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.int64)
+
+
+def _is_in_sorted(values, sorted_keys):
+    """Vectorized membership test of `values` in the sorted array `sorted_keys`."""
+    if not len(sorted_keys):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_keys, values)
+    return sorted_keys[np.minimum(positions, len(sorted_keys) - 1)] == values
+
+
+def check_foreign_keys(
+    dataset_path,
+    schema: OMOPSchemaBase,
+    foreign_keys=None,
+    num_partitions=1,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_samples=DEFAULT_MAX_SAMPLES,
+):
+    """
+    Check the referential integrity of an OMOP dataset and count orphaned foreign key values.
+
+    For every referenced key (e.g. `person.person_id`), the sorted set of its unique values is collected by
+    streaming only that column. The referencing columns are then streamed batch by batch and anti-joined
+    against that set with a vectorized binary search, so event tables are never loaded into memory. With
+    `num_partitions` > 1, keys are split into hash partitions that are checked one after another. This
+    bounds the memory for the key set to one partition, at the cost of reading the columns once per
+    partition.
+
+    Null foreign key values are not orphans.
+
+    Args:
+        dataset_path (str | Path): Path to the dataset folder.
+        schema (OMOPSchemaBase): The schema version, which declares the foreign keys.
+        foreign_keys (list[tuple], optional): (table, column, referenced table, referenced column) tuples to
+            check. Defaults to `schema.get_foreign_keys()`.
+        num_partitions (int): Number of hash partitions of the key space.
+        batch_size (int): Maximum number of rows read per batch.
+        max_samples (int): Maximum number of orphaned values reported per relationship.
+
+    Returns:
+        list[dict]: One dict per relationship with the "table", "column", "referenced_table",
+        "referenced_column", a "status" ("checked", "missing_table", "missing_column",
+        "missing_referenced_table" or "missing_referenced_column"), the number of non-null values
+        "checked", the number of "orphans" and "sample_orphans" values.
+    """
+    if foreign_keys is None:
+        foreign_keys = schema.get_foreign_keys()
+
+    table_paths, table_columns = {}, {}
+    for table_name in {key[0] for key in foreign_keys} | {key[2] for key in foreign_keys}:
+        table_paths[table_name] = get_table_path(dataset_path, table_name)
+        if table_paths[table_name] is not None:
+            table_schema = read_table_schema(table_paths[table_name])
+            table_columns[table_name] = set(table_schema.names) if table_schema is not None else set()
+
+    results = []
+    by_reference = defaultdict(list)
+    for table_name, column, referenced_table, referenced_column in foreign_keys:
+        result = {
+            "table": table_name,
+            "column": column,
+            "referenced_table": referenced_table,
+            "referenced_column": referenced_column,
+            "status": "checked",
+            "checked": 0,
+            "orphans": 0,
+            "sample_orphans": [],
+        }
+        if table_paths[table_name] is None:
+            result["status"] = "missing_table"
+        elif column not in table_columns[table_name]:
+            result["status"] = "missing_column"
+        elif table_paths[referenced_table] is None:
+            result["status"] = "missing_referenced_table"
+        elif referenced_column not in table_columns[referenced_table]:
+            result["status"] = "missing_referenced_column"
+        else:
+            by_reference[(referenced_table, referenced_column)].append(result)
+        results.append(result)
+
+    for (referenced_table, referenced_column), references in by_reference.items():
+        for partition in range(num_partitions):
+            keys = _collect_keys(
+                table_paths[referenced_table],
+                referenced_column,
+                schema,
+                batch_size,
+                partition,
+                num_partitions,
+            )
+            for result in references:
+                for values in _iter_key_values(
+                    table_paths[result["table"]],
+                    result["column"],
+                    schema,
+                    batch_size,
+                    partition,
+                    num_partitions,
+                ):
+                    orphans = values[~_is_in_sorted(values, keys)]
+                    result["checked"] += len(values)
+                    result["orphans"] += len(orphans)
+                    if len(orphans) and len(result["sample_orphans"]) < max_samples:
+                        samples = set(result["sample_orphans"]) | set(
+                            np.unique(orphans)[:max_samples].tolist()
+                        )
+                        result["sample_orphans"] = sorted(samples)[:max_samples]
+    return results
@@ -0,0 +1,161 @@
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .pipeline import PERSON_COLUMN
+from .utils import _table_files, get_table_path
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+
+
+class PersonIndex:
+    """
+    Index of the `person_id` range of every row group of a Parquet table, for fast patient lookups.
+
+    The ranges are taken from the row group statistics when the index is built, and the files stay open until
+    `close` is called or the `with` block of the index ends, so repeated lookups only read the row groups that
+    can contain the requested persons. Lookups are fastest on
+    tables written with `convert_omop_dataset(..., sort_by_person=True)`, where every row group covers a
+    narrow range of persons. Row groups without statistics are always read.
+
+    Args:
+        path (str | Path): Path to a Parquet file, or a directory of Parquet files.
+        person_column (str): The name of the person id column.
+    """
+
+    def __init__(self, path, person_column=PERSON_COLUMN):
+        file_format, files = _table_files(Path(path))
+        if file_format != "parquet":
+            raise ValueError(f"No Parquet files found at {path}.")
+        self.person_column = person_column
+        self.files = [pq.ParquetFile(file) for file in files]
+        self.schema = self.files[0].schema_arrow
+        if person_column not in self.schema.names:
+            raise ValueError(f"Table at {path} has no {person_column} column.")
+
+        file_indices, row_groups, mins, maxs = [], [], [], []
+        for file_index, parquet_file in enumerate(self.files):
+            column_index = parquet_file.schema_arrow.get_field_index(person_column)
+            for row_group in range(parquet_file.num_row_groups):
+                metadata = parquet_file.metadata.row_group(row_group)
+                if metadata.num_rows == 0:
+                    continue
+                statistics = metadata.column(column_index).statistics
+                has_range = statistics is not None and statistics.has_min_max
+                file_indices.append(file_index)
+                row_groups.append(row_group)
+                mins.append(statistics.min if has_range else INT64_MIN)
+                maxs.append(statistics.max if has_range else INT64_MAX)
+        self._file_indices = np.array(file_indices, dtype=np.intp)
+        self._row_groups = np.array(row_groups, dtype=np.intp)
+        self._mins = np.array(mins, dtype=np.int64)
+        self._maxs = np.array(maxs, dtype=np.int64)
+
+    def close(self):
+        """Close the Parquet files of the index."""
+        for parquet_file in self.files:
+            parquet_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @property
+    def num_row_groups(self):
+        return len(self._row_groups)
+
+    def row_groups(self, person_ids):
+        """
+        Find the row groups that can contain any of the given persons.
+
+        Args:
+            person_ids (Iterable[int]): The person ids.
+
+        Returns:
+            list[tuple[int, int]]: The (file index, row group) pairs to read.
+        """
+        person_ids = np.unique(np.asarray(person_ids, dtype=np.int64))
+        # A row group can only contain a person if some requested id lies within its [min, max] range.
+        selected = np.searchsorted(person_ids, self._maxs, side="right") > np.searchsorted(
+            person_ids, self._mins, side="left"
+        )
+        return list(zip(self._file_indices[selected].tolist(), self._row_groups[selected].tolist()))
+
+    def read(self, person_ids, columns=None):
+        """
+        Read the rows of the given persons.
+
+        Args:
+            person_ids (Iterable[int]): The person ids.
+            columns (list[str], optional): The columns to read. Defaults to all columns.
+
+        Returns:
+            pa.Table: The rows of the given persons, in file order.
+        """
+        person_ids = pa.array(np.unique(np.asarray(person_ids, dtype=np.int64)))
+        read_columns = columns
+        if columns is not None and self.person_column not in columns:
+            read_columns = [*columns, self.person_column]
+
+        by_file = {}
+        for file_index, row_group in self.row_groups(person_ids.to_numpy()):
+            by_file.setdefault(file_index, []).append(row_group)
+        tables = []
+        for file_index, row_groups in by_file.items():
+            table = self.files[file_index].read_row_groups(row_groups, columns=read_columns)
+            person_column = table[self.person_column].cast(pa.int64())
+            tables.append(table.filter(pc.is_in(person_column, value_set=person_ids)))
+
+        if tables:
+            table = pa.concat_tables(tables)
+        else:
+            table = self.schema.empty_table()
+            if read_columns is not None:
+                table = table.select(read_columns)
+        return table.select(columns) if columns is not None else table
+
+
+def read_persons(path, person_ids, columns=None, person_column=PERSON_COLUMN):
+    """
+    Read the rows of a list of persons from a Parquet table, skipping row groups by their statistics.
+
+    To look up persons repeatedly, build a `PersonIndex` once and call its `read` method instead.
+
+    Args:
+        path (str | Path): Path to a Parquet file, or a directory of Parquet files.
+        person_ids (Iterable[int]): The person ids.
+        columns (list[str], optional): The columns to read. Defaults to all columns.
+        person_column (str): The name of the person id column.
+
+    Returns:
+        pa.Table: The rows of the given persons.
+    """
+    with PersonIndex(path, person_column=person_column) as index:
+        return index.read(person_ids, columns=columns)
+
+
+def read_person_tables(dataset_path, person_ids, table_names):
+    """
+    Read the rows of a list of persons from several tables of a Parquet dataset, e.g. to assemble timelines.
+
+    Args:
+        dataset_path (str | Path): Path to the dataset folder, e.g. written by `convert_omop_dataset`.
+        person_ids (Iterable[int]): The person ids.
+        table_names (Iterable[str]): The tables to read. Tables missing from the dataset are skipped.
+
+    Returns:
+        dict: The rows of the given persons for each table.
+    """
+    tables = {}
+    for table_name in table_names:
+        table_path = get_table_path(dataset_path, table_name)
+        if table_path is not None:
+            tables[table_name] = read_persons(table_path, person_ids)
+    return tables
@@ -0,0 +1,502 @@
+import logging
+import os
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .convert import convert_to_schema
+from .parallel import estimate_memory, run_parallel
+from .pipeline import DEFAULT_MEMORY_LIMIT, DEFAULT_ROW_GROUP_SIZE
+from .schema.v4 import OMOPSchemaV4
+from .schema.v5_0 import OMOPSchemaV5
+from .schema.v5_3 import OMOPSchemaV53
+from .schema.v5_4 import OMOPSchemaV54
+from .utils import (
+    DEFAULT_BATCH_SIZE,
+    RowGroupWriter,
+    atomic_write_path,
+    get_table_path,
+    iter_table_batches,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def row_number(batch, row_offset):
+    """Derive a new surrogate key: the 1-based number of each row in the migrated table."""
+    return pa.array(np.arange(row_offset + 1, row_offset + 1 + batch.num_rows), pa.int64())
+
+
+def constant(batch, row_offset, value, data_type):
+    """Derive a column holding the same value in every row, see `partial`."""
+    return pa.array(np.broadcast_to(value, batch.num_rows), data_type)
+
+
+def standard_concept_from_level(batch, row_offset):
+    """Derive the v5 `standard_concept` flag from the v4 `concept_level`: level 0 is not standard."""
+    level = batch.column("concept_level")
+    return pc.if_else(pc.equal(level, 0), pa.scalar(None, pa.string()), pa.scalar("S"))
+
+
+class TableMigration:
+    """
+    Declarative migration of one source table into a table of the next schema version.
+
+    Columns are first renamed, then derived columns are added, and finally the batch is converted to the
+    target table schema: columns are cast to their new types, columns added by the version are filled with
+    nulls and all other columns are dropped. Columns dropped on purpose are listed in `drops`; dropping any
+    other column is logged as a warning.
+
+    Args:
+        source (str, optional): The source table. Defaults to the target table.
+        renames (dict, optional): Maps source column names to target column names.
+        derive (dict, optional): Maps target column names to functions `(batch, row_offset) -> pa.Array` that
+            compute them from the renamed batch. `row_offset` is the number of rows of the target table
+            migrated before the batch. Functions must be picklable to migrate in a process pool.
+        drops (Iterable[str], optional): Source columns that the target version no longer holds.
+    """
+
+    def __init__(self, source=None, renames=None, derive=None, drops=()):
+        self.source = source
+        self.renames = dict(renames or {})
+        self.derive = dict(derive or {})
+        self.drops = frozenset(drops)
+
+    def apply(self, batch, row_offset=0):
+        """
+        Rename and derive the columns of a source batch.
+
+        Args:
+            batch (pa.RecordBatch): A batch of the source table.
+            row_offset (int): The number of rows of the target table migrated before this batch.
+
+        Returns:
+            pa.RecordBatch: The renamed and derived batch, before its conversion to the target schema.
+        """
+        batch = batch.rename_columns([self.renames.get(name, name) for name in batch.schema.names])
+        for column, function in self.derive.items():
+            values = function(batch, row_offset)
+            index = batch.schema.get_field_index(column)
+            if index >= 0:
+                batch = batch.set_column(index, column, values)
+            else:
+                batch = batch.append_column(column, values)
+        return batch
+
+
+class Migration:
+    """
+    Declarative migration between two consecutive schema versions.
+
+    Every table of the target version is migrated from the table of the same name, unless `tables` declares
+    its sources. A table with several sources is the concatenation of their migrated rows, which merges
+    tables. Source tables that no target table is migrated from are dropped.
+
+    Args:
+        source (type): The schema class migrated from, e.g. `OMOPSchemaV53`.
+        target (type): The schema class migrated to, e.g. `OMOPSchemaV54`.
+        tables (dict, optional): Maps target table names to a `TableMigration` or a list of them.
+        new_tables (Iterable[str], optional): Tables introduced by the target version. They are written even
+            when the source dataset has nothing to migrate into them.
+        dropped_tables (Iterable[str], optional): Source tables that the target version no longer holds.
+    """
+
+    def __init__(self, source, target, tables=None, new_tables=(), dropped_tables=()):
+        self.source = source
+        self.target = target
+        self.tables = {
+            table_name: specs if isinstance(specs, list) else [specs]
+            for table_name, specs in (tables or {}).items()
+        }
+        self.new_tables = frozenset(new_tables)
+        self.dropped_tables = frozenset(dropped_tables)
+
+    def __repr__(self):
+        return f"Migration({self.source.__name__} -> {self.target.__name__})"
+
+    def sources(self, table_name):
+        """
+        Get the migrations of the source tables of a target table.
+
+        Args:
+            table_name (str): The name of the target table.
+
+        Returns:
+            list[TableMigration]: The migrations, in the order their rows are written.
+        """
+        return self.tables.get(table_name) or [TableMigration()]
+
+
+_COST_RENAMES = {
+    "paid_copay": "paid_patient_copay",
+    "paid_coinsurance": "paid_patient_coinsurance",
+    "paid_toward_deductible": "paid_patient_deductible",
+    "total_out_of_pocket": "paid_by_patient",
+}
+_VISIT_RENAMES = {
+    "admitting_source_concept_id": "admitted_from_concept_id",
+    "admitting_source_value": "admitted_from_source_value",
+    "discharge_to_concept_id": "discharged_to_concept_id",
+    "discharge_to_source_value": "discharged_to_source_value",
+}
+
+
+def _cost_migration(domain_id, event_column, renames=None, drops=()):
+    """Migrate a v5.0 `<domain>_cost` table into the v5.3 `cost` table, with new `cost_id`s."""
+    return TableMigration(
+        source=f"{domain_id.lower()}_cost",
+        renames={event_column: "cost_event_id", **_COST_RENAMES, **(renames or {})},
+        derive={
+            "cost_id": row_number,
+            "cost_domain_id": partial(constant, value=domain_id, data_type=pa.string()),
+        },
+        drops={f"{domain_id.lower()}_cost_id", "paid_by_coordination_benefits", *drops},
+    )
+
+
+MIGRATIONS = [
+    Migration(
+        OMOPSchemaV4,
+        OMOPSchemaV5,
+        tables={
+            "concept": TableMigration(
+                renames={"concept_class": "concept_class_id"},
+                derive={"standard_concept": standard_concept_from_level},
+                drops={"concept_level"},
+            ),
+            # English is the language of all v4 synonyms.
+            "concept_synonym": TableMigration(
+                derive={"language_concept_id": partial(constant, value=4180186, data_type=pa.int64())},
+                drops={"concept_synonym_id"},
+            ),
+            # Units are source strings in v4 and concepts in v5; they are looked up in the v5 vocabulary.
+            "drug_strength": TableMigration(
+                renames={"concentration_value": "numerator_value"},
+                drops={"amount_unit", "concentration_enum_unit", "concentration_denom_unit"},
+            ),
+            "relationship": TableMigration(renames={"reverse_relationship": "reverse_relationship_id"}),
+            "source_to_concept_map": TableMigration(drops={"mapping_type", "primary_map"}),
+        },
+        new_tables={
+            "attribute_definition",
+            "cdm_source",
+            "cohort_attribute",
+            "concept_class",
+            "device_cost",
+            "domain",
+            "fact_relationship",
+        },
+    ),
+    Migration(
+        OMOPSchemaV5,
+        OMOPSchemaV53,
+        tables={
+            "cost": [
+                _cost_migration(
+                    "Drug",
+                    "drug_exposure_id",
+                    renames={
+                        "ingredient_cost": "paid_ingredient_cost",
+                        "dispensing_fee": "paid_dispensing_fee",
+                    },
+                    drops={"average_wholesale_price"},
+                ),
+                _cost_migration("Procedure", "procedure_occurrence_id"),
+                _cost_migration("Visit", "visit_occurrence_id"),
+                _cost_migration("Device", "device_exposure_id"),
+            ],
+            "provider": TableMigration(renames={"NPI": "npi", "DEA": "dea"}),
+        },
+        new_tables={"cost", "metadata", "note_nlp", "visit_detail"},
+        dropped_tables={"cohort", "cohort_attribute"},
+    ),
+    Migration(
+        OMOPSchemaV53,
+        OMOPSchemaV54,
+        tables={
+            "visit_occurrence": TableMigration(renames=_VISIT_RENAMES),
+            "visit_detail": TableMigration(
+                renames={**_VISIT_RENAMES, "visit_detail_parent_id": "parent_visit_detail_id"},
+                drops={"preceding_visit_detail_id"},
+            ),
+            "metadata": TableMigration(derive={"metadata_id": row_number}),
+        },
+        new_tables={"cohort", "episode", "episode_event"},
+    ),
+]
+
+
+def _schema_class(schema):
+    return schema if isinstance(schema, type) else type(schema)
+
+
+def migration_path(source, target):
+    """
+    Get the consecutive migrations from one schema version to a later one.
+
+    Args:
+        source (OMOPSchemaBase | type): The schema version migrated from, e.g. `OMOPSchemaV53`.
+        target (OMOPSchemaBase | type): The schema version migrated to, e.g. `OMOPSchemaV54()`.
+
+    Returns:
+        list[Migration]: The migrations, in order.
+
+    Raises:
+        ValueError: If there is no migration path between the versions.
+    """
+    source, target = _schema_class(source), _schema_class(target)
+    path, current = [], source
+    for migration in MIGRATIONS:
+        if current is target:
+            break
+        if migration.source is current:
+            path.append(migration)
+            current = migration.target
+    if current is not target or not path:
+        raise ValueError(f"No migration from {source.__name__} to {target.__name__}.")
+    return path
+
+
+def _has_input(input_dir, table_name, steps):
+    """Check whether any file of the input dataset is migrated into a table of the last version."""
+    if not steps:
+        return get_table_path(input_dir, table_name) is not None
+    return any(
+        _has_input(input_dir, spec.source or table_name, steps[:-1]) for spec in steps[-1].sources(table_name)
+    )
+
+
+def _source_tables(table_name, steps):
+    """Get the tables of the first version that are migrated into a table of the last version."""
+    if not steps:
+        return {table_name}
+    return set().union(
+        *(_source_tables(spec.source or table_name, steps[:-1]) for spec in steps[-1].sources(table_name))
+    )
+
+
+def _record_dropped_columns(step, table_name, spec, batch, target_schema, dropped_columns):
+    dropped = [name for name in batch.schema.names if name not in target_schema.names]
+    undeclared = [name for name in dropped if name not in spec.drops]
+    if undeclared:
+        logger.warning(
+            f"{step}: dropping columns {undeclared} of table '{spec.source or table_name}', which are not "
+            f"in table '{table_name}' of the target version"
+        )
+    if dropped_columns is not None and dropped:
+        dropped_columns.setdefault(table_name, []).extend(
+            name for name in dropped if name not in dropped_columns.get(table_name, [])
+        )
+
+
+def iter_migrated_batches(
+    input_dir,
+    table_name,
+    steps,
+    batch_size=DEFAULT_BATCH_SIZE,
+    memory_limit=None,
+    errors="raise",
+    dropped_columns=None,
+):
+    """
+    Stream a table of the last version of a migration path, migrated from the tables of a source dataset.
+
+    The migration steps are chained lazily: every batch read from the source files is migrated through all
+    steps before the next batch is read, so memory stays bounded by the batch size.
+
+    Args:
+        input_dir (str | Path): The directory of the source dataset, in the version of the first step.
+        table_name (str): The name of the table in the last version.
+        steps (list[Migration]): The migrations, see `migration_path`.
+        batch_size (int): Maximum number of rows read per batch.
+        memory_limit (int, optional): Approximate peak memory in bytes used to read the input.
+        errors (str): "raise" or "null", see `SafeCaster`.
+        dropped_columns (dict, optional): Filled with the columns dropped from the sources of each table.
+
+    Yields:
+        pa.RecordBatch: The migrated batches, conforming to the table schema of the last version.
+    """
+    yield from _iter_migrated(
+        input_dir, table_name, steps[0].source(), steps, batch_size, memory_limit, errors, dropped_columns
+    )
+
+
+def _iter_migrated(input_dir, table_name, source, steps, batch_size, memory_limit, errors, dropped_columns):
+    if not steps:
+        input_path = get_table_path(input_dir, table_name)
+        if input_path is None:
+            return
+        # Tables missing from the definitions of a version are read as they are, and cast by the next step.
+        schema = source if table_name in source.get_table_names() else None
+        yield from iter_table_batches(
+            input_path, schema, batch_size=batch_size, memory_limit=memory_limit, errors=errors
+        )
+        return
+
+    step = steps[-1]
+    target = step.target()
+    target_schema = target.get_pyarrow_schema(table_name) if table_name in target.get_table_names() else None
+    row_offset = 0
+    for spec in step.sources(table_name):
+        first = True
+        for batch in _iter_migrated(
+            input_dir,
+            spec.source or table_name,
+            source,
+            steps[:-1],
+            batch_size,
+            memory_limit,
+            errors,
+            dropped_columns,
+        ):
+            batch = spec.apply(batch, row_offset)
+            if target_schema is not None:
+                if first:
+                    _record_dropped_columns(step, table_name, spec, batch, target_schema, dropped_columns)
+                batch = convert_to_schema(batch, target_schema, errors=errors)
+            first = False
+            row_offset += batch.num_rows
+            yield batch
+
+
+def migrate_table(
+    input_dir,
+    output_path,
+    table_name,
+    steps,
+    batch_size=DEFAULT_BATCH_SIZE,
+    memory_limit=DEFAULT_MEMORY_LIMIT,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="zstd",
+    errors="raise",
+):
+    """
+    Stream one table of a source dataset through a migration path into a Parquet file.
+
+    The file is written under a temporary name and only moved to `output_path` once complete. Tables without
+    any source are written empty.
+
+    Args:
+        input_dir (str | Path): The directory of the source dataset, in the version of the first step.
+        output_path (str | Path): Path of the Parquet file to write.
+        table_name (str): The name of the table in the last version.
+        steps (list[Migration]): The migrations, see `migration_path`.
+        batch_size (int): Maximum number of rows read per batch.
+        memory_limit (int): Approximate peak memory in bytes used to read the input.
+        row_group_size (int): Number of rows per Parquet row group.
+        compression (str): Parquet compression codec.
+        errors (str): "raise" or "null", see `SafeCaster`.
+
+    Returns:
+        dict: The "num_rows" written and the "dropped_columns" of the sources of the table.
+    """
+    target_schema = steps[-1].target().get_pyarrow_schema(table_name)
+    dropped_columns = {}
+    batches = iter_migrated_batches(
+        input_dir, table_name, steps, batch_size, memory_limit, errors, dropped_columns=dropped_columns
+    )
+    with atomic_write_path(output_path) as tmp_path:
+        writer = RowGroupWriter(tmp_path, target_schema, row_group_size, compression)
+        try:
+            for batch in batches:
+                writer.write_batch(batch)
+        except BaseException:
+            writer.close(flush=False)
+            raise
+        writer.close()
+    return {"num_rows": writer.num_rows, "dropped_columns": dropped_columns}
+
+
+def migrate_omop_dataset(
+    input_dir,
+    output_dir,
+    source,
+    target,
+    max_workers=None,
+    use_processes=False,
+    memory_limit=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="zstd",
+    errors="raise",
+):
+    """
+    Migrate an OMOP dataset to a later schema version, e.g. a v5.3 CDM to v5.4, without a database.
+
+    Every table of the target version that has a source in `input_dir`, or that is new in one of the
+    versions migrated through, is streamed through the migrations of `migration_path` and written to
+    `output_dir/<table_name>.parquet`. Tables are migrated in parallel, largest first. Input tables that are
+    not migrated into any target table are logged.
+
+    Args:
+        input_dir (str | Path): The directory of the source dataset (CSV, CSV.gz or Parquet).
+        output_dir (str | Path): The directory the migrated Parquet files are written to.
+        source (OMOPSchemaBase | type): The schema version of the source dataset, e.g. `OMOPSchemaV53`.
+        target (OMOPSchemaBase | type): The schema version to migrate to, e.g. `OMOPSchemaV54`.
+        max_workers (int, optional): Maximum number of tables migrated at once.
+        use_processes (bool): If True, migrate tables in a process pool instead of a thread pool.
+        memory_limit (int, optional): Approximate total peak memory in bytes, shared between workers.
+        batch_size (int): Maximum number of rows read per batch.
+        row_group_size (int): Number of rows per Parquet row group.
+        compression (str): Parquet compression codec.
+        errors (str): "raise" to fail a table on its first value that cannot be cast to its new type, or
+            "null" to set such values to null, see `SafeCaster`.
+
+    Returns:
+        dict: A report mapping table names to a dict with the "sources", "output", "seconds", "num_rows",
+        "dropped_columns" and "error" of each migration.
+    """
+    steps = migration_path(source, target)
+    os.makedirs(output_dir, exist_ok=True)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    table_memory_limit = (memory_limit or DEFAULT_MEMORY_LIMIT * max_workers) // max_workers
+    new_tables = set().union(*(step.new_tables for step in steps))
+
+    jobs, sources, migrated = [], {}, set()
+    for table_name in steps[-1].target().get_table_names():
+        if not _has_input(input_dir, table_name, steps) and table_name not in new_tables:
+            continue
+        input_paths = [get_table_path(input_dir, name) for name in sorted(_source_tables(table_name, steps))]
+        sources[table_name] = [str(path) for path in input_paths if path is not None]
+        migrated.update(_source_tables(table_name, steps))
+        output_path = Path(output_dir) / f"{table_name}.parquet"
+        args = (
+            input_dir,
+            output_path,
+            table_name,
+            steps,
+            batch_size,
+            table_memory_limit,
+            row_group_size,
+            compression,
+            errors,
+        )
+        jobs.append((table_name, args, sum(estimate_memory(path) for path in sources[table_name])))
+
+    dropped_tables = set().union(*(step.dropped_tables for step in steps))
+    for table_name in steps[0].source().get_table_names():
+        if table_name not in migrated and get_table_path(input_dir, table_name) is not None:
+            log = logger.info if table_name in dropped_tables else logger.warning
+            log(f"Table '{table_name}' is not migrated: it is not part of {steps[-1].target.__name__}")
+
+    report = {}
+    for table_name, result, seconds, error in run_parallel(
+        migrate_table, jobs, max_workers=max_workers, use_processes=use_processes
+    ):
+        if error is None:
+            logger.info(f"Migrated table '{table_name}' ({result['num_rows']} rows in {seconds:.1f}s)")
+        else:
+            logger.error(f"Error migrating table '{table_name}': {error['message']}")
+        report[table_name] = {
+            "sources": sources[table_name],
+            "output": str(Path(output_dir) / f"{table_name}.parquet"),
+            "seconds": seconds,
+            "num_rows": result["num_rows"] if error is None else None,
+            "dropped_columns": result["dropped_columns"] if error is None else None,
+            "error": error,
+        }
+    return report
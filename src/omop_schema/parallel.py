@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+# Rough ratio between the in-memory Arrow size of a table and the size of its file on disk.
+CSV_MEMORY_FACTOR = 2
+GZIP_MEMORY_FACTOR = 8
+PARQUET_MEMORY_FACTOR = 4
+
+
+class MemoryBudget:
+    """
+    A shared memory budget that blocks callers until enough of it is available.
+
+    A single reservation larger than the whole budget is admitted once nothing else is reserved, so
+    oversized tables are processed on their own instead of blocking forever.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        if self.limit is None:
+            return
+        with self._condition:
+            while self.used and self.used + nbytes > self.limit:
+                self._condition.wait()
+            self.used += nbytes
+
+    def release(self, nbytes):
+        if self.limit is None:
+            return
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+
+def estimate_memory(fp):
+    """
+    Estimate the peak in-memory size of a table file or directory from its size on disk.
+
+    Args:
+        fp (str | Path): Path to the file or directory.
+
+    Returns:
+        int: The estimated number of bytes needed to load the table.
+    """
+    fp = Path(fp)
+    files = [fp] if fp.is_file() else [file for file in fp.glob("**/*") if file.is_file()]
+    total = 0
+    for file in files:
+        if file.suffix == ".gz":
+            factor = GZIP_MEMORY_FACTOR
+        elif file.suffix == ".parquet":
+            factor = PARQUET_MEMORY_FACTOR
+        else:
+            factor = CSV_MEMORY_FACTOR
+        total += file.stat().st_size * factor
+    return total
+
+
+def _timed_call(func, *args):
+    start = time.perf_counter()
+    try:
+        result, error = func(*args), None
+    except Exception as e:
+        result, error = None, {"type": type(e).__name__, "message": str(e)}
+    return result, time.perf_counter() - start, error
+
+
+def run_parallel(func, jobs, max_workers=None, use_processes=False, memory_limit=None):
+    """
+    Run `func` over a list of jobs in a thread or process pool, yielding results as they finish.
+
+    Jobs are scheduled largest first. A job is only submitted once its estimated memory fits in the
+    remaining `memory_limit`, so the largest jobs never all peak at once.
+
+    Args:
+        func (callable): The function to run. Must be picklable if `use_processes` is True.
+        jobs (list[tuple]): Tuples of (key, args, estimated_bytes).
+        max_workers (int, optional): Maximum number of concurrent workers. Defaults to the executor default.
+        use_processes (bool): If True, use a process pool instead of a thread pool.
+        memory_limit (int, optional): Maximum total estimated bytes of jobs running at once.
+
+    Yields:
+        tuple: (key, result, seconds, error) per job, where `error` is None or a dict with the exception
+        "type" and "message".
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() if use_processes else min(32, (os.cpu_count() or 1) + 4)
+    if use_processes:
+        # Forked workers can deadlock on locks held by the Arrow and Polars thread pools of the parent.
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    budget = MemoryBudget(memory_limit)
+    finished = queue.Queue()
+    jobs = sorted(jobs, key=lambda job: job[2], reverse=True)
+
+    def on_done(future, key, estimate):
+        budget.release(estimate)
+        finished.put((key, future))
+
+    with executor:
+
+        def submit_all():
+            for key, args, estimate in jobs:
+                budget.acquire(estimate)
+                try:
+                    future = executor.submit(_timed_call, func, *args)
+                except Exception as e:
+                    budget.release(estimate)
+                    finished.put((key, e))
+                    continue
+                future.add_done_callback(lambda f, key=key, estimate=estimate: on_done(f, key, estimate))
+
+        submitter = threading.Thread(target=submit_all, daemon=True)
+        submitter.start()
+        for _ in range(len(jobs)):
+            key, future = finished.get()
+            if isinstance(future, Exception):
+                raise future
+            result, seconds, error = future.result()
+            yield key, result, seconds, error
+        submitter.join()
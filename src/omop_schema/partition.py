@@ -0,0 +1,215 @@
+import itertools
+import logging
+import os
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .convert import convert_to_schema
+from .parallel import estimate_memory, run_parallel
+from .pipeline import PERSON_COLUMN
+from .schema.base import OMOPSchemaBase
+from .utils import (
+    DEFAULT_BATCH_SIZE,
+    RowGroupWriter,
+    atomic_write_path,
+    get_table_path,
+    iter_table_batches,
+    to_batches,
+)
+
+logger = logging.getLogger(__name__)
+
+# 2**64 divided by the golden ratio, the multiplier of Fibonacci hashing.
+FIBONACCI_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def person_shards(person_ids, num_shards):
+    """
+    Assign person ids to shards with Fibonacci hashing.
+
+    The assignment only depends on the person id and the number of shards, so every table of a dataset, and
+    every dataset partitioned with the same number of shards, places a person in the same shard. Null person
+    ids are assigned to shard 0.
+
+    Args:
+        person_ids (pa.Array | pa.ChunkedArray | np.ndarray): The integer person ids.
+        num_shards (int): The number of shards.
+
+    Returns:
+        np.ndarray: The shard of every person id.
+    """
+    if isinstance(person_ids, (pa.Array, pa.ChunkedArray)):
+        person_ids = pc.fill_null(person_ids.cast(pa.int64()), 0).to_numpy()
+    hashes = np.asarray(person_ids, dtype=np.int64).view(np.uint64) * FIBONACCI_MULTIPLIER
+    # Map the high 32 bits of the hash to [0, num_shards) without a modulo bias.
+    return (((hashes >> np.uint64(32)) * np.uint64(num_shards)) >> np.uint64(32)).astype(np.intp)
+
+
+def shard_path(output_dir, shard, table_name):
+    """
+    Get the path of a table in a shard of a partitioned dataset.
+
+    Args:
+        output_dir (str | Path): The directory of the partitioned dataset.
+        shard (int): The shard.
+        table_name (str): The name of the OMOP table.
+
+    Returns:
+        Path: The path `output_dir/shard_XXXX/<table_name>.parquet`.
+    """
+    return Path(output_dir) / f"shard_{shard:04d}" / f"{table_name}.parquet"
+
+
+def partition_table(
+    data,
+    output_dir,
+    table_name,
+    num_shards,
+    schema: OMOPSchemaBase = None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    row_group_size=DEFAULT_BATCH_SIZE,
+    compression="zstd",
+):
+    """
+    Hash-partition an OMOP table by `person_id` into Parquet files, one per shard.
+
+    The table is processed one batch at a time. The rows of each batch are grouped by shard with a single
+    sort and appended to the file of their shard, `output_dir/shard_XXXX/<table_name>.parquet`. Every shard
+    gets a file, which is empty if no row belongs to it. Files are written under temporary names and only
+    moved into place once all shards are complete.
+
+    Args:
+        data (pa.Table | pa.RecordBatch | Iterable[pa.RecordBatch] | pl.DataFrame | pl.LazyFrame): The table
+            data, e.g. as returned by `load_table`, `load_table_polars` or `iter_table_batches`.
+        output_dir (str | Path): The directory of the partitioned dataset.
+        table_name (str): The name of the OMOP table.
+        num_shards (int): The number of shards.
+        schema (OMOPSchemaBase, optional): If given, rows are converted to the table schema, dropping extra
+            columns.
+        batch_size (int): Maximum number of rows partitioned at once.
+        row_group_size (int): Number of rows per Parquet row group. Each shard buffers up to one row group.
+        compression (str): Parquet compression codec.
+
+    Returns:
+        list[int]: The number of rows written to each shard.
+    """
+    target_schema = schema.get_pyarrow_schema(table_name) if schema is not None else None
+    batches = iter(to_batches(data, batch_size=batch_size))
+    first_batch = next(batches, None)
+    if target_schema is not None:
+        file_schema = target_schema
+    elif first_batch is not None:
+        file_schema = first_batch.schema
+    else:
+        raise ValueError(f"Cannot infer the schema of {table_name} from an empty input without a schema.")
+    if PERSON_COLUMN not in file_schema.names:
+        raise ValueError(f"Table {table_name} has no {PERSON_COLUMN} column to partition by.")
+
+    with ExitStack() as stack:
+        writers = []
+        for shard in range(num_shards):
+            path = shard_path(output_dir, shard, table_name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = stack.enter_context(atomic_write_path(path))
+            writers.append(RowGroupWriter(tmp_path, file_schema, row_group_size, compression))
+        try:
+            for batch in itertools.chain([first_batch], batches) if first_batch is not None else []:
+                if target_schema is not None:
+                    batch = convert_to_schema(batch, target_schema)
+                shards = person_shards(batch.column(PERSON_COLUMN), num_shards)
+                counts = np.bincount(shards, minlength=num_shards)
+                batch = batch.take(pa.array(np.argsort(shards, kind="stable")))
+                offset = 0
+                for shard in np.flatnonzero(counts):
+                    writers[shard].write_batch(batch.slice(offset, counts[shard]))
+                    offset += counts[shard]
+        except BaseException:
+            for writer in writers:
+                writer.close(flush=False)
+            raise
+        for writer in writers:
+            writer.close()
+    return [writer.num_rows for writer in writers]
+
+
+def _partition_job(input_path, output_dir, table_name, num_shards, schema, batch_size, *args):
+    batches = iter_table_batches(input_path, schema=schema, batch_size=batch_size)
+    return partition_table(batches, output_dir, table_name, num_shards, schema, batch_size, *args)
+
+
+def partition_omop_dataset(
+    input_dir,
+    output_dir,
+    schema: OMOPSchemaBase,
+    num_shards,
+    max_workers=None,
+    use_processes=False,
+    memory_limit=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    row_group_size=DEFAULT_BATCH_SIZE,
+    compression="zstd",
+):
+    """
+    Hash-partition every person-level table of an OMOP dataset by `person_id`.
+
+    All tables are partitioned with the same hash, so shard k of e.g. `measurement`, `visit_occurrence` and
+    `condition_occurrence` holds the same persons, and a worker only has to read its own shard directory.
+    Tables without a `person_id` column, such as the vocabulary tables, are not partitioned.
+
+    Args:
+        input_dir (str | Path): Path to the directory containing the OMOP dataset.
+        output_dir (str | Path): The directory of the partitioned dataset.
+        schema (OMOPSchemaBase): The schema version the tables are converted to.
+        num_shards (int): The number of shards.
+        max_workers (int, optional): Maximum number of tables partitioned at once.
+        use_processes (bool): If True, partition tables in a process pool instead of a thread pool.
+        memory_limit (int, optional): Maximum estimated bytes of tables being partitioned at once.
+        batch_size (int): Maximum number of rows read and partitioned at once.
+        row_group_size (int): Number of rows per Parquet row group.
+        compression (str): Parquet compression codec.
+
+    Returns:
+        dict: A report mapping table names to a dict with the "input", "seconds", "num_rows", the rows per
+        shard in "shard_rows" and the "error" of each table.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for table_name in schema.get_table_names():
+        if PERSON_COLUMN not in schema.get_schema(table_name):
+            continue
+        input_path = get_table_path(input_dir, table_name)
+        if input_path is None:
+            continue
+        args = (
+            input_path,
+            output_dir,
+            table_name,
+            num_shards,
+            schema,
+            batch_size,
+            row_group_size,
+            compression,
+        )
+        jobs.append((table_name, args, estimate_memory(input_path)))
+
+    report = {}
+    inputs = {table_name: args[0] for table_name, args, _ in jobs}
+    for table_name, shard_rows, seconds, error in run_parallel(
+        _partition_job, jobs, max_workers=max_workers, use_processes=use_processes, memory_limit=memory_limit
+    ):
+        if error is None:
+            logger.info(f"Partitioned {inputs[table_name]} into {num_shards} shards in {seconds:.1f}s")
+        else:
+            logger.error(f"Error partitioning {inputs[table_name]}: {error['message']}")
+        report[table_name] = {
+            "input": str(inputs[table_name]),
+            "seconds": seconds,
+            "num_rows": sum(shard_rows) if error is None else None,
+            "shard_rows": shard_rows,
+            "error": error,
+        }
+    return report
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import parquet as pq
+
+from .convert import convert_to_schema
+from .parallel import estimate_memory, run_parallel
+from .schema.base import OMOPSchemaBase
+from .utils import (
+    DEFAULT_BATCH_SIZE,
+    RowGroupWriter,
+    atomic_write_path,
+    file_fingerprint,
+    get_table_path,
+    iter_table_batches,
+    refresh_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROW_GROUP_SIZE = 1_048_576
+DEFAULT_MEMORY_LIMIT = 1 << 30
+MANIFEST_FILE_NAME = "_manifest.json"
+PERSON_COLUMN = "person_id"
+
+
+def _start_date_column(table_schema):
+    """Find the column holding the start date of the rows of a table, e.g. `visit_start_date`."""
+    for suffix in ("_start_date", "_start_datetime", "_date", "_datetime"):
+        for field in table_schema:
+            if field.name.endswith(suffix) and (
+                pa.types.is_date(field.type) or pa.types.is_timestamp(field.type)
+            ):
+                return field.name
+    return None
+
+
+def _sort_keys(table_schema):
+    """Get the (person_id, start date) sort keys of a table, or None if it has no person_id."""
+    if PERSON_COLUMN not in table_schema.names:
+        return None
+    start_column = _start_date_column(table_schema)
+    return [PERSON_COLUMN] + ([start_column] if start_column is not None else [])
+
+
+def _write_run(table, path, batch_size):
+    """Write a sorted run to an Arrow IPC file."""
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=batch_size)
+    return path
+
+
+def _merge_runs(paths, schema, sort_keys, batch_size):
+    """
+    Merge sorted runs into sorted batches.
+
+    The runs are memory-mapped and read one batch at a time, always from the run that was read least far.
+    Rows of persons that every unfinished run has been read past are sorted and emitted, so only about one
+    batch per run and the rows of the current persons are held in memory.
+    """
+    sources = [pa.memory_map(str(path)) for path in paths]
+    readers = [pa.ipc.open_file(source) for source in sources]
+    positions = [0] * len(readers)
+    # The last person read from each run, or None once only null persons (sorted last) remain.
+    last_persons = [None] * len(readers)
+    pending = []
+
+    def read_next(run):
+        batch = readers[run].get_batch(positions[run])
+        positions[run] += 1
+        last_persons[run] = batch.column(PERSON_COLUMN)[-1].as_py()
+        pending.append(pa.Table.from_batches([batch], schema=schema))
+
+    for run in range(len(readers)):
+        read_next(run)
+    while True:
+        unfinished = [run for run in range(len(readers)) if positions[run] < readers[run].num_record_batches]
+        if not unfinished:
+            break
+        bounded = [run for run in unfinished if last_persons[run] is not None]
+        table = pa.concat_tables(pending)
+        if bounded:
+            frontier = min(last_persons[run] for run in bounded)
+            ready = pc.less(table[PERSON_COLUMN], pa.scalar(frontier, table.schema.field(PERSON_COLUMN).type))
+        else:
+            ready = pc.is_valid(table[PERSON_COLUMN])
+        ready = ready.fill_null(False)
+        yield from table.filter(ready).sort_by(sort_keys).to_batches(max_chunksize=batch_size)
+        pending = [table.filter(pc.invert(ready))]
+        read_next(min(bounded, key=last_persons.__getitem__) if bounded else unfinished[0])
+    yield from pa.concat_tables(pending).sort_by(sort_keys).to_batches(max_chunksize=batch_size)
+    for source in sources:
+        source.close()
+
+
+def _sort_batches(batches, schema, sort_keys, batch_size, memory_limit, spill_dir):
+    """
+    Sort a stream of batches by person and start date, in memory or with an external merge sort.
+
+    Batches are collected into runs of about half of `memory_limit` bytes, as sorting copies them. A table
+    that fits into one run is sorted in memory; otherwise every run is sorted, spilled to an Arrow IPC file
+    in a temporary directory under `spill_dir`, and the runs are merged.
+    """
+    sort_keys = [(column, "ascending") for column in sort_keys]
+    run_bytes = memory_limit // 2 if memory_limit else None
+    with tempfile.TemporaryDirectory(prefix=".sort-", dir=spill_dir) as tmp_dir:
+        runs, run_batches, num_bytes = [], [], 0
+        for batch in batches:
+            run_batches.append(batch)
+            num_bytes += batch.nbytes
+            if run_bytes is not None and num_bytes >= run_bytes:
+                table = pa.Table.from_batches(run_batches, schema=schema).sort_by(sort_keys)
+                runs.append(_write_run(table, Path(tmp_dir) / f"run-{len(runs)}.arrow", batch_size))
+                run_batches, num_bytes = [], 0
+        table = pa.Table.from_batches(run_batches, schema=schema).sort_by(sort_keys)
+        if not runs:
+            yield from table.to_batches(max_chunksize=batch_size)
+            return
+        if table.num_rows:
+            runs.append(_write_run(table, Path(tmp_dir) / f"run-{len(runs)}.arrow", batch_size))
+        logger.info(f"Merging {len(runs)} sorted runs.")
+        yield from _merge_runs(runs, schema, sort_keys, batch_size)
+
+
+def convert_table(
+    input_path,
+    output_path,
+    schema,
+    table_name,
+    batch_size=DEFAULT_BATCH_SIZE,
+    memory_limit=DEFAULT_MEMORY_LIMIT,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="zstd",
+    sort_by_person=False,
+    write_page_index=False,
+):
+    """
+    Stream one OMOP table into a Parquet file conforming to its schema.
+
+    Missing columns are added as nulls and extra columns are dropped. The file is written under a temporary
+    name and only moved to `output_path` once complete, so a crash never leaves a partial output file.
+
+    With `sort_by_person`, tables with a `person_id` column are written clustered: sorted by `person_id` and
+    start date, so the min/max statistics of each row group cover a narrow range of persons and readers such
+    as `omop_schema.lookup.read_persons` skip the row groups of all other persons. Tables larger than about
+    half of `memory_limit` are sorted externally: sorted runs are spilled to temporary Arrow IPC files next to
+    `output_path` and merged.
+
+    Args:
+        input_path (str | Path): Path to the input file or directory (CSV, CSV.gz or Parquet).
+        output_path (str | Path): Path of the Parquet file to write.
+        schema (OMOPSchemaBase): The schema version to convert to.
+        table_name (str): The name of the OMOP table.
+        batch_size (int): Maximum number of rows read per batch.
+        memory_limit (int): Approximate peak memory in bytes used to read and, with `sort_by_person`, sort
+            the input.
+        row_group_size (int): Number of rows per Parquet row group.
+        compression (str): Parquet compression codec.
+        sort_by_person (bool): If True, sort tables with a `person_id` column by person and start date.
+        write_page_index (bool): If True, also write a page index, which lets readers that support it
+            skip pages within a row group.
+
+    Returns:
+        int: The number of rows written.
+    """
+    target_schema = schema.get_pyarrow_schema(table_name)
+    batches = iter_table_batches(input_path, schema=schema, batch_size=batch_size, memory_limit=memory_limit)
+    batches = (convert_to_schema(batch, target_schema) for batch in batches)
+    sort_keys = _sort_keys(target_schema) if sort_by_person else None
+    writer_options = {"write_page_index": write_page_index}
+    if sort_keys is not None:
+        spill_dir = Path(output_path).parent
+        batches = _sort_batches(batches, target_schema, sort_keys, batch_size, memory_limit, spill_dir)
+        writer_options["sorting_columns"] = [
+            pq.SortingColumn(target_schema.get_field_index(column)) for column in sort_keys
+        ]
+    with atomic_write_path(output_path) as tmp_path:
+        writer = RowGroupWriter(tmp_path, target_schema, row_group_size, compression, **writer_options)
+        try:
+            for batch in batches:
+                writer.write_batch(batch)
+        except BaseException:
+            writer.close(flush=False)
+            raise
+        writer.close()
+    return writer.num_rows
+
+
+def _load_manifest(output_dir):
+    manifest_path = Path(output_dir) / MANIFEST_FILE_NAME
+    if not manifest_path.exists():
+        return {"tables": {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _write_manifest(output_dir, manifest):
+    with atomic_write_path(Path(output_dir) / MANIFEST_FILE_NAME) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+
+def _refresh_if_up_to_date(entry, input_path, settings, content_hash):
+    if not entry or entry["status"] != "complete" or entry["settings"] != settings:
+        return None
+    if not Path(entry["output"]).exists():
+        return None
+    # A touched but otherwise identical input does not need to be converted again.
+    return refresh_fingerprint(entry["fingerprint"], input_path, content_hash=content_hash)
+
+
+def _convert_job(input_path, output_path, content_hash, *args):
+    # Fingerprint before reading, so changes made during the conversion are picked up by the next run.
+    fingerprint = file_fingerprint(input_path, content_hash=content_hash)
+    return convert_table(input_path, output_path, *args), fingerprint
+
+
+def convert_omop_dataset(
+    input_dir,
+    output_dir,
+    schema: OMOPSchemaBase,
+    max_workers=None,
+    use_processes=False,
+    memory_limit=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="zstd",
+    resume=True,
+    content_hash=False,
+    sort_by_person=False,
+    write_page_index=False,
+):
+    """
+    Convert every table of an OMOP dataset to Parquet files conforming to a schema version.
+
+    Each table found in `input_dir` is streamed in batches through its own table schema and written to
+    `output_dir/<table_name>.parquet`. Tables are converted in parallel, largest first. With
+    `sort_by_person`, person-level tables are clustered by person and start date for fast patient lookups
+    (see `convert_table`).
+
+    A manifest in `output_dir` records the size, modification time and optional content hash of each input,
+    together with its output status. With `resume`, tables whose input and conversion settings are
+    unchanged since a complete conversion are skipped, so a rerun only redoes missing or changed inputs.
+
+    Args:
+        input_dir (str | Path): Path to the directory containing the OMOP dataset.
+        output_dir (str | Path): Path to the directory where Parquet files will be written.
+        schema (OMOPSchemaBase): The schema version to convert to.
+        max_workers (int, optional): Maximum number of tables converted at once.
+        use_processes (bool): If True, convert tables in a process pool instead of a thread pool.
+        memory_limit (int, optional): Approximate total peak memory in bytes, shared between workers.
+        batch_size (int): Maximum number of rows read per batch.
+        row_group_size (int): Number of rows per Parquet row group.
+        compression (str): Parquet compression codec.
+        resume (bool): If True, skip tables that are up to date according to the manifest.
+        content_hash (bool): If True, also record a SHA-256 hash of each input. Inputs whose modification
+            time changed but whose content did not are then skipped as well.
+        sort_by_person (bool): If True, sort tables with a `person_id` column by person and start date.
+        write_page_index (bool): If True, also write a Parquet page index.
+
+    Returns:
+        dict: A report mapping table names to a dict with the "input", "output", "seconds", "num_rows",
+        "error" and "skipped" status of each conversion.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    table_memory_limit = (memory_limit or DEFAULT_MEMORY_LIMIT * max_workers) // max_workers
+    settings = {
+        "schema": schema.schema_key,
+        "row_group_size": row_group_size,
+        "compression": compression,
+        "sort_by_person": sort_by_person,
+        "write_page_index": write_page_index,
+    }
+    manifest = _load_manifest(output_dir)
+
+    jobs, paths, report = [], {}, {}
+    for table_name in schema.get_table_names():
+        input_path = get_table_path(input_dir, table_name)
+        if input_path is None:
+            continue
+        output_path = Path(output_dir) / f"{table_name}.parquet"
+        entry = manifest["tables"].get(table_name)
+        fingerprint = _refresh_if_up_to_date(entry, input_path, settings, content_hash) if resume else None
+        if fingerprint is not None:
+            logger.info(f"Skipping {input_path}, {output_path} is up to date")
+            # Record the current modification time, so a touched input is only hashed once.
+            entry["fingerprint"] = fingerprint
+            report[table_name] = {
+                "input": str(input_path),
+                "output": str(output_path),
+                "seconds": 0.0,
+                "num_rows": entry["num_rows"],
+                "error": None,
+                "skipped": True,
+            }
+            continue
+        paths[table_name] = (input_path, output_path)
+        args = (
+            input_path,
+            output_path,
+            content_hash,
+            schema,
+            table_name,
+            batch_size,
+            table_memory_limit,
+            row_group_size,
+            compression,
+            sort_by_person,
+            write_page_index,
+        )
+        jobs.append((table_name, args, estimate_memory(input_path)))
+
+    _write_manifest(output_dir, manifest)
+    for table_name, result, seconds, error in run_parallel(
+        _convert_job, jobs, max_workers=max_workers, use_processes=use_processes
+    ):
+        input_path, output_path = paths[table_name]
+        num_rows, fingerprint = result if error is None else (None, None)
+        if error is None:
+            logger.info(f"Converted {input_path} to {output_path} ({num_rows} rows in {seconds:.1f}s)")
+        else:
+            logger.error(f"Error converting {input_path}: {error['message']}")
+        manifest["tables"][table_name] = {
+            "input": str(input_path),
+            "output": str(output_path),
+            "fingerprint": fingerprint,
+            "settings": settings,
+            "status": "complete" if error is None else "failed",
+            "num_rows": num_rows,
+            "error": error,
+        }
+        _write_manifest(output_dir, manifest)
+        report[table_name] = {
+            "input": str(input_path),
+            "output": str(output_path),
+            "seconds": seconds,
+            "num_rows": num_rows,
+            "error": error,
+            "skipped": False,
+        }
+    return report
@@ -0,0 +1,404 @@
+import datetime
+import json
+import logging
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .parallel import estimate_memory, run_parallel
+from .schema.base import OMOPSchemaBase
+from .schema.compact import DICTIONARY_TYPE
+from .utils import (
+    DEFAULT_BATCH_SIZE,
+    atomic_write_path,
+    get_table_path,
+    iter_table_batches,
+)
+from .vocabulary import fnv1a_hash
+
+logger = logging.getLogger(__name__)
+
+# 2**14 registers, a standard error of about 0.8% on distinct counts.
+DEFAULT_PRECISION = 14
+# Strings whose distinct values are at most this fraction of their non-null values are dictionary-encoded.
+DICTIONARY_MAX_RATIO = 0.5
+MILLISECONDS_PER_DAY = 86_400_000
+INTEGER_TYPES = (pa.int8(), pa.int16(), pa.int32(), pa.int64())
+
+
+def _mix(hashes):
+    """The splitmix64 finalizer, which spreads the bits of integer values or weak hashes over all 64 bits."""
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def hash_values(values):
+    """
+    Hash the non-null values of an array to 64 bits, e.g. for distinct counting.
+
+    Args:
+        values (pa.Array | pa.ChunkedArray): The values. Strings are hashed by their bytes, other types by
+            their integer or floating point representation.
+
+    Returns:
+        np.ndarray: The uint64 hash of every non-null value.
+    """
+    values = values.drop_null()
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        return _mix(fnv1a_hash(values))
+    if pa.types.is_boolean(values.type):
+        values = values.cast(pa.int8())
+    array = values.to_numpy(zero_copy_only=False)
+    if array.dtype.kind == "f":
+        array = array.astype(np.float64)
+    elif array.dtype.kind == "M":
+        array = array.view(np.int64)
+    else:
+        array = array.astype(np.int64)
+    return _mix(array.view(np.uint64))
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the number of distinct values of a stream, in a fixed 2**precision bytes.
+
+    Sketches of parts of a stream can be merged, so tables can be profiled in pieces.
+
+    Args:
+        precision (int): The number of hash bits that select a register, between 4 and 18.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, got {precision}.")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Add values by their uint64 hashes."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        width = 64 - self.precision
+        indices = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # The rank is the position of the first set bit of the remaining bits, counted from the top. Their bit
+        # length is found by halving, as a float conversion rounds up remaining bits wider than its mantissa.
+        bit_lengths = np.zeros(len(rest), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            wide = rest >= np.uint64(1 << shift)
+            bit_lengths[wide] += shift
+            rest[wide] >>= np.uint64(shift)
+        bit_lengths += rest > 0
+        ranks = (width + 1 - bit_lengths).astype(np.uint8)
+        np.maximum.at(self.registers, indices, ranks)
+
+    def add(self, values):
+        """Add the non-null values of an array."""
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precisions.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Estimate the number of distinct values added.
+
+        Returns:
+            int: The estimate.
+        """
+        num_registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / num_registers)
+        estimate = alpha * num_registers**2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * num_registers and zeros:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = num_registers * np.log(num_registers / zeros)
+        return int(round(estimate))
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class ColumnProfile:
+    """
+    Streaming profile of a column: counts, nulls, distinct values, and the value range or string lengths.
+
+    Args:
+        name (str): The name of the column.
+        data_type (pa.DataType): The type of the column.
+        precision (int): The precision of the distinct count sketch.
+    """
+
+    def __init__(self, name, data_type, precision=DEFAULT_PRECISION):
+        self.name = name
+        self.data_type = data_type
+        self.count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.max_length = None
+        self.whole_days = True
+        self.distinct = HyperLogLog(precision)
+
+    @property
+    def _value_type(self):
+        return self.data_type.value_type if pa.types.is_dictionary(self.data_type) else self.data_type
+
+    def update(self, values):
+        """Add an array of values of the column."""
+        self.count += len(values)
+        self.null_count += values.null_count
+        if values.null_count == len(values):
+            return
+        # Duplicates do not change the sketch, so only the distinct values of the batch are hashed.
+        unique = pc.unique(values)
+        self.distinct.add(unique)
+        value_type = self._value_type
+        if pa.types.is_string(value_type) or pa.types.is_large_string(value_type):
+            if pa.types.is_dictionary(unique.type):
+                unique = unique.cast(value_type)
+            self._update_max_length(pc.max(pc.utf8_length(unique)).as_py())
+            return
+        if (
+            pa.types.is_integer(value_type)
+            or pa.types.is_floating(value_type)
+            or pa.types.is_temporal(value_type)
+        ):
+            min_max = pc.min_max(unique)
+            self._update_range(min_max["min"].as_py(), min_max["max"].as_py())
+        if pa.types.is_date64(value_type) and self.whole_days:
+            milliseconds = unique.drop_null().cast(pa.int64()).to_numpy()
+            self.whole_days = not np.any(milliseconds % MILLISECONDS_PER_DAY)
+
+    def _update_max_length(self, length):
+        self.max_length = length if self.max_length is None else max(self.max_length, length)
+
+    def _update_range(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        """Merge the profile of another part of the same column."""
+        self.count += other.count
+        self.null_count += other.null_count
+        if other.max_length is not None:
+            self._update_max_length(other.max_length)
+        if other.min is not None:
+            self._update_range(other.min, other.max)
+        self.whole_days = self.whole_days and other.whole_days
+        self.distinct.merge(other.distinct)
+
+    def recommended_type(self):
+        """
+        Recommend the narrowest Arrow type that holds every value seen.
+
+        Integers get the smallest integer type of their range, with at least int32 for `*_id` columns so
+        that ids can grow. date64 columns of whole days become date32. Strings with few distinct values
+        are dictionary-encoded. Other types, and columns without values, keep their type.
+
+        Returns:
+            pa.DataType: The recommended type.
+        """
+        non_null = self.count - self.null_count
+        value_type = self._value_type
+        if not non_null:
+            return self.data_type
+        if pa.types.is_integer(value_type) and pa.types.is_signed_integer(value_type):
+            smallest = 2 if self.name.endswith("_id") else 0
+            for data_type in INTEGER_TYPES[smallest:]:
+                info = np.iinfo(data_type.to_pandas_dtype())
+                if info.min <= self.min and self.max <= info.max:
+                    return data_type
+        if pa.types.is_date64(value_type) and self.whole_days:
+            return pa.date32()
+        if pa.types.is_string(value_type) and self.distinct.count() <= DICTIONARY_MAX_RATIO * non_null:
+            return DICTIONARY_TYPE
+        return self.data_type
+
+    def to_dict(self):
+        non_null = self.count - self.null_count
+        profile = {
+            "column": self.name,
+            "type": str(self.data_type),
+            "count": self.count,
+            "null_count": self.null_count,
+            "null_fraction": self.null_count / self.count if self.count else None,
+            "distinct": min(self.distinct.count(), non_null),
+            "min": _json_value(self.min),
+            "max": _json_value(self.max),
+            "max_length": self.max_length,
+        }
+        if isinstance(self.min, datetime.date):
+            profile["span_days"] = (self.max - self.min).days
+        profile["recommended_type"] = str(self.recommended_type())
+        return profile
+
+
+class TableProfile:
+    """
+    Streaming profile of the columns of a table, updated one batch at a time.
+
+    Args:
+        table_name (str): The name of the OMOP table.
+        precision (int): The precision of the distinct count sketches.
+    """
+
+    def __init__(self, table_name, precision=DEFAULT_PRECISION):
+        self.table_name = table_name
+        self.precision = precision
+        self.num_rows = 0
+        self.num_batches = 0
+        self.columns = {}
+
+    def update(self, batch):
+        """Add a record batch or table of the table."""
+        self.num_rows += batch.num_rows
+        self.num_batches += 1
+        for field in batch.schema:
+            column = self.columns.get(field.name)
+            if column is None:
+                column = self.columns[field.name] = ColumnProfile(field.name, field.type, self.precision)
+            column.update(batch.column(field.name))
+
+    def merge(self, other):
+        """Merge the profile of another part of the same table, e.g. of another file."""
+        self.num_rows += other.num_rows
+        self.num_batches += other.num_batches
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+
+    def recommended_schema(self):
+        """
+        Get the recommended types of all columns as a schema.
+
+        Returns:
+            pa.Schema: The schema with the recommended type of every column.
+        """
+        return pa.schema([pa.field(name, column.recommended_type()) for name, column in self.columns.items()])
+
+    def to_dict(self):
+        return {
+            "table": self.table_name,
+            "num_rows": self.num_rows,
+            "columns": [column.to_dict() for column in self.columns.values()],
+        }
+
+
+def profile_table(
+    fp, schema: OMOPSchemaBase = None, batch_size=DEFAULT_BATCH_SIZE, precision=DEFAULT_PRECISION
+):
+    """
+    Profile a table in a single streaming pass over its batches.
+
+    Args:
+        fp (str | Path): Path to the file or directory of the table.
+        schema (OMOPSchemaBase, optional): Schema the batches are cast to before they are profiled.
+        batch_size (int): Maximum number of rows profiled at once.
+        precision (int): The precision of the distinct count sketches.
+
+    Returns:
+        TableProfile: The profile of the table.
+    """
+    table_name = os.path.basename(str(fp)).split(".")[0]
+    profile = TableProfile(table_name, precision)
+    for batch in iter_table_batches(fp, schema=schema, batch_size=batch_size):
+        profile.update(batch)
+    return profile
+
+
+def _profile_job(fp, schema, batch_size, precision):
+    return profile_table(fp, schema, batch_size, precision).to_dict()
+
+
+def profile_omop_dataset(
+    input_dir,
+    schema: OMOPSchemaBase,
+    output_path=None,
+    max_workers=None,
+    use_processes=False,
+    memory_limit=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    precision=DEFAULT_PRECISION,
+):
+    """
+    Profile every table of an OMOP dataset, scanning each table once and several tables in parallel.
+
+    For every column, the profile holds the number of values and nulls, an approximate distinct count, the
+    value range (and day span of dates) or the maximum string length, and a recommended narrower type.
+
+    Args:
+        input_dir (str | Path): Path to the directory containing the OMOP dataset.
+        schema (OMOPSchemaBase): The schema version the tables are read with.
+        output_path (str | Path, optional): If given, the profile is written to this JSON file.
+        max_workers (int, optional): Maximum number of tables profiled at once.
+        use_processes (bool): If True, profile tables in a process pool instead of a thread pool.
+        memory_limit (int, optional): Maximum estimated bytes of tables being profiled at once.
+        batch_size (int): Maximum number of rows read and profiled at once.
+        precision (int): The precision of the distinct count sketches.
+
+    Returns:
+        dict: The "schema" key and the "tables", mapping table names to their profile or, if profiling
+        failed, to a dict with the "error".
+    """
+    jobs = []
+    for table_name in schema.get_table_names():
+        input_path = get_table_path(input_dir, table_name)
+        if input_path is not None:
+            jobs.append(
+                (table_name, (input_path, schema, batch_size, precision), estimate_memory(input_path))
+            )
+
+    tables = {}
+    for table_name, profile, seconds, error in run_parallel(
+        _profile_job, jobs, max_workers=max_workers, use_processes=use_processes, memory_limit=memory_limit
+    ):
+        if error is None:
+            logger.info(f"Profiled {table_name} ({profile['num_rows']} rows) in {seconds:.1f}s")
+            tables[table_name] = {**profile, "seconds": seconds}
+        else:
+            logger.error(f"Error profiling {table_name}: {error['message']}")
+            tables[table_name] = {"table": table_name, "error": error}
+
+    result = {
+        "schema": schema.schema_key,
+        "tables": {name: tables[name] for name in schema.get_table_names() if name in tables},
+    }
+    if output_path is not None:
+        with atomic_write_path(output_path) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(result, f, indent=2)
+    return result
+
+
+def recommended_schema(table_profile):
+    """
+    Get the recommended types of a table profile, e.g. read back from a profile file, as a schema.
+
+    Args:
+        table_profile (dict): The profile of a table, as written by `profile_omop_dataset`.
+
+    Returns:
+        pa.Schema: The schema with the recommended type of every column.
+    """
+    fields = []
+    for column in table_profile["columns"]:
+        name = column["recommended_type"]
+        data_type = DICTIONARY_TYPE if name == str(DICTIONARY_TYPE) else pa.type_for_alias(name)
+        fields.append(pa.field(column["column"], data_type))
+    return pa.schema(fields)
@@ -0,0 +1,170 @@
+import json
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .utils import atomic_write_path
+
+# Column statuses, in the order the columns of a table are reported.
+COLUMN_STATUSES = ("missing", "mismatched", "extra", "correct")
+
+SUMMARY_SCHEMA = pa.schema(
+    [
+        ("table", pa.string()),
+        ("path", pa.string()),
+        ("table_status", pa.string()),
+        ("cached", pa.bool_()),
+        ("seconds", pa.float64()),
+        ("column", pa.string()),
+        ("column_status", pa.string()),
+        ("actual_type", pa.string()),
+        ("expected_type", pa.string()),
+        ("error", pa.string()),
+    ]
+)
+
+
+def table_record(table_name, result=None, path=None, seconds=None, cached=False, status=None, error=None):
+    """
+    Build the report record of a table, a JSON-serializable dict.
+
+    The "status" of a table is "valid" if it has no missing or mismatched columns and "invalid" otherwise,
+    unless another status is given, e.g. "missing" for tables that are not in the dataset, "unreadable" for
+    tables that could not be loaded or "error" for tables whose validation raised.
+
+    Args:
+        table_name (str): The name of the OMOP table.
+        result (dict, optional): The result of `OMOPValidator.validate_table`.
+        path (str | Path, optional): The path of the table.
+        seconds (float, optional): The time taken to validate the table.
+        cached (bool): Whether the result was taken from a validation cache.
+        status (str, optional): The status of the table. Derived from the result if not given.
+        error (dict, optional): The exception "type" and "message" of a failed validation.
+
+    Returns:
+        dict: The record, with the table name, path, status, timing, error and one entry per column with its
+        "name", "status", "actual_type" and "expected_type".
+    """
+    columns = []
+    if result is not None:
+        for name, expected in result["missing_columns"]:
+            columns.append(_column_entry(name, "missing", None, expected))
+        for name, actual, expected in result["mismatched_columns"]:
+            columns.append(_column_entry(name, "mismatched", actual, expected))
+        for name, actual in result["extra_columns"]:
+            columns.append(_column_entry(name, "extra", actual, None))
+        for name, expected in result["correct_columns"]:
+            columns.append(_column_entry(name, "correct", expected, expected))
+        if status is None:
+            invalid = result["missing_columns"] or result["mismatched_columns"]
+            status = "invalid" if invalid else "valid"
+    return {
+        "table": table_name,
+        "path": str(path) if path is not None else None,
+        "status": status,
+        "cached": cached,
+        "seconds": seconds,
+        "error": error,
+        "columns": columns,
+    }
+
+
+def _column_entry(name, status, actual_type, expected_type):
+    return {
+        "name": name,
+        "status": status,
+        "actual_type": str(actual_type) if actual_type is not None else None,
+        "expected_type": str(expected_type) if expected_type is not None else None,
+    }
+
+
+class JsonLinesReporter:
+    """
+    Write report records as JSON Lines, one line per table, flushed as soon as each table is reported.
+
+    A consumer can follow the file while a validation is running. Use the reporter as a context manager, or
+    call `close` when done; files passed in open are flushed but not closed.
+
+    Args:
+        file (str | Path | file-like): The path of the file to write, or an open text file, e.g. `sys.stdout`.
+    """
+
+    def __init__(self, file):
+        if isinstance(file, (str, Path)):
+            self._file = open(file, "w")
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def summary_table(records):
+    """
+    Flatten report records into a table with one row per column of every table.
+
+    Tables without columns, e.g. tables missing from the dataset, get a single row with a null column.
+
+    Args:
+        records (Iterable[dict]): Records built with `table_record`.
+
+    Returns:
+        pa.Table: The summary, with the schema `SUMMARY_SCHEMA`.
+    """
+    rows = []
+    for record in records:
+        table_fields = {
+            "table": record["table"],
+            "path": record["path"],
+            "table_status": record["status"],
+            "cached": record["cached"],
+            "seconds": record["seconds"],
+            "error": record["error"]["message"] if record["error"] is not None else None,
+        }
+        for column in record["columns"] or [None]:
+            rows.append(
+                {
+                    **table_fields,
+                    "column": column["name"] if column is not None else None,
+                    "column_status": column["status"] if column is not None else None,
+                    "actual_type": column["actual_type"] if column is not None else None,
+                    "expected_type": column["expected_type"] if column is not None else None,
+                }
+            )
+    return pa.Table.from_pylist(rows, schema=SUMMARY_SCHEMA)
+
+
+def write_summary(records, path):
+    """
+    Write the summary of report records to a Parquet file, or an Arrow IPC file for any other extension.
+
+    Args:
+        records (Iterable[dict]): Records built with `table_record`.
+        path (str | Path): The path of the file, e.g. "validation.parquet" or "validation.arrow".
+
+    Returns:
+        pa.Table: The summary that was written.
+    """
+    path = Path(path)
+    table = summary_table(records)
+    with atomic_write_path(path) as tmp_path:
+        if path.suffix == ".parquet":
+            pq.write_table(table, tmp_path)
+        else:
+            with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return table
@@ -1,17 +1,84 @@
+import logging
 import os
+import threading
 from abc import ABC, abstractmethod
+from types import MappingProxyType
 
 import pyarrow as pa
 from pyarrow import csv
 
+from ..casting import ERROR_MODES, SafeCaster, string_schema
+from ..dates import CSV_NULL_VALUES, cast_dates, csv_convert_options
+from ..parallel import estimate_memory, run_parallel
+
+logger = logging.getLogger(__name__)
+
+
+def _read_csv_table(file_path, table_schema, cache=None, cache_key="", date_formats=None):
+    if cache is not None:
+        return cache.get_or_load(
+            file_path,
+            lambda: _read_csv_table(file_path, table_schema, date_formats=date_formats),
+            key=cache_key,
+        )
+    table = csv.read_csv(
+        file_path,
+        read_options=csv.ReadOptions(),
+        convert_options=csv_convert_options(table_schema, date_formats),
+    )
+    return cast_dates(table, table_schema, date_formats)
+
+
+def _read_csv_table_safe(file_path, table_schema, date_formats=None, quarantine=None):
+    table = csv.read_csv(
+        file_path,
+        read_options=csv.ReadOptions(),
+        convert_options=csv.ConvertOptions(column_types=string_schema(table_schema)),
+    )
+    with SafeCaster("null", quarantine, date_formats, null_values=CSV_NULL_VALUES) as caster:
+        table = caster.cast(table, table_schema)
+    return table, caster.counts
+
+
+# Columns that reference the primary key of another table by naming convention.
+FOREIGN_KEY_COLUMNS = {
+    "person_id": "person",
+    "visit_occurrence_id": "visit_occurrence",
+    "preceding_visit_occurrence_id": "visit_occurrence",
+    "visit_detail_id": "visit_detail",
+    "provider_id": "provider",
+    "care_site_id": "care_site",
+    "location_id": "location",
+}
+
+# Process-wide registry of frozen schemas, keyed by schema class. Each entry holds the table schemas and
+# lazily computed PyArrow, Polars and Pandas schemas per table, so they are only built once per process.
+_REGISTRY = {}
+_REGISTRY_LOCK = threading.RLock()
+
+
+def _freeze(schemas):
+    return MappingProxyType({table: MappingProxyType(dict(fields)) for table, fields in schemas.items()})
+
 
 class OMOPSchemaBase(ABC):
     """
     Abstract base class to define and manage the schema for OMOP CDM tables.
+
+    Table schemas are loaded once per schema class and shared, read-only, between all its instances.
     """
 
     def __init__(self):
-        self.schemas = self._load_schema()
+        self.schemas = self._registry_entry()["schemas"]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["schemas"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.schemas = self._registry_entry()["schemas"]
 
     @abstractmethod
     def _load_schema(self):
@@ -20,8 +87,111 @@ class OMOPSchemaBase(ABC):
         This method should be implemented by subclasses.
         """
 
+    def _load_required_fields(self):
+        """
+        Load the required (NOT NULL) fields per table.
+        Subclasses may override this, the default declares none.
+        """
+        return {}
+
+    def _load_foreign_keys(self, schemas):
+        """
+        Load the foreign key relationships between tables.
+
+        By default, these are derived from the OMOP column naming conventions: `person_id`,
+        `visit_occurrence_id`, `visit_detail_id`, `provider_id`, `care_site_id` and `location_id`
+        reference the table of the same name, and every `*_concept_id` references `concept`.
+        Subclasses may override this.
+
+        Args:
+            schemas (Mapping): The table schemas returned by `_load_schema`.
+
+        Returns:
+            list[tuple[str, str, str, str]]: Tuples of (table, column, referenced table, referenced column).
+        """
+        foreign_keys = []
+        for table_name, fields in schemas.items():
+            for column in fields:
+                referenced_table = FOREIGN_KEY_COLUMNS.get(column)
+                if referenced_table is None and column.endswith("_concept_id"):
+                    referenced_table = "concept"
+                if referenced_table is None or referenced_table not in schemas:
+                    continue
+                referenced_column = f"{referenced_table}_id"
+                if (table_name, column) == (referenced_table, referenced_column):
+                    continue
+                if referenced_column in schemas[referenced_table]:
+                    foreign_keys.append((table_name, column, referenced_table, referenced_column))
+        return foreign_keys
+
+    def _registry_key(self):
+        return type(self)
+
+    def _registry_entry(self):
+        key = self._registry_key()
+        entry = _REGISTRY.get(key)
+        if entry is None:
+            with _REGISTRY_LOCK:
+                entry = _REGISTRY.get(key)
+                if entry is None:
+                    schemas = _freeze(self._load_schema())
+                    entry = {
+                        "schemas": schemas,
+                        "required_fields": MappingProxyType(
+                            {table: tuple(fields) for table, fields in self._load_required_fields().items()}
+                        ),
+                        "foreign_keys": tuple(tuple(key) for key in self._load_foreign_keys(schemas)),
+                        "pyarrow": {},
+                        "polars": {},
+                        "pandas": {},
+                    }
+                    _REGISTRY[key] = entry
+        return entry
+
+    def _cached(self, kind, table_name, build):
+        cache = self._registry_entry()[kind]
+        if table_name not in cache:
+            with _REGISTRY_LOCK:
+                if table_name not in cache:
+                    cache[table_name] = build()
+        return cache[table_name]
+
+    @property
+    def schema_key(self):
+        """
+        str: A stable identifier of the schema version, e.g. for keying caches and manifests.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
     def get_schema(self, table_name):
-        return self.schemas.get(table_name, {})
+        return self.schemas.get(table_name, MappingProxyType({}))
+
+    def get_required_fields(self, table_name):
+        """
+        Get the required (NOT NULL) fields of a specific table.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            tuple[str]: The names of the required fields.
+        """
+        return self._registry_entry()["required_fields"].get(table_name, ())
+
+    def get_foreign_keys(self, table_name=None):
+        """
+        Get the foreign key relationships of the schema.
+
+        Args:
+            table_name (str, optional): Only return the foreign keys of this table.
+
+        Returns:
+            tuple[tuple[str, str, str, str]]: Tuples of (table, column, referenced table, referenced column).
+        """
+        foreign_keys = self._registry_entry()["foreign_keys"]
+        if table_name is None:
+            return foreign_keys
+        return tuple(key for key in foreign_keys if key[0] == table_name)
 
     def get_pyarrow_schema(self, table_name):
         """
@@ -33,37 +203,139 @@ class OMOPSchemaBase(ABC):
         Returns:
             pyarrow.Schema: The PyArrow schema for the specified table.
         """
-        return pa.schema([pa.field(name, dtype) for name, dtype in self.get_schema(table_name).items()])
+        return self._cached(
+            "pyarrow",
+            table_name,
+            lambda: pa.schema([pa.field(name, dtype) for name, dtype in self.get_schema(table_name).items()]),
+        )
+
+    def get_polars_schema(self, table_name):
+        """
+        Get the Polars schema for a specific table.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            Mapping: A read-only mapping of column names to Polars data types.
+        """
+        # Imported here, as the utilities depend on this module.
+        from ..utils import pyarrow_to_polars_schema
+
+        return self._cached(
+            "polars",
+            table_name,
+            lambda: MappingProxyType(pyarrow_to_polars_schema(self.get_pyarrow_schema(table_name))),
+        )
+
+    def get_pandas_schema(self, table_name):
+        """
+        Get the Pandas schema for a specific table.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            Mapping: A read-only mapping of column names to Pandas data types.
+        """
+        from ..utils import pyarrow_to_pandas_schema
+
+        return self._cached(
+            "pandas",
+            table_name,
+            lambda: MappingProxyType(pyarrow_to_pandas_schema(self.get_pyarrow_schema(table_name))),
+        )
 
     def get_table_names(self):
         return list(self.schemas.keys())
 
-    def load_csv_dataset(self, folder_path):
+    def load_csv_dataset(
+        self,
+        folder_path,
+        max_workers=None,
+        use_processes=False,
+        memory_limit=None,
+        return_report=False,
+        cache=None,
+        date_formats=None,
+        errors="raise",
+        quarantine_dir=None,
+    ):
         """
         Load datasets from a folder, matching files to table schemas.
 
+        Tables are loaded concurrently. Large tables are scheduled first and, if `memory_limit` is set, a
+        table is only started once its estimated in-memory size fits in the remaining budget.
+
         Args:
             folder_path (str): Path to the folder containing the dataset files.
+            max_workers (int, optional): Maximum number of tables loaded at once.
+            use_processes (bool): If True, load tables in a process pool instead of a thread pool.
+            memory_limit (int, optional): Maximum estimated bytes of tables being loaded at once.
+            return_report (bool): If True, also return a per-table load report.
+            cache (TableCache, optional): Cache of loaded tables. Unchanged files are memory-mapped from the
+                cache instead of parsed. With `use_processes`, tables are copied back from the workers.
+            date_formats (list[str], optional): `strptime` formats of date and datetime values that are not
+                ISO 8601, e.g. `["%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]`. Date and datetime columns are then read
+                as strings and parsed with the checks of `parse_dates`, see `csv_convert_options`.
+            errors (str): "raise" to fail the load of a table on its first value that cannot be cast to the
+                schema, or "null" to set such values to null and count them per column, see `SafeCaster`.
+                Tables are not cached with "null".
+            quarantine_dir (str, optional): With `errors="null"`, a folder the rows holding invalid values
+                are written to, as one `<table>.csv` file per table.
 
         Returns:
-            dict: A dictionary where keys are table names and values are PyArrow tables.
+            dict: A dictionary where keys are table names and values are PyArrow tables. If `return_report`
+            is True, a tuple of this dictionary and a report mapping table names to a dict with the
+            "file", "seconds", "num_rows", "invalid_values" and "error" of each load. "invalid_values" maps
+            columns to their number of values set to null, and is None with `errors="raise"`.
         """
-        datasets = {}
-        for file_name in os.listdir(folder_path):
+        if errors not in ERROR_MODES:
+            raise ValueError(f"errors must be one of {ERROR_MODES}, got {errors!r}.")
+        jobs = []
+        for file_name in sorted(os.listdir(folder_path)):
             table_name, ext = os.path.splitext(file_name)
+            if ext.lower() == ".gz":
+                table_name, ext = os.path.splitext(table_name)
             if ext.lower() == ".csv" and table_name in self.get_table_names():
                 file_path = os.path.join(folder_path, file_name)
-                table_schema = pa.schema(
-                    [pa.field(name, dtype) for name, dtype in self.get_schema(table_name).items()]
-                )
-                try:
-                    datasets[table_name] = csv.read_csv(
-                        file_path,
-                        read_options=csv.ReadOptions(),
-                        convert_options=csv.ConvertOptions(column_types=table_schema),
-                    )
-                except Exception as e:
-                    print(f"Error loading {file_name}: {e}")
+                table_schema = self.get_pyarrow_schema(table_name)
+                if errors == "null":
+                    quarantine = os.path.join(quarantine_dir, f"{table_name}.csv") if quarantine_dir else None
+                    args = (file_path, table_schema, date_formats, quarantine)
+                else:
+                    cache_key = "|".join(["load_csv_dataset", self.schema_key, *(date_formats or [])])
+                    args = (file_path, table_schema, cache, cache_key, date_formats)
+                jobs.append((table_name, args, estimate_memory(file_path)))
+
+        file_paths = {table_name: args[0] for table_name, args, _ in jobs}
+        datasets, report = {}, {}
+        for table_name, table, seconds, error in run_parallel(
+            _read_csv_table_safe if errors == "null" else _read_csv_table,
+            jobs,
+            max_workers=max_workers,
+            use_processes=use_processes,
+            memory_limit=memory_limit,
+        ):
+            invalid_values = None
+            if errors == "null" and table is not None:
+                table, invalid_values = table
+                if invalid_values:
+                    details = ", ".join(f"{column}: {count}" for column, count in invalid_values.items())
+                    logger.warning(f"Set invalid values of {file_paths[table_name]} to null. {details}")
+            if error is None:
+                datasets[table_name] = table
+            else:
+                logger.error(f"Error loading {file_paths[table_name]}: {error['message']}")
+            report[table_name] = {
+                "file": file_paths[table_name],
+                "seconds": seconds,
+                "num_rows": table.num_rows if table is not None else None,
+                "invalid_values": invalid_values,
+                "error": error,
+            }
+        if return_report:
+            return datasets, report
         return datasets
 
     # def read_csv(self, file_path, table_name):
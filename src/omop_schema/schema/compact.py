@@ -0,0 +1,145 @@
+import re
+
+import pyarrow as pa
+
+from .base import OMOPSchemaBase
+
+# Concept ids are assigned below 2**31 - 1, including the 2-billion range reserved for local concepts.
+CONCEPT_ID_PATTERN = re.compile(r"(^|_)concept_id(_\d+)?$")
+# String columns with few distinct values, which are dictionary-encoded.
+DICTIONARY_COLUMN_SUFFIXES = (
+    "_source_value",
+    "vocabulary_id",
+    "domain_id",
+    "concept_class_id",
+    "relationship_id",
+    "standard_concept",
+    "invalid_reason",
+)
+# Source values that identify persons, providers, care sites and locations have about one value per row.
+IDENTIFIER_COLUMNS = {
+    "person_source_value",
+    "provider_source_value",
+    "care_site_source_value",
+    "location_source_value",
+}
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def compact_type(column, data_type):
+    """
+    Get the compact type of a column.
+
+    Concept ids are narrowed from int64 to int32, dates from date64 to date32, and low-cardinality strings,
+    such as `*_source_value`, `unit_source_value` and `vocabulary_id`, are dictionary-encoded. Source values
+    that identify persons, providers, care sites and locations keep their type.
+
+    Args:
+        column (str): The name of the column.
+        data_type (pa.DataType): The type of the column in the version schema.
+
+    Returns:
+        pa.DataType: The compact type.
+    """
+    if data_type == pa.int64() and CONCEPT_ID_PATTERN.search(column):
+        return pa.int32()
+    if data_type == pa.date64():
+        return pa.date32()
+    if (
+        data_type == pa.string()
+        and column.endswith(DICTIONARY_COLUMN_SUFFIXES)
+        and column not in IDENTIFIER_COLUMNS
+    ):
+        return DICTIONARY_TYPE
+    return data_type
+
+
+class CompactOMOPSchema(OMOPSchemaBase):
+    """
+    Memory-optimized profile of an OMOP schema version, see `compact_type`.
+
+    The profile is used like any schema version: loaders, converters and writers cast tables to its types.
+    Casts are safe, so loading a value that does not fit a narrowed type raises an error instead of
+    truncating it. Use `verify` to check a table before converting it.
+
+    Args:
+        base (OMOPSchemaBase | type): The schema version the profile is derived from, e.g. `OMOPSchemaV54()`.
+    """
+
+    def __init__(self, base):
+        self.base = base() if isinstance(base, type) else base
+        super().__init__()
+
+    def _registry_key(self):
+        return type(self), type(self.base)
+
+    @property
+    def schema_key(self):
+        return f"{self.base.schema_key}:compact"
+
+    def _load_schema(self):
+        return {
+            table_name: {column: compact_type(column, data_type) for column, data_type in fields.items()}
+            for table_name, fields in self.base.schemas.items()
+        }
+
+    def _load_required_fields(self):
+        return {table_name: self.base.get_required_fields(table_name) for table_name in self.base.schemas}
+
+    def _load_foreign_keys(self, schemas):
+        return self.base.get_foreign_keys()
+
+    def narrowed_columns(self, table_name):
+        """
+        Get the columns of a table whose compact type differs from the type of the version schema.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+
+        Returns:
+            dict: The (version type, compact type) of every narrowed column.
+        """
+        base_fields = self.base.get_schema(table_name)
+        return {
+            column: (base_fields[column], data_type)
+            for column, data_type in self.get_schema(table_name).items()
+            if data_type != base_fields[column]
+        }
+
+    def verify(self, table_name, data):
+        """
+        Check that converting a table to the compact types loses no data.
+
+        Args:
+            table_name (str): The name of the OMOP table.
+            data (pa.Table | pa.RecordBatch | Iterable[pa.RecordBatch]): The table, e.g. as returned by
+                `load_table` or `iter_table_batches` with the version schema.
+
+        Returns:
+            dict: The number of non-null values checked per narrowed column present in the data.
+
+        Raises:
+            ValueError: If a value of a narrowed column does not fit its compact type.
+        """
+        if isinstance(data, pa.Table):
+            data = data.to_batches()
+        elif isinstance(data, pa.RecordBatch):
+            data = [data]
+        narrowed = self.narrowed_columns(table_name)
+        checked, lossy = {}, {}
+        for batch in data:
+            for column in (column for column in narrowed if column in batch.schema.names):
+                values = batch.column(column)
+                checked[column] = checked.get(column, 0) + len(values) - values.null_count
+                if column in lossy:
+                    continue
+                try:
+                    values.cast(narrowed[column][1])
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    lossy[column] = str(e)
+        if lossy:
+            details = "; ".join(f"{column}: {message}" for column, message in sorted(lossy.items()))
+            raise ValueError(
+                f"Converting table '{table_name}' to the compact schema would lose data. {details}"
+            )
+        return checked
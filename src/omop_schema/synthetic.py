@@ -0,0 +1,163 @@
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+from pyarrow import csv
+from pyarrow import parquet as pq
+
+from .schema.base import OMOPSchemaBase
+
+DEFAULT_EVENT_TABLES = (
+    "visit_occurrence",
+    "condition_occurrence",
+    "drug_exposure",
+    "procedure_occurrence",
+    "measurement",
+    "observation",
+)
+NUM_CONCEPTS = 1000
+NUM_CODES = 500
+FIRST_DATE = datetime.date(2000, 1, 1)
+NUM_DAYS = 365 * 20
+MAX_DURATION_DAYS = 30
+SECONDS_PER_DAY = 86400
+
+
+def _generate_column(rng, table_name, column, dtype, num_rows, num_persons, times, references):
+    if column == f"{table_name}_id":
+        return pa.array(np.arange(1, num_rows + 1), dtype)
+    if column == "person_id":
+        if table_name == "person":
+            return pa.array(np.arange(1, num_rows + 1), dtype)
+        return pa.array(rng.integers(1, num_persons + 1, num_rows), dtype)
+    if column in references:
+        # Foreign keys reference the sequential ids of a generated table, or are null if it is not generated.
+        num_referenced = references[column]
+        if num_referenced is None:
+            return pa.nulls(num_rows, dtype)
+        return pa.array(rng.integers(1, num_referenced + 1, num_rows), dtype)
+    if column == "year_of_birth":
+        return pa.array(rng.integers(1930, 2020, num_rows), dtype)
+    if column == "month_of_birth":
+        return pa.array(rng.integers(1, 13, num_rows), dtype)
+    if column == "day_of_birth":
+        return pa.array(rng.integers(1, 29, num_rows), dtype)
+    if column.endswith("_concept_id"):
+        return pa.array(rng.integers(1, NUM_CONCEPTS + 1, num_rows), dtype)
+
+    if pa.types.is_date(dtype) or pa.types.is_timestamp(dtype):
+        start_seconds, end_seconds = times
+        seconds = end_seconds if "_end_" in column or column.endswith("_end_date") else start_seconds
+        timestamps = np.datetime64(FIRST_DATE, "s") + seconds.astype("timedelta64[s]")
+        if pa.types.is_timestamp(dtype):
+            return pa.array(timestamps).cast(dtype)
+        return pa.array(timestamps.astype("datetime64[D]")).cast(dtype)
+    if pa.types.is_integer(dtype):
+        return pa.array(rng.integers(0, 100, num_rows), dtype)
+    if pa.types.is_floating(dtype):
+        return pa.array(rng.normal(100, 25, num_rows), dtype)
+    if pa.types.is_string(dtype):
+        dictionary = pa.array([f"{column}_{code}" for code in range(NUM_CODES)])
+        indices = pa.array(rng.integers(0, NUM_CODES, num_rows), pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, dictionary).cast(dtype)
+    return pa.nulls(num_rows, dtype)
+
+
+def generate_table(schema: OMOPSchemaBase, table_name, num_rows, num_persons, seed=0, table_sizes=None):
+    """
+    Generate a synthetic OMOP table conforming to a schema version.
+
+    Primary keys are sequential, `person_id` references persons 1 to `num_persons`, concept ids are drawn
+    from 1 to 1000, and end dates are never before the matching start dates. Other foreign keys reference
+    the sequential ids of the tables in `table_sizes`, and are null if the referenced table is not in it.
+
+    Args:
+        schema (OMOPSchemaBase): The schema version.
+        table_name (str): The name of the table.
+        num_rows (int): The number of rows.
+        num_persons (int): The number of persons referenced by `person_id`.
+        seed (int): Seed of the random number generator.
+        table_sizes (dict, optional): The number of rows of each generated table that may be referenced,
+            e.g. `{"visit_occurrence": 10000}`. The table itself, `person` and `concept` are always included.
+
+    Returns:
+        pa.Table: The synthetic table.
+    """
+    rng = np.random.default_rng(seed)
+    # Dates and datetimes of a row share one start and one end time, so they are mutually consistent.
+    start_seconds = rng.integers(0, NUM_DAYS * SECONDS_PER_DAY, num_rows)
+    times = (start_seconds, start_seconds + rng.integers(0, MAX_DURATION_DAYS * SECONDS_PER_DAY, num_rows))
+    table_sizes = {
+        **(table_sizes or {}),
+        "person": num_persons,
+        "concept": NUM_CONCEPTS,
+        table_name: num_rows,
+    }
+    references = {
+        column: table_sizes.get(referenced_table)
+        for _, column, referenced_table, _ in schema.get_foreign_keys(table_name)
+    }
+    table_schema = schema.get_pyarrow_schema(table_name)
+    columns = [
+        _generate_column(rng, table_name, field.name, field.type, num_rows, num_persons, times, references)
+        for field in table_schema
+    ]
+    return pa.Table.from_arrays(columns, schema=table_schema)
+
+
+def generate_synthetic_cdm(
+    output_dir,
+    schema: OMOPSchemaBase,
+    num_persons=1000,
+    events_per_person=10,
+    tables=DEFAULT_EVENT_TABLES,
+    file_format="csv",
+    seed=0,
+):
+    """
+    Write a synthetic OMOP CDM dataset driven by a schema version.
+
+    The dataset contains a `person` table with `num_persons` rows, a `concept` table with 1000 synthetic
+    concepts, and every table in `tables` with `num_persons * events_per_person` rows. Foreign keys
+    reference the generated tables; those to tables that are not generated, such as `provider` or
+    `care_site`, are null.
+
+    Args:
+        output_dir (str | Path): Path to the directory to write the tables to.
+        schema (OMOPSchemaBase): The schema version.
+        num_persons (int): The number of persons.
+        events_per_person (int): The average number of rows per person in each event table.
+        tables (Iterable[str]): The event tables to generate.
+        file_format (str): "csv", "csv.gz" or "parquet".
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        dict: The path of the file written for each table.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table_sizes = {table_name: num_persons * events_per_person for table_name in tables}
+    table_sizes.update(person=num_persons, concept=NUM_CONCEPTS)
+    paths = {}
+    for index, table_name in enumerate(dict.fromkeys(["person", "concept", *tables])):
+        table = generate_table(
+            schema,
+            table_name,
+            table_sizes[table_name],
+            num_persons,
+            seed=seed + index,
+            table_sizes=table_sizes,
+        )
+        path = output_dir / f"{table_name}.{file_format}"
+        if file_format == "parquet":
+            pq.write_table(table, path)
+        elif file_format == "csv.gz":
+            with pa.CompressedOutputStream(str(path), "gzip") as out:
+                csv.write_csv(table, out)
+        elif file_format == "csv":
+            csv.write_csv(table, path)
+        else:
+            raise ValueError(f"Unsupported file format: {file_format}")
+        paths[table_name] = path
+    return paths
@@ -1,10 +1,19 @@
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 import pyarrow as pa
 from pyarrow import csv
 from pyarrow import parquet as pq
 
+from . import instrumentation
+from .casting import ERROR_MODES, SafeCaster, string_schema
 from .convert import convert_to_schema_polars
+from .dates import CSV_NULL_VALUES, cast_dates, csv_convert_options
 from .schema.base import OMOPSchemaBase
 from .schema.v5_3 import OMOPSchemaV53
 from .schema.v5_4 import OMOPSchemaV54
@@ -22,6 +31,8 @@ try:
 except ImportError:
     PANDAS_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
 
 def get_schema_loader(omop_version):
     """
@@ -75,7 +86,10 @@ def pyarrow_to_polars_schema(arrow_schema: pa.Schema) -> dict:
     polars_schema = {}
     for field in arrow_schema:
         arrow_type = field.type
-        polars_type = arrow_to_polars_map.get(arrow_type, None)
+        if pa.types.is_dictionary(arrow_type) and pa.types.is_string(arrow_type.value_type):
+            polars_type = pl.Categorical
+        else:
+            polars_type = arrow_to_polars_map.get(arrow_type, None)
         if polars_type is None:
             raise ValueError(f"Unsupported PyArrow type: {arrow_type}")
         polars_schema[field.name] = polars_type
@@ -116,7 +130,10 @@ def pyarrow_to_pandas_schema(arrow_schema: pa.Schema) -> dict:
     pandas_schema = {}
     for field in arrow_schema:
         arrow_type = field.type
-        pandas_type = arrow_to_pandas_map.get(arrow_type, None)
+        if pa.types.is_dictionary(arrow_type):
+            pandas_type = "category"
+        else:
+            pandas_type = arrow_to_pandas_map.get(arrow_type, None)
         if pandas_type is None:
             raise ValueError(f"Unsupported PyArrow type: {arrow_type}")
         pandas_schema[field.name] = pandas_type
@@ -124,13 +141,180 @@ def pyarrow_to_pandas_schema(arrow_schema: pa.Schema) -> dict:
     return pandas_schema
 
 
-def load_table(fp: str | Path, schema: OMOPSchemaBase = None) -> pa.Table | None:
+DEFAULT_SAMPLE_BYTES = 1 << 20
+
+
+def _table_files(fp: Path) -> tuple[str | None, list[Path]]:
+    """
+    Resolve the data files backing a table path, using the same rules as `load_table`.
+
+    Args:
+        fp (Path): Path to the file or directory.
+
+    Returns:
+        tuple[str | None, list[Path]]: The file format ("csv" or "parquet") and the matching files, or
+        (None, []) if no supported files are found.
+    """
+    if fp.is_file():
+        if fp.suffixes[-2:] == [".csv", ".gz"] or fp.suffix == ".csv":
+            return "csv", [fp]
+        if fp.suffix == ".parquet":
+            return "parquet", [fp]
+    elif fp.is_dir():
+        files = sorted(fp.glob("**/*"))
+        csv_files = [file for file in files if file.suffix in [".csv", ".gz"]]
+        parquet_files = [file for file in files if file.suffix == ".parquet"]
+        if csv_files:
+            return "csv", csv_files
+        if parquet_files:
+            return "parquet", parquet_files
+    return None, []
+
+
+def _can_cast(values: pa.Array | pa.ChunkedArray, target_type: pa.DataType) -> bool:
+    try:
+        values.cast(target_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+    return True
+
+
+def read_table_schema(
+    fp: str | Path,
+    expected_schema: pa.Schema = None,
+    sample_bytes: int = DEFAULT_SAMPLE_BYTES,
+    case_insensitive: bool = False,
+) -> pa.Schema | None:
+    """
+    Read the schema of a table without materializing its row data.
+
+    Parquet schemas are taken from the file footer. CSV and CSV.gz schemas are inferred from the header
+    plus the first `sample_bytes` of data. For directories, the first data file is inspected.
+
+    Args:
+        fp (Path): Path to the file or directory.
+        expected_schema (pa.Schema, optional): If given, columns whose type differs from the expected type
+            but can be cast to it (judged on the sample for CSV) are reported with the expected type,
+            mirroring `load_table(schema=...)`.
+        sample_bytes (int): Number of bytes of CSV data to read for type inference.
+        case_insensitive (bool): If True, column names are lowercased.
+
+    Returns:
+        pa.Schema | None: The schema of the table, or None if no valid files are found.
+    """
+    if not isinstance(fp, Path):
+        fp = Path(fp)
+    file_format, files = _table_files(fp)
+    if file_format is None:
+        return None
+
+    if file_format == "parquet":
+        actual_schema = pq.read_schema(files[0])
+        sample = pa.table({field.name: pa.array([], type=field.type) for field in actual_schema})
+    else:
+        reader = csv.open_csv(files[0], read_options=csv.ReadOptions(block_size=sample_bytes))
+        try:
+            actual_schema = reader.schema
+            try:
+                sample = pa.Table.from_batches([reader.read_next_batch()])
+            except StopIteration:
+                sample = actual_schema.empty_table()
+        finally:
+            reader.close()
+
+    if case_insensitive:
+        lowercase_names = [name.lower() for name in actual_schema.names]
+        actual_schema = pa.schema(
+            [field.with_name(name) for field, name in zip(actual_schema, lowercase_names)]
+        )
+        sample = sample.rename_columns(lowercase_names)
+
+    if expected_schema is None:
+        return actual_schema
+
+    fields = []
+    for field in actual_schema:
+        index = expected_schema.get_field_index(field.name)
+        if index != -1:
+            expected_type = expected_schema.field(index).type
+            if field.type != expected_type and _can_cast(sample.column(field.name), expected_type):
+                field = field.with_type(expected_type)
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _cast_to_expected(table: pa.Table | pa.RecordBatch, expected_schema: pa.Schema):
+    """
+    Reorder and cast the columns of a table or record batch to an expected schema.
+
+    Columns of the expected schema come first, in schema order, cast to the expected type. Extra columns
+    are kept after them with their original type. Missing columns are not added.
+    """
+    expected_names = set(expected_schema.names)
+    common_fields = [field for field in expected_schema if field.name in table.column_names]
+    extra_fields = [table.schema.field(name) for name in table.column_names if name not in expected_names]
+    columns = []
+    for field in common_fields:
+        column = table.column(field.name)
+        if column.type != field.type:
+            instrumentation.count("cast_values", len(column), column=field.name)
+            column = column.cast(field.type)
+        columns.append(column)
+    columns += [table.column(field.name) for field in extra_fields]
+    return type(table).from_arrays(columns, schema=pa.schema(common_fields + extra_fields))
+
+
+def _safe_caster(errors, file_format, quarantine=None, date_formats=None):
+    """Get the caster of a load with `errors="null"`, or None to cast with `_cast_to_expected`."""
+    if errors not in ERROR_MODES:
+        raise ValueError(f"errors must be one of {ERROR_MODES}, got {errors!r}.")
+    if errors == "raise":
+        return None
+    null_values = CSV_NULL_VALUES if file_format == "csv" else None
+    return SafeCaster(errors, quarantine=quarantine, date_formats=date_formats, null_values=null_values)
+
+
+def _csv_options(expected_schema, date_formats=None, caster=None, **kwargs):
+    if expected_schema is None:
+        return csv.ConvertOptions(**kwargs)
+    if caster is not None:
+        # Read the columns as strings, so that invalid values are set to null by the caster instead of failing
+        # the whole read.
+        return csv.ConvertOptions(column_types=string_schema(expected_schema), **kwargs)
+    return csv_convert_options(expected_schema, date_formats, **kwargs)
+
+
+def _log_invalid_values(table_name, caster):
+    if caster.counts:
+        details = ", ".join(f"{column}: {count}" for column, count in caster.counts.items())
+        logger.warning(f"Set invalid values of table '{table_name}' to null. {details}")
+
+
+def load_table(
+    fp: str | Path,
+    schema: OMOPSchemaBase = None,
+    cache=None,
+    date_formats: list[str] = None,
+    errors: str = "raise",
+    quarantine: str | Path = None,
+) -> pa.Table | None:
     """
     Load a dataset for the given OMOP table using PyArrow.
 
+    With a schema, CSV columns are parsed straight into the types of the table schema, see
+    `csv_convert_options`.
+
     Args:
         fp (Path): Path to the file or directory.
         schema (OMOPSchemaBase, optional): Schema to validate and cast the table against.
+        cache (TableCache, optional): Cache of loaded tables. The cast table is stored on the first load and
+            memory-mapped on later loads, as long as the files are unchanged. Not used with `errors="null"`.
+        date_formats (list[str], optional): `strptime` formats of CSV date and datetime values that are not
+            ISO 8601, e.g. `["%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]`. Only used with a schema.
+        errors (str): "raise" to fail on the first value that cannot be cast to the schema, or "null" to set
+            such values to null, see `SafeCaster`. Only used with a schema.
+        quarantine (str | Path, optional): With `errors="null"`, a CSV file the rows holding invalid values
+            are written to.
 
     Returns:
         pa.Table | None: The loaded PyArrow Table, or None if no valid files are found.
@@ -138,59 +322,254 @@ def load_table(fp: str | Path, schema: OMOPSchemaBase = None) -> pa.Table | None
     if not isinstance(fp, Path):
         fp = Path(fp)
     table_name = fp.stem.split(".")[0]  # Infer table name from file path
-    if fp.is_file():
-        if fp.suffixes == [".csv", ".gz"] or fp.suffix == ".csv":
-            table = csv.read_csv(fp, read_options=csv.ReadOptions(use_threads=True))
-        elif fp.suffix == ".parquet":
-            table = pq.read_table(fp)
-        else:
-            return None
-    elif fp.is_dir():
-        # Handle directory containing multiple files
-        files = list(fp.glob("**/*"))
-        csv_files = [file for file in files if file.suffix in [".csv", ".gz"]]
-        parquet_files = [file for file in files if file.suffix == ".parquet"]
-
-        if csv_files:
+    file_format, files = _table_files(fp)
+    caster = _safe_caster(errors, file_format, quarantine, date_formats) if schema else None
+    # Tables loaded with `errors="null"` are not cached, so that their invalid values are counted and
+    # quarantined on every load.
+    if cache is not None and file_format is not None and caster is None:
+        key = f"load_table|{schema.schema_key if schema else ''}"
+        if date_formats:
+            key += "|" + "|".join(date_formats)
+        return cache.get_or_load(fp, lambda: load_table(fp, schema, date_formats=date_formats), key=key)
+    if file_format is None:
+        return None
+    expected_schema = schema.get_pyarrow_schema(table_name) if schema else None
+    # Reading includes the I/O and the CSV parsing or Parquet decoding; compare its throughput in bytes per
+    # second with the disk to tell them apart.
+    with instrumentation.stage("load_table.read", table=table_name, format=file_format) as stage:
+        if file_format == "csv":
+            convert_options = _csv_options(expected_schema, date_formats, caster)
             tables = [
-                csv.read_csv(file, read_options=csv.ReadOptions(use_threads=True)) for file in csv_files
+                csv.read_csv(
+                    file, read_options=csv.ReadOptions(use_threads=True), convert_options=convert_options
+                )
+                for file in files
             ]
-            table = pa.concat_tables(tables)
-        elif parquet_files:
-            tables = [pq.read_table(file) for file in parquet_files]
-            table = pa.concat_tables(tables)
         else:
-            return None
-    else:
-        return None
+            tables = [pq.read_table(file) for file in files]
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+        stage.add("bytes_read", sum(file.stat().st_size for file in files))
+        stage.add("rows", table.num_rows)
+        stage.add("batches", table.column(0).num_chunks if table.num_columns else 0)
 
     # If a schema is provided, validate and cast the table. Keep the extra columns.
     if schema:
-        expected_schema = schema.get_pyarrow_schema(table_name)
-        # Identify extra columns
-        extra_columns = [
-            (col, table.schema.field(col).type)
-            for col in table.column_names
-            if col not in [field.name for field in expected_schema]
-        ]
-        # Get the intersection of schema fields and table columns
-        common_fields = [field for field in expected_schema if field.name in table.column_names]
-        # Reorder table columns to match the common schema's field order
-        reordered_columns = [field.name for field in common_fields] + [col for col, _ in extra_columns]
-        table = table.select(reordered_columns)
-        # Cast only the common columns
-        casted_table = table.select([field.name for field in common_fields]).cast(pa.schema(common_fields))
-        # Combine casted common columns with extra columns
-        for col in extra_columns:
-            casted_table = casted_table.append_column(col[0], table[col[0]])
-
-        table = casted_table
+        with instrumentation.stage("load_table.cast", table=table_name) as stage:
+            if caster is not None:
+                with caster:
+                    table = caster.cast(table, expected_schema)
+                _log_invalid_values(table_name, caster)
+            elif file_format == "csv":
+                table = cast_dates(table, expected_schema, date_formats)
+            table = _cast_to_expected(table, expected_schema)
+            stage.add("rows", table.num_rows)
 
     return table
 
 
+DEFAULT_BATCH_SIZE = 131_072
+DEFAULT_BLOCK_SIZE = 8 << 20
+# Peak memory while streaming is a small multiple of one batch: the raw block, the decoded batch and its
+# cast copy.
+BATCH_MEMORY_FACTOR = 4
+
+
+def iter_table_batches(
+    fp: str | Path,
+    schema: OMOPSchemaBase = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    memory_limit: int = None,
+    columns: list[str] = None,
+    date_formats: list[str] = None,
+    errors: str = "raise",
+    quarantine: str | Path = None,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Stream a dataset for the given OMOP table as PyArrow record batches.
+
+    This is the streaming counterpart of `load_table`: CSV, CSV.gz and Parquet files are read incrementally
+    and each batch is cast with the same rules as `load_table(schema=...)`. Files in a directory are read
+    one after another and never concatenated.
+
+    Without a schema, the types of CSV columns are inferred from the first block of each file, and columns
+    that are null throughout it are read as strings. Unlike `load_table`, which infers types from the whole
+    file, a later value that does not fit the inferred type fails the read, e.g. a concept code `E11.9` after
+    a first block of numeric codes. Pass a schema to stream such files.
+
+    Args:
+        fp (Path): Path to the file or directory.
+        schema (OMOPSchemaBase, optional): Schema to validate and cast the batches against.
+        batch_size (int): Maximum number of rows per batch.
+        memory_limit (int, optional): Approximate peak memory in bytes. Limits the CSV block size and the
+            number of Parquet rows decoded at once.
+        columns (list[str], optional): Only read these columns. All of them must exist in the files.
+        date_formats (list[str], optional): `strptime` formats of CSV date and datetime values that are not
+            ISO 8601. Only used with a schema.
+        errors (str): "raise" to fail on the first value that cannot be cast to the schema, or "null" to set
+            such values to null, see `SafeCaster`. Only used with a schema.
+        quarantine (str | Path, optional): With `errors="null"`, a CSV file the rows holding invalid values
+            are written to.
+
+    Yields:
+        pa.RecordBatch: Batches of at most `batch_size` rows.
+    """
+    if not isinstance(fp, Path):
+        fp = Path(fp)
+    table_name = fp.stem.split(".")[0]  # Infer table name from file path
+    expected_schema = schema.get_pyarrow_schema(table_name) if schema else None
+    batch_bytes = memory_limit // BATCH_MEMORY_FACTOR if memory_limit else None
+
+    file_format, files = _table_files(fp)
+    caster = _safe_caster(errors, file_format, quarantine, date_formats) if schema else None
+    try:
+        for file in files:
+            if file_format == "csv":
+                batches = _iter_csv_batches(
+                    file, expected_schema, batch_bytes or DEFAULT_BLOCK_SIZE, columns, date_formats, caster
+                )
+            else:
+                batches = _iter_parquet_batches(file, batch_size, batch_bytes, columns)
+            for batch in batches:
+                if caster is not None:
+                    batch = caster.cast(batch, expected_schema)
+                elif expected_schema is not None and file_format == "csv":
+                    batch = cast_dates(batch, expected_schema, date_formats)
+                if expected_schema is not None:
+                    batch = _cast_to_expected(batch, expected_schema)
+                for offset in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(offset, batch_size)
+    finally:
+        if caster is not None:
+            caster.close()
+            _log_invalid_values(table_name, caster)
+
+
+def _iter_csv_batches(
+    file: Path,
+    expected_schema: pa.Schema | None,
+    block_size: int,
+    columns=None,
+    date_formats=None,
+    caster=None,
+):
+    # The streaming reader fixes the column types after the first block. With a schema, the expected types
+    # are declared up front. Without one, columns that are null throughout the first block are read as
+    # strings, as they would otherwise be typed null and fail on their first value.
+    if expected_schema is None:
+        convert_options = csv.ConvertOptions(
+            column_types=_sample_column_types(file, block_size, columns), include_columns=columns
+        )
+    else:
+        convert_options = _csv_options(expected_schema, date_formats, caster, include_columns=columns)
+    reader = csv.open_csv(
+        file, read_options=csv.ReadOptions(block_size=block_size), convert_options=convert_options
+    )
+    try:
+        yield from reader
+    finally:
+        reader.close()
+
+
+def _sample_column_types(file: Path, block_size: int, columns=None):
+    """Get string types for the columns of a CSV file that are null throughout its first block."""
+    reader = csv.open_csv(
+        file,
+        read_options=csv.ReadOptions(block_size=block_size),
+        convert_options=csv.ConvertOptions(include_columns=columns),
+    )
+    try:
+        return {field.name: pa.string() for field in reader.schema if pa.types.is_null(field.type)}
+    finally:
+        reader.close()
+
+
+def _iter_parquet_batches(file: Path, batch_size: int, batch_bytes: int | None, columns=None):
+    parquet_file = pq.ParquetFile(file, buffer_size=batch_bytes or 0)
+    metadata = parquet_file.metadata
+    if batch_bytes and metadata.num_rows:
+        row_bytes = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+        batch_size = max(1, min(batch_size, batch_bytes * metadata.num_rows // max(row_bytes, 1)))
+    try:
+        yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+    finally:
+        parquet_file.close()
+
+
+def to_batches(data, schema: OMOPSchemaBase = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Get the record batches of table data in any of the forms the streaming functions accept.
+
+    Args:
+        data (str | Path | pa.Table | pa.RecordBatch | Iterable[pa.RecordBatch] | pl.DataFrame |
+            pl.LazyFrame): The table data. Paths are streamed with `iter_table_batches`.
+        schema (OMOPSchemaBase, optional): Schema to cast batches read from a path against.
+        batch_size (int): Maximum number of rows per batch of paths, tables and Polars frames.
+
+    Returns:
+        Iterable[pa.RecordBatch]: The batches.
+    """
+    if isinstance(data, (str, Path)):
+        return iter_table_batches(data, schema=schema, batch_size=batch_size)
+    if isinstance(data, pa.Table):
+        return data.to_batches(max_chunksize=batch_size)
+    if isinstance(data, pa.RecordBatch):
+        return [data]
+    if POLARS_AVAILABLE and isinstance(data, pl.LazyFrame):
+        data = data.collect()
+    if POLARS_AVAILABLE and isinstance(data, pl.DataFrame):
+        return data.to_arrow().to_batches(max_chunksize=batch_size)
+    if isinstance(data, Iterable):
+        return data
+    raise TypeError(
+        "Unsupported data type. Must be a path, pa.Table, pa.RecordBatch, iterable of batches, pl.DataFrame "
+        "or pl.LazyFrame."
+    )
+
+
+class RowGroupWriter:
+    """
+    Buffer record batches and write them to a Parquet file in row groups of a fixed size.
+
+    Args:
+        path (str | Path): Path of the Parquet file.
+        schema (pa.Schema): The schema of the file.
+        row_group_size (int): Number of rows per row group. Only the last row group can be smaller.
+        compression (str): Parquet compression codec.
+        **writer_options: Passed to `pyarrow.parquet.ParquetWriter`.
+    """
+
+    def __init__(self, path, schema, row_group_size, compression, **writer_options):
+        self.row_group_size = row_group_size
+        self.num_rows = 0
+        self._writer = pq.ParquetWriter(path, schema, compression=compression, **writer_options)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def write_batch(self, batch):
+        self._buffer.append(batch)
+        self._buffered_rows += batch.num_rows
+        if self._buffered_rows >= self.row_group_size:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        table = pa.Table.from_batches(self._buffer)
+        full_groups = table.num_rows if final else table.num_rows - table.num_rows % self.row_group_size
+        if full_groups:
+            self._writer.write_table(table.slice(0, full_groups), row_group_size=self.row_group_size)
+            self.num_rows += full_groups
+        remainder = table.slice(full_groups)
+        self._buffer = remainder.to_batches() if remainder.num_rows else []
+        self._buffered_rows = remainder.num_rows
+
+    def close(self, flush=True):
+        """Write the buffered rows, unless `flush` is False, and close the file."""
+        if flush and self._buffer:
+            self._flush(final=True)
+        self._writer.close()
+
+
 def load_table_polars(
-    fp: str | Path, schema: OMOPSchemaBase = None, case_insensitive=True
+    fp: str | Path, schema: OMOPSchemaBase = None, case_insensitive=True, date_formats: list[str] = None
 ) -> pl.LazyFrame | None:
     """
     Load a dataset for the given OMOP table using Polars with lazy evaluation.
@@ -198,10 +577,12 @@ def load_table_polars(
     Args:
         fp (Path): Path to the file or directory.
         schema (OMOPSchemaBase, optional): Schema to validate and cast the table against.
+        case_insensitive (bool): If True, column names are lowercased.
+        date_formats (list[str], optional): `strptime` formats of CSV date and datetime values. Values that
+            match none of them become null. Defaults to inferring the format of each column.
 
     Returns:
         pl.LazyFrame | None: The loaded Polars LazyFrame, or None if no valid files are found.
-        :param case_insensitive:
     """
     if not isinstance(fp, Path):
         fp = Path(fp)
@@ -229,18 +610,96 @@ def load_table_polars(
     else:
         return None
 
-    # Convert every field/column to lowercase
-    if case_insensitive:
-        table = table.select(pl.all().name.to_lowercase())
-    # If a schema is provided, validate and cast the table. Keep the extra columns.
-    if schema:
-        expected_schema = schema.get_schema(table_name)
-        expected_schema = pyarrow_to_polars_schema(pa.schema(expected_schema))
-        table = convert_to_schema_polars(table, expected_schema, allow_extra_columns=True)
+    # Only the query plan is built here; the reading and casting happen when the frame is collected.
+    with instrumentation.stage("load_table_polars.plan", table=table_name):
+        # Convert every field/column to lowercase
+        if case_insensitive:
+            table = table.select(pl.all().name.to_lowercase())
+        # If a schema is provided, validate and cast the table. Keep the extra columns.
+        if schema:
+            expected_schema = schema.get_polars_schema(table_name)
+            table = convert_to_schema_polars(
+                table, expected_schema, allow_extra_columns=True, date_formats=date_formats
+            )
 
     return table
 
 
+def file_fingerprint(fp: str | Path, content_hash: bool = False) -> dict:
+    """
+    Compute a fingerprint of a file or directory to detect changes between runs.
+
+    Args:
+        fp (Path): Path to the file or directory.
+        content_hash (bool): If True, include a SHA-256 hash of the file contents. This reads every byte.
+
+    Returns:
+        dict: The total "size", latest "mtime_ns", "num_files" and "sha256" (None unless `content_hash`).
+    """
+    if not isinstance(fp, Path):
+        fp = Path(fp)
+    files = [fp] if fp.is_file() else sorted(file for file in fp.glob("**/*") if file.is_file())
+    stats = [file.stat() for file in files]
+    sha256 = None
+    if content_hash:
+        digest = hashlib.sha256()
+        for file in files:
+            digest.update(str(file.relative_to(fp) if file != fp else file.name).encode())
+            with open(file, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        sha256 = digest.hexdigest()
+    return {
+        "size": sum(stat.st_size for stat in stats),
+        "mtime_ns": max((stat.st_mtime_ns for stat in stats), default=0),
+        "num_files": len(files),
+        "sha256": sha256,
+    }
+
+
+def refresh_fingerprint(previous: dict, fp: str | Path, content_hash: bool = False) -> dict | None:
+    """
+    Check whether a file or directory is unchanged since `previous` was computed by `file_fingerprint`.
+
+    The size, modification time and number of files are compared first. If they differ and `content_hash`
+    is True, the content hash is compared instead, so touched but otherwise identical files are unchanged.
+
+    Args:
+        previous (dict): A fingerprint returned by `file_fingerprint`.
+        fp (Path): Path to the file or directory.
+        content_hash (bool): If True, fall back to comparing the SHA-256 content hash.
+
+    Returns:
+        dict | None: The current fingerprint if the file is unchanged, or None if it changed.
+    """
+    current = file_fingerprint(fp)
+    current["sha256"] = previous.get("sha256")
+    if all(previous.get(key) == current[key] for key in ("size", "mtime_ns", "num_files")):
+        return current
+    if content_hash and previous.get("sha256"):
+        if file_fingerprint(fp, content_hash=True)["sha256"] == previous["sha256"]:
+            return current
+    return None
+
+
+@contextmanager
+def atomic_write_path(fp: str | Path):
+    """
+    Context manager yielding a temporary path that replaces `fp` only if the block succeeds.
+
+    The temporary file is created next to `fp`, so the final rename is atomic. On error it is removed and
+    any existing file at `fp` is left untouched.
+    """
+    fp = Path(fp)
+    tmp_path = fp.with_name(f".{fp.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, fp)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
 def get_table_path(input_dir: str, table_name: str) -> Path | None:
     input_dir = Path(input_dir)
     table_path = input_dir / table_name
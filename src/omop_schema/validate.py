@@ -13,13 +13,34 @@ except (ImportError, ModuleNotFoundError):
     POLARS_AVAILABLE = False
 import pyarrow as pa
 
-from .utils import get_table_path, load_table_polars, pyarrow_to_polars_schema
+from . import instrumentation
+from .cache import ValidationCache
+from .checks import DEFAULT_MAX_SAMPLES, check_table_data
+from .parallel import estimate_memory, run_parallel
+from .report import JsonLinesReporter, table_record, write_summary
+from .utils import (
+    DEFAULT_SAMPLE_BYTES,
+    get_table_path,
+    load_table_polars,
+    read_table_schema,
+)
 
 
 class OMOPValidator:
     def __init__(self, schema_version):
-        self.schema_version = schema_version()
-        self.schema = schema_version()._load_schema()
+        # A schema class, or an instance such as a `CompactOMOPSchema` profile.
+        self.schema_version = schema_version() if isinstance(schema_version, type) else schema_version
+        self.schema = self.schema_version.schemas
+
+    def __getstate__(self):
+        # The frozen schemas are not picklable; they are restored from the schema version.
+        state = self.__dict__.copy()
+        del state["schema"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.schema = self.schema_version.schemas
 
     def get_schema_version(self):
         """
@@ -30,13 +51,15 @@ class OMOPValidator:
         """
         return self.schema_version
 
+    @instrumentation.staged("validate_table", table="table_name")
     def validate_table(self, table_name, dataset):
         """
         Validate a dataset against the schema for a specific OMOP table.
 
         Args:
             table_name (str): The name of the OMOP table to validate.
-            dataset (pa.Table | pl.DataFrame | pl.LazyFrame | pd.DataFrame): The dataset to validate.
+            dataset (pa.Table | pa.Schema | pl.DataFrame | pl.LazyFrame | pd.DataFrame): The dataset to
+                validate, or only its schema.
 
         Returns:
             dict: Validation results with missing, mismatched, extra columns, and correct columns.
@@ -48,17 +71,22 @@ class OMOPValidator:
         # Extract schema based on dataset type
         if isinstance(dataset, pa.Table):
             dataset_schema = {field.name: field.type for field in dataset.schema}
+        elif isinstance(dataset, pa.Schema):
+            dataset_schema = {field.name: field.type for field in dataset}
         elif POLARS_AVAILABLE and isinstance(dataset, (pl.DataFrame, pl.LazyFrame)):
-            expected_schema = pyarrow_to_polars_schema(pa.schema(expected_schema))
+            expected_schema = self.schema_version.get_polars_schema(table_name)
             dataset_schema = dataset.collect_schema()
             # dataset_schema = {col: dataset.schema[col] for col in dataset.columns}
         elif PANDAS_AVAILABLE and isinstance(dataset, pd.DataFrame):
             dataset_schema = {col: str(dtype) for col, dtype in dataset.dtypes.items()}
         else:
             raise TypeError(
-                "Unsupported dataset type. Must be pa.Table, pl.DataFrame, pl.LazyFrame, or pd.DataFrame."
+                "Unsupported dataset type. Must be pa.Table, pa.Schema, pl.DataFrame, pl.LazyFrame, "
+                "or pd.DataFrame."
             )
 
+        instrumentation.count("columns", len(dataset_schema), stage="validate_table", table=table_name)
+
         # Validation logic
         missing_columns = [
             (col, expected_schema[col]) for col in expected_schema if col not in dataset_schema
@@ -82,6 +110,69 @@ class OMOPValidator:
             "correct_columns": correct_columns,
         }
 
+    def validate_dataset_metadata(
+        self,
+        dataset_path,
+        load_with_expected_schema=True,
+        case_insensitive=True,
+        sample_bytes=DEFAULT_SAMPLE_BYTES,
+    ):
+        """
+        Validate every table of a dataset using only file metadata, without materializing row data.
+
+        Parquet tables are checked against their file footer, CSV and CSV.gz tables against their header
+        and a bounded sample used for type inference.
+
+        Args:
+            dataset_path (str | Path): Path to the dataset folder.
+            load_with_expected_schema (bool): If True, columns that can be cast to the expected type are
+                reported as correct, as they would be when loading with the expected schema.
+            case_insensitive (bool): If True, column names are lowercased before validation.
+            sample_bytes (int): Number of bytes of CSV data to read for type inference.
+
+        Returns:
+            dict: Validation results per table name. The value is None if the table does not exist in the
+            dataset or could not be read.
+        """
+        results = {}
+        for table_name in self.schema:
+            table_path = get_table_path(dataset_path, table_name)
+            if table_path is None:
+                results[table_name] = None
+                continue
+            expected_schema = self.schema_version.get_pyarrow_schema(table_name)
+            dataset_schema = read_table_schema(
+                table_path,
+                expected_schema if load_with_expected_schema else None,
+                sample_bytes=sample_bytes,
+                case_insensitive=case_insensitive,
+            )
+            if dataset_schema is None:
+                results[table_name] = None
+                continue
+            results[table_name] = self.validate_table(table_name, dataset_schema)
+        return results
+
+    def validate_table_data(self, table_name, data, rules=None, max_samples=DEFAULT_MAX_SAMPLES):
+        """
+        Validate the values of a dataset with vectorized row-level checks.
+
+        By default this checks the required (NOT NULL) fields, birth date ranges, end dates not before start
+        dates and non-negative quantities. See `omop_schema.checks.check_table_data`.
+
+        Args:
+            table_name (str): The name of the OMOP table to validate.
+            data (str | Path | pa.Table | pa.RecordBatch | Iterable[pa.RecordBatch]): The table data.
+            rules (list[Rule], optional): The rules to check instead of the default rules.
+            max_samples (int): Maximum number of violating row numbers reported per rule.
+
+        Returns:
+            dict: The number of rows checked and the violation counts and sample rows per rule.
+        """
+        if table_name not in self.schema:
+            raise ValueError(f"Table '{table_name}' is not defined in the schema.")
+        return check_table_data(self.schema_version, table_name, data, rules=rules, max_samples=max_samples)
+
     def strictly_valid(self):
         """
         Check if the dataset is strictly valid according to the schema.
@@ -120,79 +211,188 @@ import logging
 from rich.console import Console
 from rich.table import Table
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 
+def _validate_table_job(
+    validator,
+    table_name,
+    table_path,
+    load_with_expected_schema,
+    case_insensitive,
+    metadata_only,
+    sample_bytes,
+):
+    expected_schema = validator.get_schema_version()
+    if metadata_only:
+        dataset = read_table_schema(
+            table_path,
+            expected_schema.get_pyarrow_schema(table_name) if load_with_expected_schema else None,
+            sample_bytes=sample_bytes,
+            case_insensitive=case_insensitive,
+        )
+    else:
+        dataset = load_table_polars(table_path, expected_schema if load_with_expected_schema else None)
+    if dataset is None:
+        return None
+    return validator.validate_table(table_name, dataset)
+
+
+def _result_row(record):
+    table_name = record["table"]
+    if record["status"] == "missing":
+        return table_name, "[red]Table does not exist in this dataset[/red]", "-", "-", "-"
+    if record["status"] == "unreadable":
+        return table_name, "[red]Table could not be loaded[/red]", "-", "-", "-"
+    if record["status"] == "error":
+        return table_name, f"[red]Validation failed: {record['error']['message']}[/red]", "-", "-", "-"
+
+    def describe(status, template):
+        columns = [column for column in record["columns"] if column["status"] == status]
+        return ", ".join(template.format(**column) for column in columns) if columns else "None"
+
+    missing_columns = describe("missing", "{name}: {expected_type}")
+    mismatched_columns = describe("mismatched", "{name}: {actual_type} -> {expected_type}")
+    extra_columns = describe("extra", "{name}: {actual_type}")
+    correct_columns = describe("correct", "{name}: {expected_type}")
+
+    logger.info(
+        f"Validation results for table '{table_name}': Missing: {missing_columns}, "
+        f"Mismatched: {mismatched_columns}, Extra: {extra_columns}, Correct: {correct_columns}"
+    )
+    return table_name, missing_columns, mismatched_columns, extra_columns, correct_columns
+
+
 def validate_omop_dataset_graphically(
-    validator, dataset_path, load_with_expected_schema=True, case_insensitive=True
+    validator,
+    dataset_path,
+    load_with_expected_schema=True,
+    case_insensitive=True,
+    metadata_only=False,
+    sample_bytes=DEFAULT_SAMPLE_BYTES,
+    cache=None,
+    max_workers=1,
+    use_processes=False,
+    memory_limit=None,
+    report=None,
+    summary_path=None,
+    display=True,
 ):
     """
     Validate an OMOP dataset and display the results in a rich table format with logging.
-    """
-    console = Console(width=300, force_terminal=True)
-    results_table = Table(title="OMOP Dataset Validation Results")
-
-    results_table.add_column("Table Name", style="bold")
-    results_table.add_column("Missing Columns (Name: Expected Type)", style="red")
-    results_table.add_column("Mismatched Columns (Name: Actual Type -> Expected Type)", style="yellow")
-    results_table.add_column("Extra Columns (Name: Actual Type)", style="green")
-    results_table.add_column("Correct Columns (Name: Type)", style="cyan")
-
-    for table_name in validator.schema.keys():
-        logger.info(f"Validating table: {table_name}")
-        console.log(f"[bold blue]Validating table: {table_name}[/bold blue]")
-
-        table_path = get_table_path(dataset_path, table_name)
-        if table_path is None:
-            message = f"Table '{table_name}' does not exist in this dataset."
-            logger.warning(message)
-            results_table.add_row(
-                table_name, "[red]Table does not exist in this dataset[/red]", "-", "-", "-"
-            )
-            continue
 
-        expected_schema = validator.get_schema_version()
-        dataset = load_table_polars(table_path, expected_schema if load_with_expected_schema else None)
-        if dataset is not None:
-            result = validator.validate_table(table_name, dataset)
-        else:
-            message = f"Table '{table_name}' could not be loaded."
-            logger.warning(message)
-            results_table.add_row(table_name, "[red]Table could not be loaded[/red]", "-", "-", "-")
-            continue
-
-        missing_columns = (
-            ", ".join(f"{col}: {expected}" for col, expected in result["missing_columns"])
-            if result["missing_columns"]
-            else "None"
-        )
-        mismatched_columns = (
-            ", ".join(
-                f"{col}: {actual} -> {expected}" for col, actual, expected in result["mismatched_columns"]
-            )
-            if result["mismatched_columns"]
-            else "None"
-        )
-        extra_columns = (
-            ", ".join(f"{col}: {actual}" for col, actual in result["extra_columns"])
-            if result["extra_columns"]
-            else "None"
-        )
-        correct_columns = (
-            ", ".join(f"{col}: {expected}" for col, expected in result["correct_columns"])
-            if result["correct_columns"]
-            else "None"
-        )
+    If `metadata_only` is True, tables are validated from their Parquet footer or CSV header and a bounded
+    sample of `sample_bytes`, without materializing row data.
 
-        logger.info(
-            f"Validation results for table '{table_name}': Missing: {missing_columns}, "
-            f"Mismatched: {mismatched_columns}, Extra: {extra_columns}, Correct: {correct_columns}"
-        )
-        console.log(f"[green]Validation completed for table: {table_name}[/green]")
+    If a `cache` (a `ValidationCache` or the path of its JSON file) is given, tables whose files are
+    unchanged since a previous validation with the same schema version and options are not validated again.
+
+    With `max_workers` > 1, tables are loaded and validated concurrently, largest first, in a thread pool or,
+    with `use_processes`, in a process pool. Results are collected as tables finish and the results table is
+    rendered once all tables are done, in schema order. A table that fails to validate is reported in the
+    results table instead of aborting the validation.
 
-        results_table.add_row(table_name, missing_columns, mismatched_columns, extra_columns, correct_columns)
+    If a `report` (a `JsonLinesReporter`, or the path or open file it writes to) is given, the record of every
+    table is written to it as a JSON line as soon as the table is done. If a `summary_path` is given, a
+    Parquet or Arrow IPC summary with one row per column is written once all tables are done.
 
-    console.print(results_table)
+    Returns:
+        list[dict]: The report records of all tables, in schema order (see `report.table_record`).
+    """
+    if cache is not None and not isinstance(cache, ValidationCache):
+        cache = ValidationCache(cache)
+    reporter = report
+    if report is not None and not isinstance(report, JsonLinesReporter):
+        reporter = JsonLinesReporter(report)
+    options = {
+        "load_with_expected_schema": load_with_expected_schema,
+        "case_insensitive": case_insensitive,
+        "metadata_only": metadata_only,
+        "sample_bytes": sample_bytes if metadata_only else None,
+    }
+
+    console = Console(width=300, force_terminal=True, quiet=not display)
+    records = {}
+
+    def finish(record):
+        records[record["table"]] = record
+        if reporter is not None:
+            reporter.write(record)
+
+    try:
+        expected_schema = validator.get_schema_version()
+        jobs, table_paths = [], {}
+        for table_name in validator.schema.keys():
+            table_path = get_table_path(dataset_path, table_name)
+            if table_path is None:
+                message = f"Table '{table_name}' does not exist in this dataset."
+                logger.warning(message)
+                finish(table_record(table_name, status="missing"))
+                continue
+
+            result = (
+                cache.get(table_name, table_path, expected_schema, options) if cache is not None else None
+            )
+            if result is not None:
+                logger.info(f"Using cached validation results for table: {table_name}")
+                finish(table_record(table_name, result, path=table_path, seconds=0.0, cached=True))
+                continue
+
+            logger.info(f"Validating table: {table_name}")
+            console.log(f"[bold blue]Validating table: {table_name}[/bold blue]")
+            table_paths[table_name] = table_path
+            args = (
+                validator,
+                table_name,
+                table_path,
+                load_with_expected_schema,
+                case_insensitive,
+                metadata_only,
+            )
+            estimate = sample_bytes if metadata_only else estimate_memory(table_path)
+            jobs.append((table_name, (*args, sample_bytes), estimate))
+
+        for table_name, result, seconds, error in run_parallel(
+            _validate_table_job,
+            jobs,
+            max_workers=max_workers,
+            use_processes=use_processes,
+            memory_limit=memory_limit,
+        ):
+            table_path = table_paths[table_name]
+            if error is not None:
+                logger.error(f"Error validating table '{table_name}': {error['message']}")
+                finish(
+                    table_record(table_name, path=table_path, seconds=seconds, status="error", error=error)
+                )
+                continue
+            if result is None:
+                message = f"Table '{table_name}' could not be loaded."
+                logger.warning(message)
+                finish(table_record(table_name, path=table_path, seconds=seconds, status="unreadable"))
+                continue
+            if cache is not None:
+                cache.put(table_name, table_path, expected_schema, result, options)
+            finish(table_record(table_name, result, path=table_path, seconds=seconds))
+            console.log(f"[green]Validation completed for table: {table_name} ({seconds:.1f}s)[/green]")
+
+        records = [records[table_name] for table_name in validator.schema.keys()]
+        results_table = Table(title="OMOP Dataset Validation Results")
+        results_table.add_column("Table Name", style="bold")
+        results_table.add_column("Missing Columns (Name: Expected Type)", style="red")
+        results_table.add_column("Mismatched Columns (Name: Actual Type -> Expected Type)", style="yellow")
+        results_table.add_column("Extra Columns (Name: Actual Type)", style="green")
+        results_table.add_column("Correct Columns (Name: Type)", style="cyan")
+        for record in records:
+            results_table.add_row(*_result_row(record))
+
+        console.print(results_table)
+    finally:
+        if cache is not None:
+            cache.save()
+        if reporter is not report:
+            reporter.close()
+    if summary_path is not None:
+        write_summary(records, summary_path)
     logger.info("Validation process completed.")
+    return records
@@ -0,0 +1,437 @@
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .schema.base import OMOPSchemaBase
+from .schema.v5_3 import OMOPSchemaV53
+from .utils import DEFAULT_BATCH_SIZE, atomic_write_path, iter_table_batches
+
+FNV_OFFSET_BASIS = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+# Byte hashed between the vocabulary id and the concept code, so e.g. ("AB", "C") and ("A", "BC") differ.
+KEY_SEPARATOR = np.uint64(0x1F)
+
+INDEX_VERSION = "1"
+DICTIONARY_COLUMNS = ("domain_id", "vocabulary_id", "concept_class_id", "standard_concept", "invalid_reason")
+STRING_COLUMNS = ("concept_name", "concept_code")
+REQUIRED_CONCEPT_COLUMNS = ("concept_id", "concept_name", "vocabulary_id", "concept_code")
+DEFAULT_LOOKUP_COLUMNS = ("concept_name", "domain_id", "vocabulary_id", "standard_concept")
+
+
+def _string_array(strings):
+    """Convert strings to a single-chunk large string array with nulls replaced by empty strings."""
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    elif not isinstance(strings, pa.Array):
+        strings = pa.array(strings, pa.large_string())
+    if pa.types.is_dictionary(strings.type):
+        strings = strings.dictionary_decode()
+    return pc.fill_null(strings.cast(pa.large_string()), "")
+
+
+def fnv1a_hash(strings, hashes=None):
+    """
+    Compute the 64-bit FNV-1a hash of every string of an array, vectorized over the strings.
+
+    The bytes are hashed one position at a time for all strings that are at least that long, so the number
+    of numpy operations grows with the length of the longest string rather than with the number of strings.
+
+    Args:
+        strings (pa.Array | pa.ChunkedArray | Iterable[str]): The strings. Nulls hash like empty strings.
+        hashes (np.ndarray, optional): Hashes to continue from, e.g. of a preceding key part. Defaults to the
+            FNV offset basis.
+
+    Returns:
+        np.ndarray: The uint64 hash of every string.
+    """
+    strings = _string_array(strings)
+    num_strings = len(strings)
+    _, offsets_buffer, data_buffer = strings.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[strings.offset : strings.offset + num_strings + 1]
+    data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.empty(0, np.uint8)
+    lengths = np.diff(offsets)
+
+    # Hash the longest strings first, so the strings that still have a byte at each position are a prefix.
+    order = np.argsort(-lengths, kind="stable")
+    starts, lengths = offsets[:-1][order], lengths[order]
+    if hashes is None:
+        sorted_hashes = np.full(num_strings, FNV_OFFSET_BASIS, dtype=np.uint64)
+    else:
+        sorted_hashes = np.asarray(hashes, dtype=np.uint64)[order]
+    for position in range(int(lengths[0]) if num_strings else 0):
+        active = np.searchsorted(-lengths, -position, side="left")
+        sorted_hashes[:active] = (sorted_hashes[:active] ^ data[starts[:active] + position]) * FNV_PRIME
+
+    result = np.empty(num_strings, dtype=np.uint64)
+    result[order] = sorted_hashes
+    return result
+
+
+def code_keys(vocabulary_ids, concept_codes):
+    """
+    Hash (vocabulary_id, concept_code) pairs into 64-bit keys.
+
+    Args:
+        vocabulary_ids (pa.Array | pa.ChunkedArray | Iterable[str]): The vocabulary ids.
+        concept_codes (pa.Array | pa.ChunkedArray | Iterable[str]): The concept codes.
+
+    Returns:
+        np.ndarray: The uint64 key of every pair.
+    """
+    hashes = (fnv1a_hash(vocabulary_ids) ^ KEY_SEPARATOR) * FNV_PRIME
+    return fnv1a_hash(concept_codes, hashes)
+
+
+def _read_columns(data, table_name, required_columns, optional_columns, schema, batch_size):
+    """Read the columns of a vocabulary table from a path, or select them from a table."""
+    if not isinstance(data, pa.Table):
+        # Read with the types of the schema: inferred types would be fixed by the first block, e.g. numeric
+        # concept codes or all-null flags, and fail on the first later value that does not fit.
+        schema = schema if schema is not None else OMOPSchemaV53()
+        data = pa.Table.from_batches(iter_table_batches(data, schema=schema, batch_size=batch_size))
+    missing = [column for column in required_columns if column not in data.schema.names]
+    if missing:
+        raise ValueError(f"The {table_name} table has no columns {missing}.")
+    return data.select(
+        [*required_columns, *(column for column in optional_columns if column in data.schema.names)]
+    )
+
+
+def _write_index(table, path, kind):
+    """Write an index table as a single-batch Arrow IPC file, tagged with its kind and version."""
+    table = table.combine_chunks().replace_schema_metadata({f"omop_schema.{kind}": INDEX_VERSION})
+    with atomic_write_path(path) as tmp_path:
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+
+
+def _read_index(path, kind):
+    """Memory-map an index file written by `_write_index`."""
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if (table.schema.metadata or {}).get(f"omop_schema.{kind}".encode()) != INDEX_VERSION.encode():
+        raise ValueError(f"{path} is not a {kind.replace('_', ' ')} of version {INDEX_VERSION}.")
+    return table
+
+
+def _numpy_column(table, column):
+    """Get a zero-copy numpy view of a column of a single-batch index table."""
+    chunks = table[column].chunks
+    return (
+        chunks[0].to_numpy()
+        if chunks
+        else np.empty(0, dtype=table.schema.field(column).type.to_pandas_dtype())
+    )
+
+
+class ConceptIndex:
+    """
+    Memory-mapped index of the OMOP `concept` table for batched lookups.
+
+    The index is an Arrow IPC file holding the concepts sorted by `concept_id`, with low-cardinality string
+    columns dictionary-encoded, and the sorted 64-bit hashes of their (vocabulary_id, concept_code) pairs.
+    Opening it maps the file without reading it, and lookups are vectorized binary searches, so the index can
+    be shared by many processes and queried with millions of ids at once.
+
+    Build it once with `ConceptIndex.build` and open it with `ConceptIndex(path)`.
+
+    Args:
+        path (str | Path): Path to the index file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.table = _read_index(self.path, "concept_index")
+        self._concept_ids = _numpy_column(self.table, "concept_id")
+        self._code_keys = _numpy_column(self.table, "code_key")
+        self._code_rows = _numpy_column(self.table, "code_row")
+
+    @classmethod
+    def build(cls, concept, path, schema: OMOPSchemaBase = None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Build a concept index from the `concept` table.
+
+        Args:
+            concept (str | Path | pa.Table): Path to the `concept` table, or the table itself.
+            path (str | Path): Path of the index file to write.
+            schema (OMOPSchemaBase, optional): The schema version used to read the `concept` table. Defaults
+                to `OMOPSchemaV53`.
+            batch_size (int): Maximum number of rows read per batch.
+
+        Returns:
+            ConceptIndex: The opened index.
+        """
+        optional_columns = [column for column in DICTIONARY_COLUMNS if column != "vocabulary_id"]
+        table = _read_columns(
+            concept, "concept", REQUIRED_CONCEPT_COLUMNS, optional_columns, schema, batch_size
+        )
+
+        arrays = {"concept_id": table["concept_id"].cast(pa.int64())}
+        for column in STRING_COLUMNS:
+            arrays[column] = table[column].cast(pa.large_string())
+        for column in DICTIONARY_COLUMNS:
+            if column in table.schema.names:
+                arrays[column] = table[column].cast(pa.string()).dictionary_encode()
+        table = pa.table(arrays).sort_by("concept_id").combine_chunks()
+
+        # Valid concepts come first among pairs with the same key, so lookups prefer them. CSV files store
+        # valid concepts with an empty invalid_reason.
+        keys = code_keys(table["vocabulary_id"], table["concept_code"])
+        if "invalid_reason" in table.schema.names:
+            invalid_reason = table["invalid_reason"].cast(pa.string())
+            invalid = pc.fill_null(pc.not_equal(invalid_reason, ""), False).to_numpy(zero_copy_only=False)
+        else:
+            invalid = np.zeros(table.num_rows, dtype=bool)
+        code_rows = np.lexsort((invalid, keys))
+        table = table.append_column("code_key", pa.array(keys[code_rows]))
+        table = table.append_column("code_row", pa.array(code_rows.astype(np.int64)))
+        _write_index(table, path, "concept_index")
+        return cls(path)
+
+    def __len__(self):
+        return len(self._concept_ids)
+
+    def _rows(self, concept_ids):
+        concept_ids = np.asarray(concept_ids, dtype=np.int64)
+        if not len(self):
+            return np.zeros(len(concept_ids), dtype=np.int64), np.zeros(len(concept_ids), dtype=bool)
+        rows = np.minimum(np.searchsorted(self._concept_ids, concept_ids), len(self) - 1)
+        return rows, self._concept_ids[rows] == concept_ids
+
+    def lookup(self, concept_ids, columns=DEFAULT_LOOKUP_COLUMNS):
+        """
+        Look up the attributes of concepts by id.
+
+        Args:
+            concept_ids (Iterable[int]): The concept ids.
+            columns (Iterable[str]): The concept columns to return.
+
+        Returns:
+            pa.Table: One row per requested id, in the requested order, with the "concept_id" and the given
+            columns. The columns are null for unknown ids.
+        """
+        concept_ids = np.asarray(concept_ids, dtype=np.int64)
+        rows, found = self._rows(concept_ids)
+        indices = pa.array(rows, mask=~found)
+        arrays = [pa.array(concept_ids)] + [self.table[column].take(indices) for column in columns]
+        return pa.table(arrays, names=["concept_id", *columns])
+
+    def concept_ids(self, vocabulary_ids, concept_codes):
+        """
+        Map (vocabulary_id, concept_code) pairs to concept ids.
+
+        If a code occurs several times in a vocabulary, valid concepts are preferred over invalid ones.
+
+        Args:
+            vocabulary_ids (str | pa.Array | Iterable[str]): The vocabulary ids, or a single vocabulary id for
+                all codes.
+            concept_codes (pa.Array | Iterable[str]): The concept codes.
+
+        Returns:
+            pa.Array: The int64 concept id of every pair, or null for unknown pairs.
+        """
+        concept_codes = _string_array(concept_codes)
+        if isinstance(vocabulary_ids, str):
+            vocabulary_ids = pa.repeat(pa.scalar(vocabulary_ids, pa.large_string()), len(concept_codes))
+        vocabulary_ids = _string_array(vocabulary_ids)
+        keys = code_keys(vocabulary_ids, concept_codes)
+        if not len(self):
+            return pa.nulls(len(keys), pa.int64())
+
+        positions = np.minimum(np.searchsorted(self._code_keys, keys), len(self) - 1)
+        rows = self._code_rows[positions]
+        found = self._code_keys[positions] == keys
+        # Rule out hash collisions by comparing the strings of the candidate rows.
+        matches = found & self._matches(rows, vocabulary_ids, concept_codes)
+        for query in np.flatnonzero(found & ~matches):
+            position = positions[query] + 1
+            while position < len(self) and self._code_keys[position] == keys[query]:
+                row = self._code_rows[position]
+                if self._matches([row], vocabulary_ids[query : query + 1], concept_codes[query : query + 1])[
+                    0
+                ]:
+                    rows[query], matches[query] = row, True
+                    break
+                position += 1
+        return pa.array(self._concept_ids[rows], mask=~matches)
+
+    def _matches(self, rows, vocabulary_ids, concept_codes):
+        rows = pa.array(rows, pa.int64())
+        codes = self.table["concept_code"].take(rows)
+        vocabularies = self.table["vocabulary_id"].take(rows).cast(pa.large_string())
+        matches = pc.and_(pc.equal(codes, concept_codes), pc.equal(vocabularies, vocabulary_ids))
+        return pc.fill_null(matches, False).to_numpy(zero_copy_only=False)
+
+
+def _gather_ranges(starts, ends):
+    """Get the positions covered by the ranges [starts, ends) and the range each position belongs to."""
+    lengths = ends - starts
+    ranges = np.repeat(np.arange(len(starts)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + starts[ranges]
+    return positions, ranges
+
+
+class AncestorIndex:
+    """
+    Memory-mapped index of the OMOP `concept_ancestor` table for batched descendant and ancestor queries.
+
+    `concept_ancestor` already holds the transitive closure of the concept hierarchy, so all descendants of a
+    concept are the rows with that ancestor. The index stores the closure twice in CSR form, once grouped by
+    ancestor and once grouped by descendant: a sorted array of the concepts that have neighbours, the offsets
+    of their neighbour ranges, and the neighbours with their levels of separation. Queries locate the ranges
+    of all seed concepts with one binary search and gather them without a join.
+
+    Build it once with `AncestorIndex.build` and open it with `AncestorIndex(path)`.
+
+    Args:
+        path (str | Path): Path to the index directory.
+    """
+
+    DIRECTIONS = {"descendants": "ancestor_concept_id", "ancestors": "descendant_concept_id"}
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._csr = {}
+        for direction in self.DIRECTIONS:
+            nodes = _read_index(self.path / f"{direction}_nodes.arrow", "ancestor_index")
+            edges = _read_index(self.path / f"{direction}.arrow", "ancestor_index")
+            self._csr[direction] = (
+                _numpy_column(nodes, "concept_id"),
+                _numpy_column(nodes, "offset"),
+                _numpy_column(edges, "concept_id"),
+                _numpy_column(edges, "min_levels_of_separation"),
+                _numpy_column(edges, "max_levels_of_separation"),
+            )
+
+    @classmethod
+    def build(cls, concept_ancestor, path, schema: OMOPSchemaBase = None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Build an ancestor index from the `concept_ancestor` table.
+
+        Args:
+            concept_ancestor (str | Path | pa.Table): Path to the `concept_ancestor` table, or the table.
+            path (str | Path): Path of the index directory to write.
+            schema (OMOPSchemaBase, optional): The schema version used to read the `concept_ancestor`
+                table. Defaults to `OMOPSchemaV53`.
+            batch_size (int): Maximum number of rows read per batch.
+
+        Returns:
+            AncestorIndex: The opened index.
+        """
+        columns = [
+            "ancestor_concept_id",
+            "descendant_concept_id",
+            "min_levels_of_separation",
+            "max_levels_of_separation",
+        ]
+        table = _read_columns(concept_ancestor, "concept_ancestor", columns, [], schema, batch_size)
+        arrays = [
+            table[column].cast(pa.int64() if column.endswith("_id") else pa.int32()) for column in columns
+        ]
+        table = pa.table(arrays, names=columns)
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for direction, source_column in cls.DIRECTIONS.items():
+            target_column = next(column for column in columns[:2] if column != source_column)
+            edges = table.sort_by(
+                [(source_column, "ascending"), (target_column, "ascending")]
+            ).combine_chunks()
+            sources = _numpy_column(edges, source_column)
+            nodes, starts = np.unique(sources, return_index=True)
+            offsets = np.append(starts, len(sources)).astype(np.int64)
+            # The nodes are padded with a last entry that only holds the end offset of the last range.
+            nodes_table = pa.table({"concept_id": np.append(nodes, 0), "offset": offsets})
+            edges_table = pa.table(
+                {
+                    "concept_id": edges[target_column],
+                    "min_levels_of_separation": edges["min_levels_of_separation"],
+                    "max_levels_of_separation": edges["max_levels_of_separation"],
+                }
+            )
+            _write_index(nodes_table, path / f"{direction}_nodes.arrow", "ancestor_index")
+            _write_index(edges_table, path / f"{direction}.arrow", "ancestor_index")
+        return cls(path)
+
+    def _query(self, direction, concept_ids, min_levels, max_levels):
+        nodes, offsets, neighbours, min_separation, max_separation = self._csr[direction]
+        concept_ids = np.asarray(concept_ids, dtype=np.int64)
+        num_nodes = len(nodes) - 1
+        rows = np.minimum(np.searchsorted(nodes[:num_nodes], concept_ids), max(num_nodes - 1, 0))
+        found = nodes[rows] == concept_ids if num_nodes else np.zeros(len(concept_ids), dtype=bool)
+        starts = np.where(found, offsets[rows], 0)
+        ends = np.where(found, offsets[rows + 1] if num_nodes else 0, 0)
+        positions, seeds = _gather_ranges(starts, ends)
+
+        levels = min_separation[positions]
+        mask = np.ones(len(positions), dtype=bool)
+        if min_levels is not None:
+            mask &= levels >= min_levels
+        if max_levels is not None:
+            mask &= levels <= max_levels
+        positions, seeds = positions[mask], seeds[mask]
+        return concept_ids[seeds], neighbours[positions], min_separation[positions], max_separation[positions]
+
+    def _result(self, direction, concept_ids, min_levels, max_levels):
+        seeds, neighbours, min_separation, max_separation = self._query(
+            direction, concept_ids, min_levels, max_levels
+        )
+        neighbour_column = "descendant_concept_id" if direction == "descendants" else "ancestor_concept_id"
+        return pa.table(
+            {
+                "concept_id": seeds,
+                neighbour_column: neighbours,
+                "min_levels_of_separation": min_separation,
+                "max_levels_of_separation": max_separation,
+            }
+        )
+
+    def descendants(self, concept_ids, min_levels=None, max_levels=None):
+        """
+        Find the descendants of concepts.
+
+        The levels filter on the minimum levels of separation, i.e. the shortest path in the hierarchy.
+        `concept_ancestor` relates every standard concept to itself with 0 levels of separation, so pass
+        `min_levels=1` to exclude the concepts themselves.
+
+        Args:
+            concept_ids (Iterable[int]): The seed concept ids.
+            min_levels (int, optional): Minimum levels of separation.
+            max_levels (int, optional): Maximum levels of separation.
+
+        Returns:
+            pa.Table: One row per (seed, descendant) pair with the seed "concept_id", the
+            "descendant_concept_id" and the "min_levels_of_separation" and "max_levels_of_separation".
+        """
+        return self._result("descendants", concept_ids, min_levels, max_levels)
+
+    def ancestors(self, concept_ids, min_levels=None, max_levels=None):
+        """
+        Find the ancestors of concepts.
+
+        Args:
+            concept_ids (Iterable[int]): The seed concept ids.
+            min_levels (int, optional): Minimum levels of separation.
+            max_levels (int, optional): Maximum levels of separation.
+
+        Returns:
+            pa.Table: One row per (seed, ancestor) pair with the seed "concept_id", the "ancestor_concept_id"
+            and the "min_levels_of_separation" and "max_levels_of_separation".
+        """
+        return self._result("ancestors", concept_ids, min_levels, max_levels)
+
+    def descendant_ids(self, concept_ids, min_levels=None, max_levels=None):
+        """
+        Expand concepts to the sorted, unique ids of all their descendants, e.g. for a cohort definition.
+
+        Args:
+            concept_ids (Iterable[int]): The seed concept ids.
+            min_levels (int, optional): Minimum levels of separation.
+            max_levels (int, optional): Maximum levels of separation.
+
+        Returns:
+            np.ndarray: The unique descendant concept ids.
+        """
+        return np.unique(self._query("descendants", concept_ids, min_levels, max_levels)[1])
@@ -0,0 +1,117 @@
+import os
+
+import pyarrow as pa
+import pytest
+
+from omop_schema.cache import TableCache, ValidationCache
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.utils import load_table, load_table_polars
+from omop_schema.validate import OMOPValidator, validate_omop_dataset_graphically
+
+
+@pytest.fixture
+def person_csv(tmp_path):
+    """Fixture to create a CSV 'person' table."""
+    path = tmp_path / "person.csv"
+    path.write_text("person_id,year_of_birth\n1,1980\n")
+    return path
+
+
+def test_validation_cache(tmp_path, person_csv):
+    """Test that cached results survive a reload and are invalidated by changes to the table files."""
+    schema = OMOPSchemaV53()
+    result = {"missing_columns": [("month_of_birth", pa.int64())], "extra_columns": []}
+    cache = ValidationCache(tmp_path / "cache.json")
+    assert cache.get("person", person_csv, schema) is None
+    cache.put("person", person_csv, schema, result)
+    cache.save()
+
+    cache = ValidationCache(tmp_path / "cache.json")
+    assert cache.get("person", person_csv, schema) == result
+    assert cache.get("person", person_csv, OMOPSchemaV54()) is None, "Schema versions must not share entries."
+    assert cache.get("person", person_csv, schema, {"metadata_only": True}) is None
+
+    person_csv.write_text("person_id,year_of_birth\n1,1980\n2,1990\n")
+    assert cache.get("person", person_csv, schema) is None, "A changed table must not be a cache hit."
+
+
+def test_validation_cache_restores_data_types(tmp_path, person_csv):
+    """Test that cached results hold the same Arrow and Polars data types as fresh validation results."""
+    schema = OMOPSchemaV53()
+    validator = OMOPValidator(schema)
+    for loader in (load_table, load_table_polars):
+        result = validator.validate_table("person", loader(person_csv, schema))
+        cache = ValidationCache(tmp_path / "cache.json")
+        cache.get("person", person_csv, schema)
+        cache.put("person", person_csv, schema, result)
+        cache.save()
+        cached = ValidationCache(tmp_path / "cache.json").get("person", person_csv, schema)
+        assert cached == result
+        assert not isinstance(cached["correct_columns"][0][1], str)
+
+
+def test_validation_cache_content_hash(tmp_path, person_csv):
+    """Test that a touched but unchanged table is still a cache hit when content hashing is enabled."""
+    schema = OMOPSchemaV53()
+    cache = ValidationCache(tmp_path / "cache.json", content_hash=True)
+    cache.get("person", person_csv, schema)
+    cache.put("person", person_csv, schema, {"extra_columns": []})
+    os.utime(person_csv, ns=(0, 0))
+    assert cache.get("person", person_csv, schema) == {"extra_columns": []}
+
+
+def test_validate_graphically_with_cache(tmp_path, person_csv, monkeypatch):
+    """Test that a repeat graphical validation reuses cached results for unchanged tables."""
+    validator = OMOPValidator(OMOPSchemaV53)
+    cache_path = tmp_path / "cache.json"
+    validate_omop_dataset_graphically(validator, tmp_path, metadata_only=True, cache=cache_path)
+    assert cache_path.exists()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Table was validated again.")
+
+    monkeypatch.setattr(validator, "validate_table", fail)
+    validate_omop_dataset_graphically(validator, tmp_path, metadata_only=True, cache=cache_path)
+
+
+def test_table_cache(tmp_path, person_csv):
+    """Test that loaded tables are cached, memory-mapped and reloaded when their source changes."""
+    cache = TableCache(tmp_path / "cache")
+    schema = OMOPSchemaV54()
+    table = load_table(person_csv, schema, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert table.schema.field("person_id").type == pa.int64()
+
+    cached = load_table(person_csv, schema, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cached.equals(table)
+    # Tables loaded without a schema are cached separately.
+    assert load_table(person_csv, cache=cache).schema.field("year_of_birth").type == pa.int64()
+    assert cache.misses == 2
+
+    person_csv.write_text("person_id,year_of_birth\n1,1980\n2,1990\n")
+    os.utime(person_csv, ns=(0, 0))
+    assert load_table(person_csv, schema, cache=cache).num_rows == 2
+    assert cache.misses == 3
+
+    datasets = schema.load_csv_dataset(person_csv.parent, cache=cache)
+    datasets = schema.load_csv_dataset(person_csv.parent, cache=cache)
+    assert datasets["person"].num_rows == 2
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_table_cache_eviction(tmp_path, person_csv):
+    """Test that the least recently used tables are evicted once the cache exceeds its size limit."""
+    other_csv = tmp_path / "death.csv"
+    other_csv.write_text("person_id,death_date\n1,2020-01-01\n")
+    cache = TableCache(tmp_path / "cache")
+    load_table(person_csv, cache=cache)
+    load_table(other_csv, cache=cache)
+    sizes = sorted(path.stat().st_size for path in cache.directory.glob("*.arrow"))
+
+    os.utime(cache._paths(other_csv, "load_table|")[0], ns=(0, 0))
+    assert cache.evict(max_bytes=max(sizes)) > 0
+    assert len(list(cache.directory.glob("*.arrow"))) == 1
+    load_table(person_csv, cache=cache)
+    assert cache.hits == 1
@@ -0,0 +1,138 @@
+import datetime
+
+import pyarrow as pa
+import pytest
+from pyarrow import csv
+
+from omop_schema.cache import TableCache
+from omop_schema.casting import safe_cast
+from omop_schema.convert import convert_to_schema
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.utils import iter_table_batches, load_table
+
+
+@pytest.fixture
+def measurement_csv(tmp_path):
+    """Fixture to create a CSV 'measurement' table with values that cannot be cast to the schema."""
+    path = tmp_path / "measurement.csv"
+    path.write_text(
+        "measurement_id,person_id,measurement_date,value_as_number,unit_source_value\n"
+        "1,1,2020-01-01,1.5,mmHg\n"
+        "2,abc,2020-13-01,,mmHg\n"
+        "3,99999999999999999999,2020-01-03,N/A,\n"
+        "4,4,2020-01-04 10:00:00,high,kg\n"
+    )
+    return path
+
+
+def test_safe_cast_sets_invalid_values_to_null():
+    """Test that unparseable, overflowing and lossy values become null and are reported in the mask."""
+    values, invalid = safe_cast(pa.array(["1", "N/A", "99999999999999999999", None, "-4"]), pa.int64())
+    assert values.to_pylist() == [1, None, None, None, -4]
+    assert invalid.to_pylist() == [False, True, True, False, False]
+
+    values, invalid = safe_cast(pa.array([1.0, 2.5, 3_000_000_000.0]), pa.int32())
+    assert values.to_pylist() == [1, None, None]
+
+    values, invalid = safe_cast(
+        pa.chunked_array([["2020-01-31", "31/01/2020"], ["2020-02-30", "2020-02-01 10:00:00"]]),
+        pa.date32(),
+        date_formats=["%d/%m/%Y"],
+    )
+    assert values.to_pylist() == [datetime.date(2020, 1, 31)] * 2 + [None, datetime.date(2020, 2, 1)]
+    assert invalid.to_pylist() == [False, False, True, False]
+
+    values, invalid = safe_cast(pa.array(["30/02/2020", "1/3/2020"]), pa.date64(), ["%d/%m/%Y"])
+    assert values.to_pylist() == [None, datetime.date(2020, 3, 1)]
+    assert invalid.to_pylist() == [True, False]
+
+    values, invalid = safe_cast(
+        pa.array(
+            [
+                "2020-01-31T10:00:00.5Z",
+                "2020-01-31 10:00",
+                "2021-02-29 00:00:00",
+                "2020-01-31T10:00:00.1234567",
+            ]
+        ),
+        pa.timestamp("us"),
+    )
+    assert values.to_pylist() == [
+        datetime.datetime(2020, 1, 31, 10, 0, 0, 500000),
+        datetime.datetime(2020, 1, 31, 10, 0),
+        None,
+        None,
+    ]
+
+    values, invalid = safe_cast(pa.array([1, 2**60 + 1]), pa.float64())
+    assert invalid.to_pylist() == [False, True]
+
+    values, invalid = safe_cast(pa.array(["1", "2"]), pa.int32())
+    assert invalid is None
+
+
+def test_load_table_nulls_and_quarantines_invalid_values(measurement_csv, tmp_path):
+    """Test that invalid values are set to null, counted and quarantined instead of failing the load."""
+    schema = OMOPSchemaV54()
+    with pytest.raises(pa.ArrowInvalid):
+        load_table(measurement_csv, schema)
+
+    quarantine = tmp_path / "quarantine" / "measurement.csv"
+    table = load_table(measurement_csv, schema, errors="null", quarantine=quarantine)
+    assert table.schema == load_table(measurement_csv, schema, errors="null").schema
+    assert table.column("person_id").to_pylist() == [1, None, None, 4]
+    assert table.column("measurement_date").to_pylist() == [
+        datetime.date(2020, 1, 1),
+        None,
+        datetime.date(2020, 1, 3),
+        datetime.date(2020, 1, 4),
+    ]
+    assert table.column("value_as_number").to_pylist() == [1.5, None, None, None]
+    assert table.column("unit_source_value").to_pylist() == ["mmHg", "mmHg", "", "kg"]
+
+    rows = csv.read_csv(quarantine)
+    assert rows.column("measurement_id").to_pylist() == [2, 3, 4]
+    assert rows.column("invalid_columns").to_pylist() == [
+        "person_id,measurement_date",
+        "person_id",
+        "value_as_number",
+    ]
+
+    batches = list(iter_table_batches(measurement_csv, schema, batch_size=2, errors="null"))
+    assert pa.Table.from_batches(batches).equals(table)
+
+
+def test_load_table_does_not_cache_nulled_tables(measurement_csv, tmp_path):
+    """Test that loads with errors="null" bypass the cache, so every load quarantines its invalid rows."""
+    cache = TableCache(tmp_path / "cache")
+    for load in range(2):
+        quarantine = tmp_path / f"quarantine_{load}.csv"
+        table = load_table(
+            measurement_csv, OMOPSchemaV54(), cache=cache, errors="null", quarantine=quarantine
+        )
+        assert table.column("person_id").to_pylist() == [1, None, None, 4]
+        assert csv.read_csv(quarantine).num_rows == 3
+    assert not list((tmp_path / "cache").glob("*"))
+
+
+def test_load_csv_dataset_reports_invalid_values(measurement_csv):
+    """Test that the load report counts invalid values per column."""
+    datasets, report = OMOPSchemaV54().load_csv_dataset(
+        measurement_csv.parent, errors="null", return_report=True
+    )
+    assert datasets["measurement"].num_rows == 4
+    assert report["measurement"]["invalid_values"] == {
+        "person_id": 2,
+        "measurement_date": 1,
+        "value_as_number": 1,
+    }
+
+
+def test_convert_to_schema_errors():
+    """Test that conversions can set values that do not fit the target schema to null."""
+    table = pa.table({"person_id": pa.array(["1", "x"]), "measurement_id": pa.array([1, 2_147_483_648])})
+    target = pa.schema({"measurement_id": pa.int32(), "person_id": pa.int64()})
+    with pytest.raises(pa.ArrowInvalid):
+        convert_to_schema(table, target)
+    result = convert_to_schema(table, target, errors="null")
+    assert result.to_pydict() == {"measurement_id": [1, None], "person_id": [1, None]}
@@ -0,0 +1,72 @@
+import datetime
+
+import pyarrow as pa
+
+from omop_schema.checks import NotNullRule, RangeRule, check_table_data, default_rules
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.validate import OMOPValidator
+
+
+def test_default_rules():
+    """Test that the default rules are derived from the schema."""
+    names = {rule.name for rule in default_rules(OMOPSchemaV53(), "drug_exposure")}
+    assert "not_null:drug_concept_id" in names
+    assert "date_order:drug_exposure_end_date>=drug_exposure_start_date" in names
+    assert "date_order:drug_exposure_end_datetime>=drug_exposure_start_datetime" in names
+    assert {"range:quantity", "range:days_supply"} <= names
+
+
+def test_check_table_data_over_batches():
+    """Test that violations are counted over all batches and sampled with global row numbers."""
+    start = datetime.date(2020, 1, 10)
+    table = pa.table(
+        {
+            "drug_exposure_id": pa.array(range(6), pa.int64()),
+            "drug_concept_id": pa.array([1, None, 3, 4, None, 6], pa.int64()),
+            "drug_exposure_start_date": pa.array([start] * 6, pa.date32()),
+            "drug_exposure_end_date": pa.array(
+                [
+                    start,
+                    start - datetime.timedelta(days=1),
+                    None,
+                    start,
+                    start,
+                    start - datetime.timedelta(1),
+                ],
+                pa.date32(),
+            ),
+            "quantity": pa.array([1.0, -2.0, None, 0.0, 5.0, -1.0]),
+            "days_supply": pa.array([30, 30, 30, 30, 30, 30], pa.int64()),
+        }
+    )
+
+    result = check_table_data(OMOPSchemaV53(), "drug_exposure", table, batch_size=4)
+
+    assert result["num_rows"] == 6
+    rules = result["rules"]
+    assert rules["not_null:drug_concept_id"]["violations"] == 2
+    assert rules["not_null:drug_concept_id"]["sample_rows"] == [1, 4]
+    assert rules["date_order:drug_exposure_end_date>=drug_exposure_start_date"]["sample_rows"] == [1, 5]
+    assert rules["range:quantity"]["violations"] == 2
+    assert rules["range:days_supply"]["violations"] == 0
+    assert "not_null:person_id" not in rules, "Rules for absent columns should not be reported."
+
+
+def test_validate_table_data_custom_rules():
+    """Test the validator entry point with custom rules and sample limits."""
+    table = pa.table({"person_id": [1, None, None, None], "year_of_birth": [1990, 1700, 2000, 3000]})
+    validator = OMOPValidator(OMOPSchemaV53)
+
+    result = validator.validate_table_data(
+        "person",
+        table,
+        rules=[NotNullRule("person_id"), RangeRule("year_of_birth", 1800, 2100)],
+        max_samples=2,
+    )
+
+    assert result["rules"]["not_null:person_id"] == {
+        "columns": ["person_id"],
+        "violations": 3,
+        "sample_rows": [1, 2],
+    }
+    assert result["rules"]["range:year_of_birth"]["sample_rows"] == [1, 3]
@@ -0,0 +1,75 @@
+import pickle
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from omop_schema.convert import convert_to_schema
+from omop_schema.schema.compact import DICTIONARY_TYPE, CompactOMOPSchema
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.utils import load_table, load_table_polars
+from omop_schema.validate import OMOPValidator
+
+
+@pytest.fixture
+def compact():
+    """Fixture to create the compact profile of the v5.4 schema."""
+    return CompactOMOPSchema(OMOPSchemaV54())
+
+
+@pytest.fixture
+def measurement_csv(tmp_path):
+    """Fixture to create a CSV 'measurement' table."""
+    path = tmp_path / "measurement.csv"
+    path.write_text(
+        "measurement_id,person_id,measurement_concept_id,measurement_date,unit_source_value\n"
+        "1,1,3004249,2020-01-01,mmHg\n"
+        "2,1,3004249,2020-01-02,mmHg\n"
+    )
+    return path
+
+
+def test_compact_types(compact):
+    """Test that concept ids, dates and low-cardinality strings are narrowed, and other columns are not."""
+    schema = compact.get_pyarrow_schema("measurement")
+    assert schema.field("measurement_concept_id").type == pa.int32()
+    assert schema.field("measurement_id").type == pa.int64()
+    assert schema.field("measurement_date").type == pa.date32()
+    assert schema.field("unit_source_value").type == DICTIONARY_TYPE
+    assert compact.get_pyarrow_schema("person").field("person_source_value").type == pa.string()
+    assert compact.get_pyarrow_schema("concept").field("vocabulary_id").type == DICTIONARY_TYPE
+    assert compact.get_polars_schema("measurement")["unit_source_value"] == pl.Categorical
+
+    base = OMOPSchemaV54()
+    assert base.get_pyarrow_schema("measurement").field("measurement_concept_id").type == pa.int64()
+    assert compact.schema_key != base.schema_key
+    assert compact.get_foreign_keys() == base.get_foreign_keys()
+    assert pickle.loads(pickle.dumps(compact)).get_schema("measurement") == compact.get_schema("measurement")
+
+
+def test_loaders_honor_compact_schema(compact, measurement_csv):
+    """Test that tables loaded with the compact profile have its types and validate against it."""
+    table = load_table(measurement_csv, compact)
+    assert table.schema.field("measurement_concept_id").type == pa.int32()
+    assert table.schema.field("unit_source_value").type == DICTIONARY_TYPE
+    assert not OMOPValidator(compact).validate_table("measurement", table)["mismatched_columns"]
+
+    frame = load_table_polars(measurement_csv, compact).collect()
+    assert frame.schema["unit_source_value"] == pl.Categorical
+    assert frame.schema["measurement_concept_id"] == pl.Int32
+
+
+def test_verify_refuses_lossy_narrowing(compact, measurement_csv):
+    """Test that values that do not fit the compact types are reported before any conversion."""
+    table = load_table(measurement_csv, OMOPSchemaV54())
+    assert compact.verify("measurement", table)["measurement_concept_id"] == 2
+
+    too_large = table.set_column(
+        table.schema.get_field_index("measurement_concept_id"),
+        "measurement_concept_id",
+        pa.array([3_000_000_000, 1], pa.int64()),
+    )
+    with pytest.raises(ValueError, match="measurement_concept_id"):
+        compact.verify("measurement", too_large)
+    with pytest.raises(pa.ArrowInvalid):
+        convert_to_schema(too_large, compact.get_pyarrow_schema("measurement"))
@@ -1,7 +1,17 @@
+import os
+
 import polars as pl
 import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 
-from omop_schema.convert import convert_to_schema, convert_to_schema_polars
+from omop_schema.convert import (
+    convert_to_schema,
+    convert_to_schema_polars,
+    process_omop_dataset,
+)
+from omop_schema.pipeline import convert_omop_dataset
+from omop_schema.schema.v5_3 import OMOPSchemaV53
 
 
 def test_convert_to_schema():
@@ -44,6 +54,39 @@ def test_convert_to_schema():
     ], "Default values for 'year_of_birth' are incorrect."
 
 
+def test_convert_to_schema_preserves_chunks():
+    """Test that conversion keeps the chunk layout, retains extra columns and shares null buffers."""
+    target_schema = pa.schema(
+        [
+            pa.field("person_id", pa.int64()),
+            pa.field("year_of_birth", pa.int32()),
+            pa.field("month_of_birth", pa.int32()),
+        ]
+    )
+    batch = pa.record_batch({"extra_column": ["a", "b"], "person_id": pa.array([1, 2], pa.int32())})
+    dataset = pa.Table.from_batches([batch, batch, batch])
+
+    converted = convert_to_schema(dataset, target_schema, allow_extra_columns=True)
+    assert converted.schema.names == ["person_id", "year_of_birth", "month_of_birth", "extra_column"]
+    assert converted.column("person_id").type == pa.int64()
+    assert all(column.num_chunks == 3 for column in converted.columns)
+    year_chunks = converted.column("year_of_birth").chunks
+    assert year_chunks[0].null_count == 2
+    # Missing columns of the same type are slices of one shared null array.
+    assert year_chunks[0].buffers()[1].address == year_chunks[2].buffers()[1].address
+    assert (
+        converted.column("month_of_birth").chunks[1].buffers()[1].address
+        == year_chunks[0].buffers()[1].address
+    )
+
+    contiguous = convert_to_schema(dataset, target_schema, preserve_chunks=False)
+    assert all(column.num_chunks == 1 for column in contiguous.columns)
+
+    converted_batch = convert_to_schema(batch, target_schema)
+    assert isinstance(converted_batch, pa.RecordBatch)
+    assert converted_batch.schema == target_schema
+
+
 def test_convert_to_schema_polars():
     """Test the convert_to_schema_polars function for Polars."""
     # Define the target schema
@@ -93,3 +136,83 @@ def test_convert_to_schema_polars():
     # Test with allow_extra_columns=True
     converted_df_extra = convert_to_schema_polars(data, target_schema, allow_extra_columns=True)
     assert "extra_col" in converted_df_extra.columns, "Extra column 'extra_col' was removed unexpectedly."
+
+
+def test_convert_to_schema_polars_parses_dates():
+    """Test that string columns are parsed into date and datetime columns."""
+    target_schema = {"visit_start_date": pl.Date, "visit_start_datetime": pl.Datetime("us")}
+    data = pl.DataFrame({"visit_start_date": ["2020-01-02"], "visit_start_datetime": ["2020-01-02 10:30:00"]})
+
+    converted = convert_to_schema_polars(data, target_schema)
+    assert converted.schema == target_schema
+    assert str(converted["visit_start_datetime"][0]) == "2020-01-02 10:30:00"
+
+
+def test_convert_omop_dataset(tmp_path):
+    """Test that convert_omop_dataset streams every table through its own schema into Parquet."""
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    (input_dir / "person.csv").write_text(
+        "person_id,year_of_birth,extra_column\n" + "".join(f"{i},{1950 + i},x\n" for i in range(10))
+    )
+    (input_dir / "death.csv").write_text("person_id,death_date\n1,2020-01-01\n")
+
+    report = convert_omop_dataset(
+        input_dir, tmp_path / "output", OMOPSchemaV53(), max_workers=2, batch_size=3, row_group_size=4
+    )
+
+    assert set(report) == {"person", "death"}
+    assert all(entry["error"] is None for entry in report.values()), report
+    assert report["person"]["num_rows"] == 10
+
+    person = pq.ParquetFile(tmp_path / "output" / "person.parquet")
+    assert person.schema_arrow == OMOPSchemaV53().get_pyarrow_schema("person")
+    assert [person.metadata.row_group(i).num_rows for i in range(person.num_row_groups)] == [4, 4, 2]
+    table = person.read()
+    assert table.column("year_of_birth").to_pylist() == list(range(1950, 1960))
+    assert table.column("month_of_birth").null_count == 10
+
+    # Parquet stores date64 columns as date32.
+    death = pq.read_table(tmp_path / "output" / "death.parquet")
+    assert death.schema.names == OMOPSchemaV53().get_pyarrow_schema("death").names
+    assert death.column("death_date").type == pa.date32()
+
+
+def test_convert_omop_dataset_resume(tmp_path):
+    """Test that a rerun only converts inputs that changed or failed, and never leaves partial outputs."""
+    input_dir, output_dir = tmp_path / "input", tmp_path / "output"
+    input_dir.mkdir()
+    (input_dir / "person.csv").write_text("person_id,year_of_birth\n1,1950\n2,1960\n")
+    (input_dir / "death.csv").write_text("person_id,death_date\nnot_a_number,2020-01-01\n")
+    schema = OMOPSchemaV53()
+
+    report = convert_omop_dataset(input_dir, output_dir, schema, content_hash=True)
+    assert report["person"]["error"] is None and not report["person"]["skipped"]
+    assert report["death"]["error"]["type"] == "ArrowInvalid"
+    assert not (output_dir / "death.parquet").exists(), "A failed conversion left an output file."
+    assert sorted(path.name for path in output_dir.iterdir()) == ["_manifest.json", "person.parquet"]
+
+    (input_dir / "death.csv").write_text("person_id,death_date\n1,2020-01-01\n")
+    os.utime(input_dir / "person.csv", ns=(0, 0))  # Touched, but the content is unchanged.
+    report = convert_omop_dataset(input_dir, output_dir, schema, content_hash=True)
+    assert report["person"]["skipped"], "Unchanged input was converted again."
+    assert report["person"]["num_rows"] == 2
+    assert not report["death"]["skipped"] and report["death"]["error"] is None
+    assert pq.read_table(output_dir / "death.parquet").num_rows == 1
+
+    report = convert_omop_dataset(input_dir, output_dir, schema, row_group_size=1)
+    assert not report["person"]["skipped"], "Changed settings should trigger a new conversion."
+
+
+def test_process_omop_dataset_with_schema_dict_adds_missing_columns(tmp_path):
+    """Test that the legacy flat-schema conversion adds every missing schema column under its own name."""
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    (input_dir / "person.csv").write_text("person_id\n1\n2\n")
+    schema = {"person_id": pl.Int64, "gender_concept_id": pl.Int64, "year_of_birth": pl.Int64}
+    with pytest.warns(DeprecationWarning):
+        process_omop_dataset(input_dir, tmp_path / "output", schema)
+
+    result = pl.read_csv(tmp_path / "output" / "person.csv")
+    assert result.columns == ["person_id", "gender_concept_id", "year_of_birth"]
+    assert result["gender_concept_id"].null_count() == 2
@@ -0,0 +1,60 @@
+import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pytest
+
+from omop_schema.dataset import OMOPDataset
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_synthetic_cdm
+from omop_schema.utils import load_table
+
+
+@pytest.mark.parametrize("file_format", ["csv", "csv.gz", "parquet"])
+def test_omop_dataset_scan(tmp_path, file_format):
+    """Test that scans select columns and filter by persons and date window like a full load."""
+    schema = OMOPSchemaV54()
+    paths = generate_synthetic_cdm(
+        tmp_path,
+        schema,
+        num_persons=50,
+        events_per_person=10,
+        tables=["visit_occurrence"],
+        file_format=file_format,
+    )
+    dataset = OMOPDataset(tmp_path, schema)
+    assert dataset.table_names == ["person", "visit_occurrence", "concept"]
+    assert "visit_occurrence" in dataset and "measurement" not in dataset
+
+    columns = ["visit_start_date", "person_id"]
+    result = dataset.scan(
+        "visit_occurrence", columns, person_ids=[3, 7], start="2005-01-01", end="2015-01-01"
+    )
+    assert result.schema.names == columns
+    assert (
+        result.schema.field("visit_start_date").type
+        == schema.get_pyarrow_schema("visit_occurrence").field("visit_start_date").type
+    )
+
+    full = load_table(paths["visit_occurrence"], schema)
+    dates = full["visit_start_date"].cast("date32")
+    mask = pc.and_(
+        pc.is_in(full["person_id"], value_set=pa.array([3, 7])),
+        pc.and_(
+            pc.greater_equal(dates, datetime.date(2005, 1, 1)), pc.less(dates, datetime.date(2015, 1, 1))
+        ),
+    )
+    assert result.num_rows == pc.sum(mask).as_py() > 0
+    assert set(result["person_id"].to_pylist()) <= {3, 7}
+
+    extra_filter = ds.field("visit_occurrence_id") < 100
+    assert dataset.scan("visit_occurrence", filter=extra_filter).num_rows == 99
+
+    frame = dataset.polars(
+        "visit_occurrence", columns, person_ids=[3, 7], start="2005-01-01", end="2015-01-01"
+    )
+    assert frame.collect().height == result.num_rows
+
+    with pytest.raises(KeyError):
+        dataset.scan("measurement")
@@ -0,0 +1,96 @@
+import datetime
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from omop_schema.dataset import OMOPDataset
+from omop_schema.schema.compact import CompactOMOPSchema
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.utils import iter_table_batches, load_table, load_table_polars
+
+DATE_FORMATS = ["%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]
+
+
+@pytest.fixture
+def death_csv(tmp_path):
+    """Fixture to create a CSV 'death' table with ISO and day-first dates and datetimes."""
+    path = tmp_path / "death.csv"
+    path.write_text(
+        "person_id,death_date,death_datetime\n"
+        "1,31/01/2020,31/01/2020 10:30:00\n"
+        "2,2020-02-01,2020-02-01 08:00:00\n"
+        "3,2020-03-01 12:00:00,\n"
+    )
+    return path
+
+
+def _assert_parsed(death_date, death_datetime):
+    assert death_date == [datetime.date(2020, 1, 31), datetime.date(2020, 2, 1), datetime.date(2020, 3, 1)]
+    assert death_datetime == [
+        datetime.datetime(2020, 1, 31, 10, 30),
+        datetime.datetime(2020, 2, 1, 8),
+        None,
+    ]
+
+
+def test_arrow_loaders_parse_date_formats(death_csv):
+    """Test that the Arrow loaders parse configured date formats straight into the schema types."""
+    schema = OMOPSchemaV54()
+    table = load_table(death_csv, schema, date_formats=DATE_FORMATS)
+    assert table.schema.field("death_date").type == pa.date64()
+    assert table.schema.field("death_datetime").type == pa.timestamp("us")
+    _assert_parsed(table.column("death_date").to_pylist(), table.column("death_datetime").to_pylist())
+
+    batch = next(iter_table_batches(death_csv, schema, date_formats=DATE_FORMATS))
+    assert batch.schema == table.schema
+
+    datasets = schema.load_csv_dataset(death_csv.parent, date_formats=DATE_FORMATS)
+    assert datasets["death"].column("death_date").equals(table.column("death_date"))
+
+    compact = load_table(death_csv, CompactOMOPSchema(OMOPSchemaV54), date_formats=DATE_FORMATS)
+    assert compact.schema.field("death_date").type == pa.date32()
+    assert compact.column("death_date").to_pylist() == table.column("death_date").to_pylist()
+
+    with pytest.raises(pa.ArrowInvalid, match="31/01/2020"):
+        load_table(death_csv, schema)
+
+
+def test_dataset_and_polars_parse_date_formats(death_csv):
+    """Test that dataset scans and Polars frames parse configured date formats and filter on them."""
+    dataset = OMOPDataset(death_csv.parent, OMOPSchemaV54(), date_formats=DATE_FORMATS)
+    table = dataset.scan("death")
+    _assert_parsed(table.column("death_date").to_pylist(), table.column("death_datetime").to_pylist())
+    assert dataset.scan("death", start="2020-02-01").column("person_id").to_pylist() == [2, 3]
+
+    frame = load_table_polars(death_csv, OMOPSchemaV54(), date_formats=DATE_FORMATS).collect()
+    assert frame.schema["death_date"] == pl.Date
+    _assert_parsed(frame["death_date"].to_list(), frame["death_datetime"].to_list())
+
+
+def test_arrow_loaders_reject_impossible_dates(tmp_path):
+    """Test that impossible dates in a custom format fail the load instead of rolling forward."""
+    path = tmp_path / "death.csv"
+    path.write_text("person_id,death_date\n1,31/01/2020\n2,30/02/2020\n3,\n")
+    schema = OMOPSchemaV54()
+    with pytest.raises(pa.ArrowInvalid, match="30/02/2020"):
+        load_table(path, schema, date_formats=DATE_FORMATS)
+    with pytest.raises(pa.ArrowInvalid, match="30/02/2020"):
+        list(iter_table_batches(path, schema, date_formats=DATE_FORMATS))
+    datasets, report = schema.load_csv_dataset(tmp_path, date_formats=DATE_FORMATS, return_report=True)
+    assert "death" not in datasets
+    assert "30/02/2020" in str(report["death"]["error"])
+    with pytest.raises(pa.ArrowInvalid, match="30/02/2020"):
+        OMOPDataset(tmp_path, schema, date_formats=DATE_FORMATS).scan("death")
+
+    table = load_table(path, schema, date_formats=DATE_FORMATS, errors="null")
+    assert table.column("death_date").to_pylist() == [datetime.date(2020, 1, 31), None, None]
+
+
+def test_polars_rejects_unparseable_dates(tmp_path):
+    """Test that Polars fails on values that match no date format, like the Arrow loaders."""
+    path = tmp_path / "death.csv"
+    for value in ["garbage", "30/02/2020"]:
+        path.write_text(f"person_id,death_date\n1,31/01/2020\n2,{value}\n3,\n")
+        with pytest.raises(pl.exceptions.InvalidOperationError, match=value):
+            load_table_polars(path, OMOPSchemaV54(), date_formats=DATE_FORMATS).collect()
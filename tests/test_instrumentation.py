@@ -0,0 +1,75 @@
+import json
+
+from omop_schema import instrumentation
+from omop_schema.convert import convert_to_schema
+from omop_schema.instrumentation import InMemoryCollector, NullCollector, collecting
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.utils import load_table
+from omop_schema.validate import OMOPValidator
+
+
+def test_null_collector_is_default():
+    """Test that nothing is collected unless a collector is activated."""
+    assert isinstance(instrumentation.get_collector(), NullCollector)
+    with instrumentation.stage("load_table.read", table="person") as stage:
+        stage.add("rows", 10)
+    instrumentation.count("cast_values", 10, column="person_id")
+
+
+def test_collector_aggregates_stages_and_counters():
+    """Test that stages and counters are aggregated by name and labels."""
+    collector = InMemoryCollector()
+    for rows in (10, 20):
+        with collector.stage("load_table.read", table="person") as stage:
+            stage.add("rows", rows)
+    collector.count("cast_values", 5, column="person_id")
+
+    metrics = collector.to_dict()
+    assert [(s["stage"], s["labels"], s["calls"]) for s in metrics["stages"]] == [
+        ("load_table.read", {"table": "person"}, 2)
+    ]
+    assert {
+        "name": "rows",
+        "labels": {"stage": "load_table.read", "table": "person"},
+        "value": 30,
+    } in metrics["counters"]
+    assert {"name": "cast_values", "labels": {"column": "person_id"}, "value": 5} in metrics["counters"]
+    assert metrics["gauges"]["peak_rss_bytes"] > 0
+    assert json.loads(collector.to_json()) == metrics
+
+
+def test_prometheus_export():
+    """Test that the Prometheus export declares every family once and escapes label values."""
+    collector = InMemoryCollector()
+    with collector.stage("convert_to_schema") as stage:
+        stage.add("rows", 3)
+    collector.count("cast_values", 3, column='a"b')
+
+    text = collector.to_prometheus()
+    assert text.count("# TYPE omop_schema_stage_seconds_total counter") == 1
+    assert 'omop_schema_stage_calls_total{stage="convert_to_schema"} 1' in text
+    assert 'omop_schema_rows_total{stage="convert_to_schema"} 3' in text
+    assert 'omop_schema_cast_values_total{column="a\\"b"} 3' in text
+    assert "# TYPE omop_schema_peak_rss_bytes gauge" in text
+
+
+def test_instrumented_load_convert_and_validate(tmp_path):
+    """Test that loading, casting and validating a table report their stages, rows and casts."""
+    path = tmp_path / "person.csv"
+    path.write_text("person_id,birth_datetime\n1,1980-01-01 00:00:00\n2,1990-01-01 00:00:00\n")
+    schema = OMOPSchemaV53()
+    with collecting() as collector:
+        table = load_table(path, schema)
+        convert_to_schema(table, schema.get_pyarrow_schema("person"))
+        OMOPValidator(OMOPSchemaV53).validate_table("person", table)
+    assert isinstance(instrumentation.get_collector(), NullCollector)
+
+    metrics = collector.to_dict()
+    stages = {s["stage"] for s in metrics["stages"]}
+    assert stages == {"load_table.read", "load_table.cast", "convert_to_schema", "validate_table"}
+    counters = {(c["name"], c["labels"].get("stage")): c["value"] for c in metrics["counters"]}
+    assert counters[("bytes_read", "load_table.read")] == path.stat().st_size
+    assert counters[("rows", "load_table.read")] == 2
+    assert counters[("rows", "convert_to_schema")] == 2
+    # The CSV reader parses the columns straight into the types of the schema, so nothing is cast.
+    assert not [c for c in metrics["counters"] if c["name"] == "cast_values"]
@@ -0,0 +1,49 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from omop_schema.integrity import check_foreign_keys
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Fixture to create a dataset with orphaned person and concept references."""
+    (tmp_path / "person.csv").write_text("person_id,gender_concept_id\n1,8507\n2,8532\n3,\n")
+    (tmp_path / "concept.csv").write_text("concept_id,concept_name\n8507,MALE\n8532,FEMALE\n3000,Glucose\n")
+    measurement = pa.table(
+        {
+            "measurement_id": list(range(6)),
+            "person_id": [1, 2, 3, 4, 4, None],
+            "measurement_concept_id": [3000, 3000, 9999, 3000, 3000, 3000],
+        }
+    )
+    pq.write_table(measurement, tmp_path / "measurement.parquet")
+    return tmp_path
+
+
+@pytest.mark.parametrize("num_partitions", [1, 3])
+def test_check_foreign_keys(dataset, num_partitions):
+    """Test that orphaned foreign key values are counted per relationship, with or without partitions."""
+    results = check_foreign_keys(dataset, OMOPSchemaV53(), num_partitions=num_partitions, batch_size=2)
+    by_key = {(result["table"], result["column"]): result for result in results}
+
+    person = by_key[("measurement", "person_id")]
+    assert (person["status"], person["checked"], person["orphans"]) == ("checked", 5, 2)
+    assert person["sample_orphans"] == [4]
+
+    concept = by_key[("measurement", "measurement_concept_id")]
+    assert (concept["orphans"], concept["sample_orphans"]) == (1, [9999])
+
+    assert by_key[("person", "gender_concept_id")]["orphans"] == 0
+    assert by_key[("measurement", "provider_id")]["status"] == "missing_column"
+    assert by_key[("visit_occurrence", "person_id")]["status"] == "missing_table"
+
+
+def test_check_foreign_keys_missing_reference(dataset):
+    """Test that relationships to a missing table are reported, not checked."""
+    results = check_foreign_keys(
+        dataset, OMOPSchemaV53(), foreign_keys=[("measurement", "person_id", "provider", "provider_id")]
+    )
+    assert results[0]["status"] == "missing_referenced_table"
+    assert results[0]["orphans"] == 0
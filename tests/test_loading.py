@@ -1,10 +1,17 @@
 import os
+import pickle
 import tempfile
 
+import polars as pl
 import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from pyarrow import csv
 
 from omop_schema.schema.base import OMOPSchemaBase
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.utils import iter_table_batches, load_table
 
 
 class MockOMOPSchema(OMOPSchemaBase):
@@ -43,3 +50,88 @@ def test_load_csv_dataset(mock_csv_files):
     assert table.schema.names == ["person_id", "gender_concept_id", "year_of_birth"], "Schema mismatch."
     assert table.num_rows == 2, "Row count mismatch."
     assert table.column("person_id").to_pylist() == [1, 3], "Data mismatch in 'person_id' column."
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_load_csv_dataset_report(mock_csv_files, use_processes):
+    """Test that load_csv_dataset reports timings and structured errors per table."""
+    with open(os.path.join(mock_csv_files, "broken.csv"), "w") as f:
+        f.write("person_id\nnot_a_number")
+
+    class BrokenOMOPSchema(MockOMOPSchema):
+        def _load_schema(self):
+            return {**super()._load_schema(), "broken": {"person_id": pa.int64()}}
+
+    datasets, report = BrokenOMOPSchema().load_csv_dataset(
+        mock_csv_files, max_workers=2, use_processes=use_processes, memory_limit=1, return_report=True
+    )
+
+    assert list(datasets) == ["person"], "Expected only the 'person' table to load."
+    assert report["person"]["error"] is None
+    assert report["person"]["num_rows"] == 2
+    assert report["person"]["seconds"] >= 0
+    assert report["broken"]["error"]["type"] == "ArrowInvalid"
+    assert report["broken"]["num_rows"] is None
+
+
+@pytest.mark.parametrize("file_name", ["person.csv", "person.csv.gz", "person.parquet", "person"])
+def test_iter_table_batches(tmp_path, file_name):
+    """Test that iter_table_batches streams the same data as load_table, in bounded batches."""
+    source = pa.table(
+        {
+            "year_of_birth": pa.array(range(1900, 2000), pa.int32()),
+            "person_id": pa.array(range(100), pa.int32()),
+            "extra": pa.array([str(i) for i in range(100)]),
+        }
+    )
+    fp = tmp_path / file_name
+    if file_name.endswith(".parquet"):
+        pq.write_table(source, fp, row_group_size=30)
+    elif file_name == "person":
+        fp.mkdir()
+        csv.write_csv(source.slice(0, 50), fp / "part-0.csv")
+        csv.write_csv(source.slice(50), fp / "part-1.csv")
+    elif file_name.endswith(".gz"):
+        with pa.CompressedOutputStream(str(fp), "gzip") as out:
+            csv.write_csv(source, out)
+    else:
+        csv.write_csv(source, fp)
+
+    schema = MockOMOPSchema()
+    batches = list(iter_table_batches(fp, schema=schema, batch_size=16))
+
+    assert all(batch.num_rows <= 16 for batch in batches), "Batch size exceeded."
+    streamed = pa.Table.from_batches(batches)
+    loaded = load_table(fp, schema=schema)
+    assert streamed.schema.names == ["person_id", "year_of_birth", "extra"]
+    assert streamed.schema.field("person_id").type == pa.int64()
+    assert streamed.equals(loaded), "Streamed batches differ from load_table."
+
+
+def test_schema_registry():
+    """Test that schemas are built once per schema class, shared read-only, and survive pickling."""
+    first, second = OMOPSchemaV54(), OMOPSchemaV54()
+    assert first.schemas is second.schemas, "Schemas were rebuilt for a new instance."
+    assert first.get_pyarrow_schema("person") is second.get_pyarrow_schema("person")
+    assert first.get_polars_schema("person") is second.get_polars_schema("person")
+    assert first.get_polars_schema("person")["birth_datetime"] == pl.Datetime("us")
+    assert first.get_pandas_schema("person")["person_id"] == "int64"
+    assert "admitted_from_concept_id" in first.get_schema("visit_occurrence")
+    assert "admitted_from_concept_id" not in OMOPSchemaV53().get_schema("visit_occurrence")
+
+    with pytest.raises(TypeError):
+        first.schemas["person"]["person_id"] = pa.int32()
+
+    restored = pickle.loads(pickle.dumps(first))
+    assert restored.schemas is first.schemas
+    assert restored.schema_key == "omop_schema.schema.v5_4.OMOPSchemaV54"
+
+
+def test_iter_table_batches_without_schema_reads_empty_columns_as_strings(tmp_path):
+    """Test that columns empty throughout the first block do not fail the stream without a schema."""
+    fp = tmp_path / "note.csv"
+    fp.write_text("note_id,note_title\n" + "".join(f"{i},\n" for i in range(2000)) + "2000,Discharge\n")
+    streamed = pa.Table.from_batches(iter_table_batches(fp, memory_limit=4096))
+    assert streamed.schema.field("note_id").type == pa.int64()
+    assert streamed.schema.field("note_title").type == pa.string()
+    assert streamed.column("note_title")[-1].as_py() == "Discharge"
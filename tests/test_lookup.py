@@ -0,0 +1,88 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from omop_schema.lookup import PersonIndex, read_person_tables, read_persons
+from omop_schema.pipeline import convert_omop_dataset, convert_table
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_synthetic_cdm
+
+
+@pytest.fixture
+def clustered_dataset(tmp_path):
+    """Fixture to create a dataset converted with the clustered, sorted-by-person layout."""
+    schema = OMOPSchemaV54()
+    generate_synthetic_cdm(
+        tmp_path / "input",
+        schema,
+        num_persons=100,
+        events_per_person=10,
+        tables=["measurement", "visit_occurrence"],
+    )
+    convert_omop_dataset(
+        tmp_path / "input",
+        tmp_path / "output",
+        schema,
+        sort_by_person=True,
+        write_page_index=True,
+        row_group_size=100,
+    )
+    return tmp_path / "output"
+
+
+def test_sort_by_person(clustered_dataset):
+    """Test that person-level tables are sorted by person and start date, with sorting metadata."""
+    table = pq.read_table(clustered_dataset / "visit_occurrence.parquet")
+    sort_keys = [("person_id", "ascending"), ("visit_start_date", "ascending")]
+    assert table.equals(table.sort_by(sort_keys))
+
+    metadata = pq.ParquetFile(clustered_dataset / "visit_occurrence.parquet").metadata
+    assert metadata.num_row_groups == 10
+    assert [column.column_index for column in metadata.row_group(0).sorting_columns] == [
+        table.schema.get_field_index(column) for column, _ in sort_keys
+    ]
+    assert metadata.row_group(0).column(0).has_offset_index
+
+
+def test_sort_by_person_spills_sorted_runs(clustered_dataset, tmp_path):
+    """Test that tables larger than the memory limit are sorted with an external merge sort."""
+    schema = OMOPSchemaV54()
+    output = tmp_path / "sorted" / "visit_occurrence.parquet"
+    output.parent.mkdir()
+    num_rows = convert_table(
+        tmp_path / "input" / "visit_occurrence.csv",
+        output,
+        schema,
+        "visit_occurrence",
+        batch_size=64,
+        memory_limit=32_768,
+        sort_by_person=True,
+    )
+    table = pq.read_table(output)
+    assert num_rows == table.num_rows == 1000
+    assert table.sort_by("visit_occurrence_id").equals(
+        pq.read_table(clustered_dataset / "visit_occurrence.parquet").sort_by("visit_occurrence_id")
+    )
+    sort_keys = [("person_id", "ascending"), ("visit_start_date", "ascending")]
+    assert table.select(["person_id", "visit_start_date"]).equals(
+        table.sort_by(sort_keys).select(["person_id", "visit_start_date"])
+    )
+    assert [path.name for path in output.parent.iterdir()] == [output.name], "Sorted runs must be removed."
+
+
+def test_read_persons(clustered_dataset):
+    """Test that person lookups only read the row groups that can contain the persons."""
+    full_table = pq.read_table(clustered_dataset / "measurement.parquet")
+    expected = full_table.filter(pa.compute.field("person_id").isin([3, 4, 97]))
+    with PersonIndex(clustered_dataset / "measurement.parquet") as index:
+        assert len(index.row_groups([3, 4])) == 1 < index.num_row_groups
+        assert index.read([97, 3, 4]).equals(expected)
+
+    assert read_persons(
+        clustered_dataset / "measurement.parquet", [3], columns=["measurement_id"]
+    ).schema.names == ["measurement_id"]
+    assert read_persons(clustered_dataset / "measurement.parquet", [1000]).num_rows == 0
+
+    tables = read_person_tables(clustered_dataset, [3], ["person", "visit_occurrence", "death"])
+    assert set(tables) == {"person", "visit_occurrence"}
+    assert tables["person"]["person_id"].to_pylist() == [3]
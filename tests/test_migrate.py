@@ -0,0 +1,86 @@
+import pyarrow as pa
+import pytest
+from pyarrow import parquet as pq
+
+from omop_schema.migrate import migrate_omop_dataset, migration_path
+from omop_schema.schema.v4 import OMOPSchemaV4
+from omop_schema.schema.v5_0 import OMOPSchemaV5
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+
+
+def test_migration_path():
+    """Test that migrations are chained between versions and only run forward."""
+    assert [step.target for step in migration_path(OMOPSchemaV4, OMOPSchemaV54())] == [
+        OMOPSchemaV5,
+        OMOPSchemaV53,
+        OMOPSchemaV54,
+    ]
+    with pytest.raises(ValueError, match="No migration"):
+        migration_path(OMOPSchemaV54, OMOPSchemaV53)
+
+
+def test_migrate_v53_to_v54(tmp_path):
+    """Test that renamed columns keep their values, new keys are derived and new tables are written."""
+    input_dir = tmp_path / "v5_3"
+    input_dir.mkdir()
+    (input_dir / "visit_detail.csv").write_text(
+        "visit_detail_id,person_id,admitting_source_concept_id,discharge_to_source_value,"
+        "visit_detail_parent_id,preceding_visit_detail_id\n"
+        "1,1,8717,home,,\n"
+        "2,1,8863,,1,1\n"
+    )
+    (input_dir / "metadata.csv").write_text("metadata_concept_id,name\n" + "0,release\n" * 5)
+    report = migrate_omop_dataset(input_dir, tmp_path / "v5_4", OMOPSchemaV53, OMOPSchemaV54, batch_size=2)
+
+    visit_detail = pq.read_table(tmp_path / "v5_4" / "visit_detail.parquet")
+    assert visit_detail.schema.names == OMOPSchemaV54().get_pyarrow_schema("visit_detail").names
+    assert visit_detail.column("admitted_from_concept_id").to_pylist() == [8717, 8863]
+    assert visit_detail.column("discharged_to_source_value").to_pylist() == ["home", ""]
+    assert visit_detail.column("parent_visit_detail_id").to_pylist() == [None, 1]
+    assert report["visit_detail"]["dropped_columns"] == {"visit_detail": ["preceding_visit_detail_id"]}
+
+    metadata = pq.read_table(tmp_path / "v5_4" / "metadata.parquet")
+    assert metadata.column("metadata_id").to_pylist() == [1, 2, 3, 4, 5]
+    assert report["episode"]["num_rows"] == 0
+    episode = pq.read_schema(tmp_path / "v5_4" / "episode.parquet")
+    assert episode.names == OMOPSchemaV54().get_pyarrow_schema("episode").names
+    assert "visit_occurrence" not in report
+
+
+def test_migrate_merges_cost_tables_and_chains_versions(tmp_path):
+    """Test that v5.0 cost tables merge into the v5.3 cost table and that v4 vocabularies migrate to v5.4."""
+    input_dir = tmp_path / "v5_0"
+    input_dir.mkdir()
+    (input_dir / "drug_cost.csv").write_text(
+        "drug_cost_id,drug_exposure_id,paid_copay,ingredient_cost\n1,10,5.0,20.0\n2,11,,3.5\n"
+    )
+    (input_dir / "visit_cost.csv").write_text(
+        "visit_cost_id,visit_occurrence_id,total_out_of_pocket\n1,30,7.5\n"
+    )
+    (input_dir / "person.csv").write_text("person_id,year_of_birth\n1,1980\n")
+    migrate_omop_dataset(input_dir, tmp_path / "v5_3", OMOPSchemaV5(), OMOPSchemaV53())
+
+    cost = pq.read_table(tmp_path / "v5_3" / "cost.parquet")
+    assert cost.column("cost_id").to_pylist() == [1, 2, 3]
+    assert cost.column("cost_domain_id").to_pylist() == ["Drug", "Drug", "Visit"]
+    assert cost.column("cost_event_id").to_pylist() == [10, 11, 30]
+    assert cost.column("paid_patient_copay").to_pylist() == [5.0, None, None]
+    assert cost.column("paid_ingredient_cost").to_pylist() == [20.0, 3.5, None]
+    assert cost.column("paid_by_patient").to_pylist() == [None, None, 7.5]
+    person = pq.read_table(tmp_path / "v5_3" / "person.parquet")
+    assert person.column("year_of_birth").to_pylist() == [1980]
+
+    v4_dir = tmp_path / "v4"
+    v4_dir.mkdir()
+    (v4_dir / "concept.csv").write_text(
+        "concept_id,concept_name,concept_level,concept_class,vocabulary_id,concept_code\n"
+        "1,Aspirin,1,Ingredient,8,1191\n"
+        "2,aspirin 81 MG,0,Clinical Drug,8,243670\n"
+    )
+    migrate_omop_dataset(v4_dir, tmp_path / "v5_4", OMOPSchemaV4, OMOPSchemaV54)
+    concept = pq.read_table(tmp_path / "v5_4" / "concept.parquet")
+    assert concept.schema.field("vocabulary_id").type == pa.string()
+    assert concept.column("vocabulary_id").to_pylist() == ["8", "8"]
+    assert concept.column("concept_class_id").to_pylist() == ["Ingredient", "Clinical Drug"]
+    assert concept.column("standard_concept").to_pylist() == ["S", None]
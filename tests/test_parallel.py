@@ -0,0 +1,25 @@
+import threading
+import time
+
+from omop_schema.parallel import run_parallel
+
+
+def test_run_parallel_memory_limit():
+    """Test that run_parallel never runs jobs whose estimates exceed the memory limit together."""
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def job(value):
+        with lock:
+            running["now"] += value
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= value
+        return value * 2
+
+    jobs = [(name, (size,), size) for name, size in [("a", 60), ("b", 50), ("c", 40), ("d", 10)]]
+    results = {key: (result, error) for key, result, _, error in run_parallel(job, jobs, memory_limit=100)}
+
+    assert results == {"a": (120, None), "b": (100, None), "c": (80, None), "d": (20, None)}
+    assert running["peak"] <= 100, f"Memory limit exceeded: {running['peak']}"
@@ -0,0 +1,55 @@
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from omop_schema.partition import (
+    partition_omop_dataset,
+    partition_table,
+    person_shards,
+    shard_path,
+)
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_synthetic_cdm
+
+
+def test_person_shards():
+    """Test that shards are deterministic, in range and balanced, and that nulls go to shard 0."""
+    shards = person_shards(np.arange(10_000), 4)
+    assert shards.min() == 0 and shards.max() == 3
+    assert np.bincount(shards).min() > 2000
+    assert person_shards(pa.array([7, None]), 4).tolist() == [person_shards(np.array([7]), 4)[0], 0]
+
+
+@pytest.mark.parametrize("to_input", [lambda table: table, pl.from_arrow, lambda table: table.to_batches(3)])
+def test_partition_table(tmp_path, to_input):
+    """Test that a table is split by person into one file per shard, from Arrow or Polars inputs."""
+    table = pa.table({"person_id": [1, 2, 3, 4, 5, 1, 2], "value": list(range(7))})
+    shard_rows = partition_table(to_input(table), tmp_path, "measurement", num_shards=3, batch_size=4)
+    assert sum(shard_rows) == 7
+
+    expected_shards = person_shards(table["person_id"], 3)
+    for shard in range(3):
+        part = pq.read_table(shard_path(tmp_path, shard, "measurement"))
+        assert part.num_rows == shard_rows[shard]
+        expected = table.filter(pa.array(expected_shards == shard))
+        assert sorted(part["value"].to_pylist()) == expected["value"].to_pylist()
+
+
+def test_partition_omop_dataset(tmp_path):
+    """Test that all person-level tables place each person in the same shard."""
+    schema = OMOPSchemaV54()
+    generate_synthetic_cdm(tmp_path / "input", schema, num_persons=50, events_per_person=3)
+    report = partition_omop_dataset(tmp_path / "input", tmp_path / "shards", schema, num_shards=4)
+    assert all(entry["error"] is None for entry in report.values())
+    assert report["measurement"]["num_rows"] == 150
+
+    for shard in range(4):
+        persons = set(
+            pq.read_table(shard_path(tmp_path / "shards", shard, "person"))["person_id"].to_pylist()
+        )
+        for table_name in ("measurement", "visit_occurrence", "condition_occurrence"):
+            table = pq.read_table(shard_path(tmp_path / "shards", shard, table_name))
+            assert table.schema.names == schema.get_pyarrow_schema(table_name).names
+            assert set(table["person_id"].to_pylist()) <= persons
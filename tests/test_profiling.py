@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from omop_schema.profiling import (
+    HyperLogLog,
+    TableProfile,
+    profile_omop_dataset,
+    recommended_schema,
+)
+from omop_schema.schema.compact import DICTIONARY_TYPE
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_synthetic_cdm
+
+
+def test_hyperloglog_estimates_and_merges():
+    """Test that distinct counts are estimated within a few percent and that merged sketches count a union."""
+    first, second = HyperLogLog(), HyperLogLog()
+    first.add(pa.array(np.arange(0, 60_000)))
+    second.add(pa.array(np.arange(40_000, 100_000)))
+    assert abs(first.count() - 60_000) < 0.03 * 60_000
+    first.merge(second)
+    assert abs(first.count() - 100_000) < 0.03 * 100_000
+
+    strings = HyperLogLog()
+    strings.add(pa.array([f"code-{i % 250}" for i in range(10_000)]))
+    assert abs(strings.count() - 250) <= 5
+
+
+def test_hyperloglog_ranks_at_low_precision():
+    """Test that ranks are exact when the remaining hash bits are wider than a double mantissa."""
+    sketch = HyperLogLog(precision=4)
+    sketch.add_hashes([2**60 - 1])
+    assert sketch.registers[0] == 1
+    with pytest.raises(ValueError, match="precision"):
+        HyperLogLog(precision=20)
+
+
+def test_table_profile_recommends_narrower_types():
+    """Test that column statistics drive the recommended types."""
+    profile = TableProfile("person")
+    batch = pa.RecordBatch.from_pydict(
+        {
+            "person_id": pa.array([1, 2, 3, 4], pa.int64()),
+            "year_of_birth": pa.array([1950, 1980, None, 2001], pa.int64()),
+            "gender_source_value": pa.array(["F", "M", "F", "F"]),
+            "person_source_value": pa.array(["a", "b", "c", "d"]),
+            "birth_date": pa.array([0, 86_400_000, 2 * 86_400_000, None], pa.date64()),
+        }
+    )
+    profile.update(batch)
+    columns = {column["column"]: column for column in profile.to_dict()["columns"]}
+    assert profile.num_rows == 4
+    assert columns["year_of_birth"]["null_fraction"] == 0.25
+    assert (columns["year_of_birth"]["min"], columns["year_of_birth"]["max"]) == (1950, 2001)
+    assert columns["person_id"]["distinct"] == 4
+    assert columns["birth_date"]["span_days"] == 2
+
+    schema = profile.recommended_schema()
+    assert schema.field("person_id").type == pa.int32()
+    assert schema.field("year_of_birth").type == pa.int16()
+    assert schema.field("gender_source_value").type == DICTIONARY_TYPE
+    assert schema.field("person_source_value").type == pa.string()
+    assert schema.field("birth_date").type == pa.date32()
+
+
+def test_profile_omop_dataset(tmp_path):
+    """Test that a dataset is profiled table by table into a profile file with recommended types."""
+    schema = OMOPSchemaV54()
+    generate_synthetic_cdm(tmp_path / "cdm", schema, num_persons=50, events_per_person=4)
+    result = profile_omop_dataset(
+        tmp_path / "cdm", schema, output_path=tmp_path / "profile.json", max_workers=2
+    )
+
+    assert json.loads((tmp_path / "profile.json").read_text()) == result
+    measurement = result["tables"]["measurement"]
+    assert measurement["num_rows"] == 200
+    person_id = next(column for column in measurement["columns"] if column["column"] == "person_id")
+    assert person_id["null_count"] == 0 and person_id["max"] <= 50
+    recommended = recommended_schema(measurement)
+    assert recommended.names == schema.get_pyarrow_schema("measurement").names
+    assert recommended.field("measurement_date").type == pa.date32()
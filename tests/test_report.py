@@ -0,0 +1,139 @@
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from omop_schema.report import (
+    JsonLinesReporter,
+    summary_table,
+    table_record,
+    write_summary,
+)
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.validate import OMOPValidator, validate_omop_dataset_graphically
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Fixture to create a dataset folder with a partial 'person' table and a 'death' table."""
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    (dataset / "person.csv").write_text("person_id,year_of_birth,extra\n1,1980,x\n")
+    (dataset / "death.csv").write_text("person_id,death_date\n1,2020-01-01\n")
+    return dataset
+
+
+def test_table_record():
+    """Test that records flatten the validation result into JSON-serializable columns."""
+    result = {
+        "missing_columns": [("month_of_birth", pa.int64())],
+        "mismatched_columns": [("year_of_birth", pa.string(), pa.int64())],
+        "extra_columns": [("extra", pa.string())],
+        "correct_columns": [("person_id", pa.int64())],
+    }
+    record = table_record("person", result, path="person.csv", seconds=0.5)
+    assert record["status"] == "invalid"
+    assert record["columns"] == [
+        {"name": "month_of_birth", "status": "missing", "actual_type": None, "expected_type": "int64"},
+        {"name": "year_of_birth", "status": "mismatched", "actual_type": "string", "expected_type": "int64"},
+        {"name": "extra", "status": "extra", "actual_type": "string", "expected_type": None},
+        {"name": "person_id", "status": "correct", "actual_type": "int64", "expected_type": "int64"},
+    ]
+    assert json.loads(json.dumps(record)) == record
+    assert table_record("death", status="missing")["columns"] == []
+
+
+def test_summary_table(tmp_path):
+    """Test that the summary has one row per column, and one row for tables without columns."""
+    result = {
+        "missing_columns": [],
+        "mismatched_columns": [],
+        "extra_columns": [],
+        "correct_columns": [("person_id", pa.int64())],
+    }
+    records = [table_record("person", result, seconds=0.5), table_record("death", status="missing")]
+    summary = summary_table(records)
+    assert summary.column("table").to_pylist() == ["person", "death"]
+    assert summary.column("column").to_pylist() == ["person_id", None]
+    assert summary.column("table_status").to_pylist() == ["valid", "missing"]
+
+    write_summary(records, tmp_path / "summary.parquet")
+    assert pq.read_table(tmp_path / "summary.parquet").equals(summary)
+    write_summary(records, tmp_path / "summary.arrow")
+    with pa.memory_map(str(tmp_path / "summary.arrow")) as source:
+        assert pa.ipc.open_file(source).read_all().equals(summary)
+
+
+def test_json_lines_reporter_flushes_each_record():
+    """Test that every record is written as a complete line as soon as it is reported."""
+    stream = io.StringIO()
+    reporter = JsonLinesReporter(stream)
+    reporter.write(table_record("death", status="missing"))
+    assert json.loads(stream.getvalue())["table"] == "death"
+    reporter.write(table_record("note", status="missing"))
+    reporter.close()
+    assert not stream.closed
+    assert [json.loads(line)["table"] for line in stream.getvalue().splitlines()] == ["death", "note"]
+
+
+def test_validate_graphically_reports(tmp_path, dataset, capsys):
+    """Test that a validation writes a JSON Lines report and a summary and returns the records."""
+    validator = OMOPValidator(OMOPSchemaV53)
+    records = validate_omop_dataset_graphically(
+        validator,
+        dataset,
+        report=tmp_path / "report.jsonl",
+        summary_path=tmp_path / "summary.parquet",
+        display=False,
+    )
+    assert capsys.readouterr().out == ""
+    assert [record["table"] for record in records] == list(validator.schema.keys())
+
+    lines = [json.loads(line) for line in (tmp_path / "report.jsonl").read_text().splitlines()]
+    by_table = {record["table"]: record for record in lines}
+    assert len(lines) == len(records)
+    assert by_table["person"]["status"] == "invalid"
+    assert by_table["death"]["seconds"] >= 0
+    assert by_table["note"]["status"] == "missing"
+    assert {"name": "extra", "status": "extra", "actual_type": "String", "expected_type": None} in by_table[
+        "person"
+    ]["columns"]
+
+    summary = pq.read_table(tmp_path / "summary.parquet")
+    assert summary.schema.names == summary_table([]).schema.names
+    death = summary.filter(pc.equal(summary["table"], "death"))
+    assert death.num_rows == len(validator.schema["death"])
+    assert set(death.filter(pc.equal(death["column_status"], "correct"))["column"].to_pylist()) == {
+        "person_id",
+        "death_date",
+    }
+
+
+def test_validate_graphically_closes_report_on_error(tmp_path, dataset, monkeypatch):
+    """Test that the report is closed and the cache saved when rendering the results fails."""
+    closed = []
+    close = JsonLinesReporter.close
+
+    def spy(self):
+        closed.append(self._file)
+        close(self)
+
+    monkeypatch.setattr(JsonLinesReporter, "close", spy)
+
+    def fail(record):
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr("omop_schema.validate._result_row", fail)
+    with pytest.raises(RuntimeError, match="render failed"):
+        validate_omop_dataset_graphically(
+            OMOPValidator(OMOPSchemaV53),
+            dataset,
+            report=tmp_path / "report.jsonl",
+            cache=tmp_path / "cache.json",
+            display=False,
+        )
+    assert len(closed) == 1 and closed[0].closed
+    assert len(json.loads((tmp_path / "cache.json").read_text())["entries"]) == 2
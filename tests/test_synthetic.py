@@ -0,0 +1,52 @@
+import pyarrow.compute as pc
+import pytest
+
+from omop_schema.checks import check_table_data
+from omop_schema.integrity import check_foreign_keys
+from omop_schema.schema.v5_3 import OMOPSchemaV53
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.synthetic import generate_synthetic_cdm, generate_table
+from omop_schema.utils import load_table
+
+
+@pytest.mark.parametrize("schema", [OMOPSchemaV53(), OMOPSchemaV54()])
+def test_generate_table(schema):
+    """Test that generated tables conform to the schema and are reproducible."""
+    table = generate_table(schema, "drug_exposure", 100, num_persons=10, seed=1)
+    assert table.schema.equals(schema.get_pyarrow_schema("drug_exposure"))
+    assert table.num_rows == 100
+    assert pc.max(table["person_id"]).as_py() <= 10
+    assert table.equals(generate_table(schema, "drug_exposure", 100, num_persons=10, seed=1))
+
+
+@pytest.mark.parametrize("file_format", ["csv", "csv.gz", "parquet"])
+def test_generate_synthetic_cdm(tmp_path, file_format):
+    """Test that a generated dataset loads, passes the row-level checks and has no orphaned foreign keys."""
+    schema = OMOPSchemaV54()
+    paths = generate_synthetic_cdm(
+        tmp_path,
+        schema,
+        num_persons=20,
+        events_per_person=5,
+        tables=["visit_occurrence", "measurement"],
+        file_format=file_format,
+    )
+    assert set(paths) == {"person", "concept", "visit_occurrence", "measurement"}
+
+    visits = load_table(paths["visit_occurrence"], schema)
+    assert visits.num_rows == 100
+    assert visits.schema.names == schema.get_pyarrow_schema("visit_occurrence").names
+
+    for table_name, path in paths.items():
+        data_results = check_table_data(schema, table_name, path)
+        assert all(rule["violations"] == 0 for rule in data_results["rules"].values()), table_name
+
+    results = check_foreign_keys(tmp_path, schema)
+    checked = [result for result in results if result["status"] == "checked"]
+    assert {result["referenced_table"] for result in checked} == {"person", "concept", "visit_occurrence"}
+    assert all(result["orphans"] == 0 for result in checked)
+    # References to tables that are not generated, such as provider or care_site, are null.
+    for result in results:
+        if result["table"] in paths and result["status"] == "missing_referenced_table":
+            column = load_table(paths[result["table"]], schema)[result["column"]]
+            assert column.null_count == len(column)
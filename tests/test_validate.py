@@ -1,8 +1,17 @@
 import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
+from omop_schema.cache import ValidationCache
 from omop_schema.schema.v5_3 import OMOPSchemaV53
-from omop_schema.validate import OMOPValidator
+from omop_schema.validate import OMOPValidator, validate_omop_dataset_graphically
+
+CACHE_OPTIONS = {
+    "load_with_expected_schema": True,
+    "case_insensitive": True,
+    "metadata_only": False,
+    "sample_bytes": None,
+}
 
 
 @pytest.fixture
@@ -86,3 +95,56 @@ def test_valid_dataset_extended(validator, valid_table_extended):
     assert not result["mismatched_columns"], f"Unexpected mismatched columns: {result['mismatched_columns']}"
     extra_column_names = [col[0] for col in result["extra_columns"]]
     assert extra_column_names == ["extra_column_1"], f"Unexpected extra columns: {result['extra_columns']}"
+
+
+@pytest.fixture
+def metadata_dataset(tmp_path):
+    """Fixture to create a dataset with a CSV 'person' table and a Parquet 'death' table."""
+    (tmp_path / "person.csv").write_text(
+        "PERSON_ID,gender_concept_id,year_of_birth,extra_column_1\n1,8507,1980,a\n2,8532,1990,b\n"
+    )
+    death = pa.table({"person_id": pa.array([1], pa.int32()), "death_date": pa.array(["2020-01-01"])})
+    pq.write_table(death, tmp_path / "death.parquet")
+    return tmp_path
+
+
+def test_validate_dataset_metadata(validator, metadata_dataset):
+    """Test that metadata-only validation reports columns from CSV headers and Parquet footers."""
+    results = validator.validate_dataset_metadata(metadata_dataset)
+
+    assert results["visit_occurrence"] is None, "Expected a missing table to be reported as None."
+
+    person = results["person"]
+    assert "person_id" in [col[0] for col in person["correct_columns"]]
+    assert "month_of_birth" in [col[0] for col in person["missing_columns"]]
+    assert [col[0] for col in person["extra_columns"]] == ["extra_column_1"]
+
+    death = results["death"]
+    assert ("person_id", pa.int64()) in death["correct_columns"], "int32 should be castable to int64."
+    assert ("death_date", pa.date64()) in death["correct_columns"], "Date strings should be castable."
+
+
+def test_validate_dataset_metadata_without_casting(validator, metadata_dataset):
+    """Test that metadata-only validation reports actual types when not loading with the expected schema."""
+    results = validator.validate_dataset_metadata(metadata_dataset, load_with_expected_schema=False)
+    mismatched = {col[0]: (col[1], col[2]) for col in results["death"]["mismatched_columns"]}
+    assert mismatched["person_id"] == (pa.int32(), pa.int64())
+    assert mismatched["death_date"] == (pa.string(), pa.date64())
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_validate_graphically_in_parallel(tmp_path, validator, capsys, use_processes):
+    """Test that the results of tables validated in a thread or process pool are all collected."""
+    (tmp_path / "person.csv").write_text("person_id,year_of_birth\n1,1980\n")
+    (tmp_path / "death.csv").write_text("person_id,death_date\n1,2020-01-01\n")
+    cache = ValidationCache(tmp_path / "cache.json")
+    validate_omop_dataset_graphically(
+        validator, tmp_path, cache=cache, max_workers=2, use_processes=use_processes
+    )
+
+    assert "Validation failed" not in capsys.readouterr().out
+    schema = validator.get_schema_version()
+    person = cache.get("person", tmp_path / "person.csv", schema, CACHE_OPTIONS)
+    death = cache.get("death", tmp_path / "death.csv", schema, CACHE_OPTIONS)
+    assert [name for name, _ in person["correct_columns"]] == ["person_id", "year_of_birth"]
+    assert [name for name, _ in death["correct_columns"]] == ["person_id", "death_date"]
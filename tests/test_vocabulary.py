@@ -0,0 +1,93 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from omop_schema.schema.v5_4 import OMOPSchemaV54
+from omop_schema.vocabulary import AncestorIndex, ConceptIndex, fnv1a_hash
+
+
+@pytest.fixture
+def concept_csv(tmp_path):
+    """Fixture to create a concept table with a duplicated code and an invalid concept."""
+    path = tmp_path / "concept.csv"
+    path.write_text(
+        "concept_id,concept_name,domain_id,vocabulary_id,concept_class_id,standard_concept,concept_code,"
+        "invalid_reason\n"
+        "8532,FEMALE,Gender,Gender,Gender,S,F,\n"
+        "201826,Type 2 diabetes mellitus,Condition,SNOMED,Clinical Finding,S,44054006,\n"
+        "45576876,Type 2 diabetes mellitus,Condition,ICD10CM,4-char billing code,,E11.9,\n"
+        "1,Old Type 2 diabetes mellitus,Condition,ICD10CM,4-char billing code,,E11.9,D\n"
+        "8507,MALE,Gender,Gender,Gender,S,M,\n"
+    )
+    return path
+
+
+def test_fnv1a_hash():
+    """Test the vectorized hash against reference FNV-1a values."""
+    hashes = fnv1a_hash(pa.array(["", "a", "foobar", None]))
+    assert hashes.tolist() == [0xCBF29CE484222325, 0xAF63DC4C8601EC8C, 0x85944171F73967E8, 0xCBF29CE484222325]
+
+
+def test_concept_index(tmp_path, concept_csv):
+    """Test batched concept id and code lookups on a memory-mapped index."""
+    ConceptIndex.build(concept_csv, tmp_path / "concept.index", schema=OMOPSchemaV54())
+    index = ConceptIndex(tmp_path / "concept.index")
+    assert len(index) == 5
+    assert pa.types.is_dictionary(index.table.schema.field("domain_id").type)
+
+    result = index.lookup([201826, 999, 8532])
+    assert result["concept_id"].to_pylist() == [201826, 999, 8532]
+    assert result["concept_name"].to_pylist() == ["Type 2 diabetes mellitus", None, "FEMALE"]
+    assert result["vocabulary_id"].to_pylist() == ["SNOMED", None, "Gender"]
+    assert result["standard_concept"].to_pylist() == ["S", None, "S"]
+
+    concept_ids = index.concept_ids(
+        ["SNOMED", "ICD10CM", "ICD10CM", "Gender"], ["44054006", "E11.9", "X", "F"]
+    )
+    assert concept_ids.to_pylist() == [201826, 45576876, None, 8532]
+    assert index.concept_ids("Gender", np.array(["M", "F"], dtype=object)).to_pylist() == [8507, 8532]
+
+
+def test_concept_index_reads_codes_as_strings(tmp_path, monkeypatch):
+    """Test that codes and flags keep their string type when the first block of the file looks numeric."""
+    monkeypatch.setattr("omop_schema.utils.DEFAULT_BLOCK_SIZE", 256)
+    path = tmp_path / "concept.csv"
+    rows = [f"{i},Concept {i},Condition,SNOMED,Clinical Finding,,{i},\n" for i in range(1, 40)]
+    rows.append("40,Type 2 diabetes mellitus,Condition,ICD10CM,4-char billing code,S,E11.9,D\n")
+    path.write_text(
+        "concept_id,concept_name,domain_id,vocabulary_id,concept_class_id,standard_concept,concept_code,"
+        "invalid_reason\n" + "".join(rows)
+    )
+    index = ConceptIndex.build(path, tmp_path / "concept.index")
+    assert index.concept_ids(["ICD10CM", "SNOMED"], ["E11.9", "7"]).to_pylist() == [40, 7]
+    assert index.lookup([40])["standard_concept"].to_pylist() == ["S"]
+
+
+def test_ancestor_index(tmp_path):
+    """Test batched descendant and ancestor queries with level filters."""
+    # 1 -> 2 -> 3 and 1 -> 4, as a transitive closure including the concepts themselves.
+    concept_ancestor = pa.table(
+        {
+            "ancestor_concept_id": [1, 1, 1, 1, 2, 2, 3, 4],
+            "descendant_concept_id": [1, 2, 3, 4, 2, 3, 3, 4],
+            "min_levels_of_separation": [0, 1, 2, 1, 0, 1, 0, 0],
+            "max_levels_of_separation": [0, 1, 2, 1, 0, 1, 0, 0],
+        }
+    )
+    AncestorIndex.build(concept_ancestor, tmp_path / "ancestor.index")
+    index = AncestorIndex(tmp_path / "ancestor.index")
+
+    descendants = index.descendants([2, 99, 1], min_levels=1)
+    assert list(
+        zip(descendants["concept_id"].to_pylist(), descendants["descendant_concept_id"].to_pylist())
+    ) == [
+        (2, 3),
+        (1, 2),
+        (1, 3),
+        (1, 4),
+    ]
+    assert index.descendant_ids([1], max_levels=1).tolist() == [1, 2, 4]
+
+    ancestors = index.ancestors([3], min_levels=1, max_levels=1)
+    assert ancestors["ancestor_concept_id"].to_pylist() == [2]
+    assert ancestors["min_levels_of_separation"].to_pylist() == [1]